@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -11,6 +12,14 @@ class Config:
     
     # Gemini AI Configuration
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '16'))  # Simultaneous in-flight Gemini calls
+    GEMINI_REQUESTS_PER_MINUTE = float(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '60'))  # Gemini quota the scheduler admits calls at
+    GEMINI_BURST = float(os.getenv('GEMINI_BURST', '10'))  # Calls admitted at once after an idle period
+    GEMINI_INTERACTIVE_MAX_WAIT = float(os.getenv('GEMINI_INTERACTIVE_MAX_WAIT', '5'))  # Seconds a user-facing call may queue before the local fallback is used
+    GEMINI_BATCH_MAX_WAIT = float(os.getenv('GEMINI_BATCH_MAX_WAIT', '600'))  # Seconds a pre-generation call may queue
+    GEMINI_ANALYTICS_MAX_WAIT = float(os.getenv('GEMINI_ANALYTICS_MAX_WAIT', '60'))  # Seconds an analytics call may queue
+    GEMINI_PLAN_DEADLINE = float(os.getenv('GEMINI_PLAN_DEADLINE', '15'))  # Seconds a user waits for a Gemini plan before getting the local one
+    GEMINI_LATE_RESULT_TIMEOUT = float(os.getenv('GEMINI_LATE_RESULT_TIMEOUT', '120'))  # Seconds a late plan may keep generating to replace the local one
     
     # Supabase Configuration
     SUPABASE_URL = os.getenv('SUPABASE_URL')
@@ -20,6 +29,34 @@ class Config:
     # Bot Settings
     DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
     
+    # Database Settings
+    DB_MAX_WORKERS = int(os.getenv('DB_MAX_WORKERS', '8'))  # Threads available for blocking Supabase calls
+    PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', '5000'))  # Max cached user profiles
+    PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', '300'))  # Seconds before a cached profile is re-read
+    SESSION_FLUSH_INTERVAL = float(os.getenv('SESSION_FLUSH_INTERVAL', '5'))  # Seconds between session write-behind flushes
+    SESSION_FLUSH_BATCH_SIZE = int(os.getenv('SESSION_FLUSH_BATCH_SIZE', '100'))  # Sessions written per flush batch
+    SESSION_STORE_MAX_SESSIONS = int(os.getenv('SESSION_STORE_MAX_SESSIONS', '10000'))  # Sessions kept in memory
+    CHAT_LOG_FLUSH_INTERVAL_MS = int(os.getenv('CHAT_LOG_FLUSH_INTERVAL_MS', '500'))  # Max delay before queued chat logs are written
+    CHAT_LOG_BATCH_SIZE = int(os.getenv('CHAT_LOG_BATCH_SIZE', '200'))  # Rows per chat_messages bulk insert
+    CHAT_LOG_MAX_QUEUE = int(os.getenv('CHAT_LOG_MAX_QUEUE', '10000'))  # Queued rows kept before the oldest are dropped
+    REMINDER_RESYNC_INTERVAL = int(os.getenv('REMINDER_RESYNC_INTERVAL', '300'))  # Seconds between reminder table re-syncs
+    REMINDER_DISPATCH_CONCURRENCY = int(os.getenv('REMINDER_DISPATCH_CONCURRENCY', '20'))  # Reminders sent in parallel
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))  # Bot-wide messages per second
+    TELEGRAM_PER_CHAT_RATE = float(os.getenv('TELEGRAM_PER_CHAT_RATE', '1'))  # Messages per second to a single chat
+    REMINDER_WORKER_ID = os.getenv('REMINDER_WORKER_ID', f"{socket.gethostname()}-{os.getpid()}")  # Identifies this process in reminder claims
+    REMINDER_LEASE_SECONDS = int(os.getenv('REMINDER_LEASE_SECONDS', '120'))  # How long a claimed reminder stays reserved
+    REMINDER_STALE_MINUTES = int(os.getenv('REMINDER_STALE_MINUTES', '60'))  # Pending reminders this overdue are expired, not sent
+    TIMEZONE = os.getenv('TIMEZONE', 'UTC')  # Zone the users' HH:MM schedule times are in
+    PREGENERATION_ENABLED = os.getenv('PREGENERATION_ENABLED', 'True').lower() == 'true'  # Build tomorrow's plans overnight
+    PREGENERATION_TIME = os.getenv('PREGENERATION_TIME', '22:00')  # Local time (TIMEZONE) the nightly batch starts
+    PREGENERATION_CONCURRENCY = int(os.getenv('PREGENERATION_CONCURRENCY', '4'))  # Users generated in parallel by the batch
+    PREGENERATION_RETRY_INTERVAL = int(os.getenv('PREGENERATION_RETRY_INTERVAL', '900'))  # Seconds between batch retries for users Gemini could not serve
+    ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', '2000'))  # Q&A answers kept in memory
+    ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', '21600'))  # Seconds an in-memory answer stays valid
+    ANSWER_CACHE_DB_TTL_DAYS = int(os.getenv('ANSWER_CACHE_DB_TTL_DAYS', '30'))  # Days a stored answer stays valid
+    ANSWER_SIMILARITY_THRESHOLD = float(os.getenv('ANSWER_SIMILARITY_THRESHOLD', '0.6'))  # Min Jaccard overlap to reuse a cached answer
+    QA_STREAM_EDIT_INTERVAL = float(os.getenv('QA_STREAM_EDIT_INTERVAL', '1.0'))  # Min seconds between edits of a streaming answer
+    
     # Conversation States
     class States:
         NEW_USER = "NEW_USER"
@@ -149,7 +149,7 @@ def get_stats():
         all_users = users_result.data or []
         
         # Get all workouts
-        workouts_result = supabase_client.client.table('workouts').select('*').execute()
+        workouts_result = supabase_client.client.table('workouts').select('*').neq('status', 'pregenerated').execute()
         all_workouts = workouts_result.data or []
         
         # Get all messages
@@ -184,7 +184,7 @@ def get_users():
         users = users_result.data or []
 
         # Get all workouts for statistics
-        workouts_result = supabase_client.client.table('workouts').select('*').execute()
+        workouts_result = supabase_client.client.table('workouts').select('*').neq('status', 'pregenerated').execute()
         all_workouts = workouts_result.data or []
 
         # Calculate 30 days ago for recent activity
@@ -240,7 +240,7 @@ def get_user_details(user_id):
         user = user_result.data[0]
         
         # Get user's workouts
-        workouts_result = supabase_client.client.table('workouts').select('*').eq('user_id', user_id).order('created_date', desc=True).limit(30).execute()
+        workouts_result = supabase_client.client.table('workouts').select('*').eq('user_id', user_id).neq('status', 'pregenerated').order('created_date', desc=True).limit(30).execute()
         workouts = workouts_result.data or []
         
         # Calculate workout stats
@@ -310,7 +310,7 @@ def get_user_stats():
         user = user_response.data[0]
         user_id = user.get('user_id')  # Use the correct user_id for workouts
 
-        workouts_response = supabase_client.client.table('workouts').select('*').eq('user_id', user_id).execute()
+        workouts_response = supabase_client.client.table('workouts').select('*').eq('user_id', user_id).neq('status', 'pregenerated').execute()
         workouts = workouts_response.data or []
         total_workouts = len(workouts)
         completed_workouts = len([w for w in workouts if w.get('status') == 'completed'])
@@ -369,7 +369,7 @@ def get_user_workouts():
             start_date = (now - timedelta(days=30)).isoformat()
         else:
             start_date = '1970-01-01'
-        workouts_response = supabase_client.client.table('workouts').select('*').eq('user_id', user_id).gte('created_date', start_date).order('created_date', desc=True).execute()
+        workouts_response = supabase_client.client.table('workouts').select('*').eq('user_id', user_id).neq('status', 'pregenerated').gte('created_date', start_date).order('created_date', desc=True).execute()
         workouts = workouts_response.data or []
         # Add completion_rate to each workout
         for w in workouts:
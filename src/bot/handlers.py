@@ -1,18 +1,27 @@
+import asyncio
 import logging
+import time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import ContextTypes
-from src.database.models import DietPlan, ExerciseCompletion, DietCompletion, Reminder
+from src.database.models import DietPlan, Reminder, local_now, local_today
 from src.gemini.gemini_service import GeminiService
 from config.config import Config
 import json
 from config.config import Config
 from src.database.models import User, Workout, DietPlan, UserSession
-from datetime import datetime,date
+from datetime import datetime,timedelta
 from src.database.models import Workout 
 from supabase import create_client
 from src.services.reminder_service import ReminderService
+from src.services.container import get_services
 from telegram.ext import CallbackQueryHandler
-from src.utils import log_user_message, log_bot_response
+from src.database.chat_log_writer import chat_log_writer
+from src.database.async_models import (
+    AsyncUser, AsyncUserSession, AsyncWorkout, AsyncDietPlan,
+    AsyncExerciseCompletion, AsyncDietCompletion, AsyncReminder, run_db
+)
+from src.utils import log_user_message
 from src.utils.chat_logger import (
     log_workout_message, log_diet_message, log_reminder_message, 
     log_progress_message, log_completion_message, log_general_message
@@ -22,11 +31,38 @@ from src.utils.chat_logger import (
 
 logger = logging.getLogger(__name__)
 
+TELEGRAM_MESSAGE_LIMIT = 4096  # Max characters in one Telegram message
+
+def late_plan_replacer(replace_content, bot, chat_id, plan_name):
+    """on_late_result callback that swaps a late Gemini plan into the saved local one
+
+    Returns (callback, saved_row): always set saved_row's result to the row
+    stored for the local plan, or None when saving failed, so the callback
+    knows which row to replace. The user is told when their plan is replaced.
+    """
+    saved_row = asyncio.get_running_loop().create_future()
+
+    async def replace(plan):
+        row = await saved_row
+        if not row or not await run_db(replace_content, row['id'], plan):
+            return
+        logger.info(f"Replaced local plan {row['id']} with the late Gemini plan")
+        try:
+            await bot.send_message(
+                chat_id=chat_id,
+                text=f"✨ Your personalized {plan_name} from the AI is ready. It has replaced "
+                     f"the quick plan sent earlier; open it again to see the update."
+            )
+        except Exception as e:
+            logger.error(f"Error notifying chat {chat_id} of replaced {plan_name}: {e}")
+
+    return replace, saved_row
+
 class BotHandlers:
     
-    def __init__(self):
+    def __init__(self, gemini_service: GeminiService = None):
         """Initialize handlers with Gemini service"""
-        self.gemini_service = GeminiService()
+        self.gemini_service = gemini_service or GeminiService()
     
     @staticmethod
     async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -39,7 +75,7 @@ class BotHandlers:
         logger.info(f"User {user_id} started the bot")
         
         # Check if user already exists
-        existing_user = User.get_by_user_id(user_id)
+        existing_user = await AsyncUser.get_by_user_id(user_id)
         
         if existing_user:
             # Update user's name information if it has changed
@@ -49,7 +85,7 @@ class BotHandlers:
                 existing_user.first_name = first_name
                 existing_user.last_name = last_name
                 existing_user.username = username
-                existing_user.save()
+                await AsyncUser.save(existing_user)
             
             if existing_user.is_complete_profile():
                 # User already has complete profile
@@ -69,8 +105,7 @@ class BotHandlers:
                 )
                 
                 # Store bot message
-                from src.database.models import ChatMessage
-                ChatMessage.create_bot_message(
+                chat_log_writer.log_bot_message(
                     user_id=user_id,
                     message_text=welcome_message,
                     chat_id=update.effective_chat.id,
@@ -80,8 +115,8 @@ class BotHandlers:
                 await update.message.reply_text(welcome_message)
                 
                 # Set session to ACTIVE
-                session = UserSession.get_by_user_id(user_id) or UserSession(user_id=user_id)
-                session.update_state(Config.States.ACTIVE)
+                session = await AsyncUserSession.get_by_user_id(user_id) or UserSession(user_id=user_id)
+                await AsyncUserSession.update_state(session, Config.States.ACTIVE)
                 
             else:
                 # Incomplete profile
@@ -98,8 +133,7 @@ class BotHandlers:
                 )
                 
                 # Store bot message
-                from src.database.models import ChatMessage
-                ChatMessage.create_bot_message(
+                chat_log_writer.log_bot_message(
                     user_id=user_id,
                     message_text=welcome_message,
                     chat_id=update.effective_chat.id,
@@ -109,8 +143,8 @@ class BotHandlers:
                 await update.message.reply_text(welcome_message)
                 
                 # Create or update session
-                session = UserSession.get_by_user_id(user_id) or UserSession(user_id=user_id)
-                session.update_state(Config.States.COLLECTING_AGE)
+                session = await AsyncUserSession.get_by_user_id(user_id) or UserSession(user_id=user_id)
+                await AsyncUserSession.update_state(session, Config.States.COLLECTING_AGE)
         else:
             # New user - create with name information
             new_user = User(
@@ -119,7 +153,7 @@ class BotHandlers:
                 last_name=last_name,
                 username=username
             )
-            new_user.save()
+            await AsyncUser.save(new_user)
             
             welcome_message = (
                 f"Hey {username}! 👋 Welcome to your AI-powered Workout & Health Bot! 🤖💪\n\n"
@@ -134,8 +168,7 @@ class BotHandlers:
             )
             
             # Store bot message
-            from src.database.models import ChatMessage
-            ChatMessage.create_bot_message(
+            chat_log_writer.log_bot_message(
                 user_id=user_id,
                 message_text=welcome_message,
                 chat_id=update.effective_chat.id,
@@ -145,8 +178,8 @@ class BotHandlers:
             await update.message.reply_text(welcome_message)
             
             # Create or update session
-            session = UserSession.get_by_user_id(user_id) or UserSession(user_id=user_id)
-            session.update_state(Config.States.COLLECTING_AGE)
+            session = await AsyncUserSession.get_by_user_id(user_id) or UserSession(user_id=user_id)
+            await AsyncUserSession.update_state(session, Config.States.COLLECTING_AGE)
     
     @staticmethod
     async def handle_age_collection(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -163,8 +196,8 @@ class BotHandlers:
                 return
             
             # Save age to session temp data
-            session = UserSession.get_by_user_id(user_id)
-            session.update_state(Config.States.COLLECTING_HEIGHT, {"age": age})
+            session = await AsyncUserSession.get_by_user_id(user_id)
+            await AsyncUserSession.update_state(session, Config.States.COLLECTING_HEIGHT, {"age": age})
             
             await update.message.reply_text(
                 f"Great! You're {age} years old. 👍\n\n"
@@ -191,10 +224,10 @@ class BotHandlers:
                 return
             
             # Save height to session temp data
-            session = UserSession.get_by_user_id(user_id)
+            session = await AsyncUserSession.get_by_user_id(user_id)
             temp_data = session.temp_data.copy()
             temp_data["height"] = height
-            session.update_state(Config.States.COLLECTING_WEIGHT, temp_data)
+            await AsyncUserSession.update_state(session, Config.States.COLLECTING_WEIGHT, temp_data)
             
             await update.message.reply_text(
                 f"Perfect! Your height is {height} cm. 📐\n\n"
@@ -221,10 +254,10 @@ class BotHandlers:
                 return
             
             # Save weight and move to fitness level
-            session = UserSession.get_by_user_id(user_id)
+            session = await AsyncUserSession.get_by_user_id(user_id)
             temp_data = session.temp_data.copy()
             temp_data["weight"] = weight
-            session.update_state(Config.States.COLLECTING_FITNESS_LEVEL, temp_data)
+            await AsyncUserSession.update_state(session, Config.States.COLLECTING_FITNESS_LEVEL, temp_data)
             
             # Create fitness level keyboard
             keyboard = [
@@ -259,10 +292,10 @@ class BotHandlers:
         level = query.data.split("_")[1]  # Extract level from callback_data
         
         # Save fitness level and move to goals
-        session = UserSession.get_by_user_id(user_id)
+        session = await AsyncUserSession.get_by_user_id(user_id)
         temp_data = session.temp_data.copy()
         temp_data["fitness_level"] = level
-        session.update_state(Config.States.COLLECTING_GOALS, temp_data)
+        await AsyncUserSession.update_state(session, Config.States.COLLECTING_GOALS, temp_data)
         
         level_emoji = {"beginner": "🟢", "intermediate": "🟡", "advanced": "🔴"}
         
@@ -293,22 +326,22 @@ class BotHandlers:
             return
         
         # Get session data and create user profile
-        session = UserSession.get_by_user_id(user_id)
+        session = await AsyncUserSession.get_by_user_id(user_id)
         temp_data = session.temp_data
         
         # Create or update user with complete profile
-        user = User.get_by_user_id(user_id) or User(user_id=user_id)
+        user = await AsyncUser.get_by_user_id(user_id) or User(user_id=user_id)
         user.age = temp_data["age"]
         user.height = temp_data["height"]
         user.weight = temp_data["weight"]
         user.fitness_level = temp_data["fitness_level"]
         user.goals = goals
         
-        result = user.save()
+        result = await AsyncUser.save(user)
         
         if result:
             # Update session to collect workout time
-            session.update_state(Config.States.COLLECTING_WORKOUT_TIME, temp_data)
+            await AsyncUserSession.update_state(session, Config.States.COLLECTING_WORKOUT_TIME, temp_data)
             
             await update.message.reply_text(
                 "🎉 **Profile Complete!**\n\n"
@@ -346,10 +379,10 @@ class BotHandlers:
             workout_time = datetime.strptime(time_text, '%H:%M').strftime('%H:%M')
             
             # Save workout time to session temp data
-            session = UserSession.get_by_user_id(user_id)
+            session = await AsyncUserSession.get_by_user_id(user_id)
             temp_data = session.temp_data.copy()
             temp_data["workout_time"] = workout_time
-            session.update_state(Config.States.COLLECTING_BREAKFAST_TIME, temp_data)
+            await AsyncUserSession.update_state(session, Config.States.COLLECTING_BREAKFAST_TIME, temp_data)
             
             await update.message.reply_text(
                 f"Great! Your workout time is set to {workout_time}. 💪\n\n"
@@ -379,10 +412,10 @@ class BotHandlers:
             breakfast_time = datetime.strptime(time_text, '%H:%M').strftime('%H:%M')
             
             # Save breakfast time to session temp data
-            session = UserSession.get_by_user_id(user_id)
+            session = await AsyncUserSession.get_by_user_id(user_id)
             temp_data = session.temp_data.copy()
             temp_data["breakfast_time"] = breakfast_time
-            session.update_state(Config.States.COLLECTING_LUNCH_TIME, temp_data)
+            await AsyncUserSession.update_state(session, Config.States.COLLECTING_LUNCH_TIME, temp_data)
             
             await update.message.reply_text(
                 f"Perfect! Breakfast time set to {breakfast_time}. 🍳\n\n"
@@ -411,10 +444,10 @@ class BotHandlers:
             lunch_time = datetime.strptime(time_text, '%H:%M').strftime('%H:%M')
             
             # Save lunch time to session temp data
-            session = UserSession.get_by_user_id(user_id)
+            session = await AsyncUserSession.get_by_user_id(user_id)
             temp_data = session.temp_data.copy()
             temp_data["lunch_time"] = lunch_time
-            session.update_state(Config.States.COLLECTING_DINNER_TIME, temp_data)
+            await AsyncUserSession.update_state(session, Config.States.COLLECTING_DINNER_TIME, temp_data)
             
             await update.message.reply_text(
                 f"Excellent! Lunch time set to {lunch_time}. 🍽️\n\n"
@@ -443,10 +476,10 @@ class BotHandlers:
             dinner_time = datetime.strptime(time_text, '%H:%M').strftime('%H:%M')
             
             # Save dinner time to session temp data
-            session = UserSession.get_by_user_id(user_id)
+            session = await AsyncUserSession.get_by_user_id(user_id)
             temp_data = session.temp_data.copy()
             temp_data["dinner_time"] = dinner_time
-            session.update_state(Config.States.COLLECTING_SNACK_TIME, temp_data)
+            await AsyncUserSession.update_state(session, Config.States.COLLECTING_SNACK_TIME, temp_data)
             
             await update.message.reply_text(
                 f"Great! Dinner time set to {dinner_time}. 🍴\n\n"
@@ -475,23 +508,23 @@ class BotHandlers:
             snack_time = datetime.strptime(time_text, '%H:%M').strftime('%H:%M')
             
             # Get session data and update user with all time preferences
-            session = UserSession.get_by_user_id(user_id)
+            session = await AsyncUserSession.get_by_user_id(user_id)
             temp_data = session.temp_data.copy()
             temp_data["snack_time"] = snack_time
             
             # Update user with all time preferences
-            user = User.get_by_user_id(user_id)
+            user = await AsyncUser.get_by_user_id(user_id)
             user.workout_time = temp_data["workout_time"]
             user.breakfast_time = temp_data["breakfast_time"]
             user.lunch_time = temp_data["lunch_time"]
             user.dinner_time = temp_data["dinner_time"]
             user.snack_time = snack_time
             
-            result = user.save()
+            result = await AsyncUser.save(user)
             
             if result:
                 # Update session to ACTIVE and clear temp data
-                session.update_state(Config.States.ACTIVE, {})
+                await AsyncUserSession.update_state(session, Config.States.ACTIVE, {})
                 
                 await update.message.reply_text(
                     "🎉 **Schedule Setup Complete!**\n\n"
@@ -525,7 +558,7 @@ class BotHandlers:
         user_id = update.effective_user.id
         
         # Check if user has complete profile
-        user = User.get_by_user_id(user_id)
+        user = await AsyncUser.get_by_user_id(user_id)
         if not user or not user.is_complete_profile():
             await update.message.reply_text(
                 "Please complete your profile first by using /start command! 📝"
@@ -541,11 +574,12 @@ class BotHandlers:
         
         try:
             # Update session state
-            session = UserSession.get_by_user_id(user_id) or UserSession(user_id=user_id)
-            session.update_state(Config.States.WORKOUT_GENERATION)
+            session = await AsyncUserSession.get_by_user_id(user_id) or UserSession(user_id=user_id)
+            await AsyncUserSession.update_state(session, Config.States.WORKOUT_GENERATION)
             
             # Prepare user profile for AI
             user_profile = {
+                'user_id': user_id,
                 'age': user.age,
                 'height': user.height,
                 'weight': user.weight,
@@ -554,7 +588,7 @@ class BotHandlers:
             }
             
             # Get workout history for context
-            recent_workouts = Workout.get_user_workouts(user_id, limit=3)
+            recent_workouts = await AsyncWorkout.get_user_workouts(user_id, limit=3)
             workout_history = []
             for workout in recent_workouts:
                 if workout.workout_content:
@@ -564,16 +598,26 @@ class BotHandlers:
                         'status': workout.status
                     })
             
-            # Generate workout using AI
-            workout_data = self.gemini_service.generate_workout(user_profile, workout_history)
-            
-            # Save workout to database
-            new_workout = Workout(
-                user_id=user_id,
-                workout_content=workout_data,
-                status='generated'
+            # Generate workout using AI, falling back to a local one past the deadline
+            replace_workout, workout_row = late_plan_replacer(
+                Workout.replace_content, context.bot, update.effective_chat.id, 'workout'
             )
-            saved_workout = new_workout.save()
+            saved_workout = None
+            try:
+                workout_data = await self.gemini_service.generate_workout_async(
+                    user_profile, workout_history,
+                    deadline=Config.GEMINI_PLAN_DEADLINE, on_late_result=replace_workout
+                )
+                
+                # Save workout to database
+                new_workout = Workout(
+                    user_id=user_id,
+                    workout_content=workout_data,
+                    status='generated'
+                )
+                saved_workout = await AsyncWorkout.save(new_workout)
+            finally:
+                workout_row.set_result(saved_workout)
             
             if saved_workout:
                 # Delete generating message
@@ -583,7 +627,7 @@ class BotHandlers:
                 await self.send_formatted_workout(update, workout_data, saved_workout['id'])
                 
                 # Update session back to ACTIVE
-                session.update_state(Config.States.ACTIVE)
+                await AsyncUserSession.update_state(session, Config.States.ACTIVE)
                 
             else:
                 await generating_msg.edit_text(
@@ -597,79 +641,136 @@ class BotHandlers:
             )
             
             # Reset session state
-            session = UserSession.get_by_user_id(user_id)
+            session = await AsyncUserSession.get_by_user_id(user_id)
             if session:
-                session.update_state(Config.States.ACTIVE)
+                await AsyncUserSession.update_state(session, Config.States.ACTIVE)
 
     async def handle_schedule_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Generate today's workout and diet, store and send combined plan"""
         user_id = update.effective_user.id
-        user = User.get_by_user_id(user_id)
+        user = await AsyncUser.get_by_user_id(user_id)
 
         if not user or not user.is_complete_profile():
             await update.message.reply_text("Please complete your profile first using /start.")
             return
 
         # Get user session and set to SCHEDULE_GENERATION
-        session = UserSession.get_by_user_id(user_id)
+        session = await AsyncUserSession.get_by_user_id(user_id)
         if session:
-            session.update_state(Config.States.SCHEDULE_GENERATION)
+            await AsyncUserSession.update_state(session, Config.States.SCHEDULE_GENERATION)
 
-        # Notify user
-        await update.message.reply_text("🧠 Generating today's workout and diet plan...")
-
-        # Build profile
-        user_profile = {
-            'age': user.age,
-            'height': user.height,
-            'weight': user.weight,
-            'fitness_level': user.fitness_level,
-            'goals': user.goals
-        }
-
-        # Get workout history
-        recent_workouts = Workout.get_user_workouts(user_id, limit=3)
-        workout_history = [w.workout_content for w in recent_workouts if w.workout_content]
+        # Serve tonight's pre-generated plans when the batch has built them
+        today = local_today().isoformat()
+        saved_workout, saved_diet = await asyncio.gather(
+            run_db(Workout.claim_pregenerated, user_id, today),
+            run_db(DietPlan.claim_pregenerated, user_id, today)
+        )
+        
+        if saved_workout and saved_diet:
+            logger.info(f"Serving pre-generated plans for user {user_id}")
+            workout_data = saved_workout['workout_content']
+            diet_data = saved_diet['diet_content']
+        else:
+            # Notify user
+            await update.message.reply_text("🧠 Generating today's workout and diet plan...")
 
-        # Generate workout
-        workout_data = self.gemini_service.generate_workout(user_profile, workout_history)
+            # Build profile
+            user_profile = {
+                'user_id': user_id,
+                'age': user.age,
+                'height': user.height,
+                'weight': user.weight,
+                'fitness_level': user.fitness_level,
+                'goals': user.goals
+            }
 
-        # Generate diet
-        diet_data = self.gemini_service.generate_diet_plan(user_profile)
+            # Workout and diet history are independent lookups, fetch them together
+            recent_workouts, recent_diets = await asyncio.gather(
+                AsyncWorkout.get_user_workouts(user_id, limit=3),
+                AsyncDietPlan.get_user_diets(user_id, limit=5)
+            )
+            workout_history = [w.workout_content for w in recent_workouts if w.workout_content]
 
-        # Save workout
-        new_workout = Workout(
-            user_id=user_id,
-            workout_content=workout_data,
-            status='scheduled',
-            scheduled_date=date.today(),
-            total_exercises=len(workout_data.get('exercises', []))
-        )
-        saved_workout = new_workout.save()
+            async def build_workout():
+                if saved_workout:
+                    return saved_workout['workout_content'], saved_workout
+                replace_workout, workout_row = late_plan_replacer(
+                    Workout.replace_content, context.bot, update.effective_chat.id, 'workout'
+                )
+                saved = None
+                try:
+                    workout_data = await self.gemini_service.generate_workout_async(
+                        user_profile, workout_history,
+                        deadline=Config.GEMINI_PLAN_DEADLINE, on_late_result=replace_workout
+                    )
+                    new_workout = Workout(
+                        user_id=user_id,
+                        workout_content=workout_data,
+                        status='scheduled',
+                        scheduled_date=today,
+                        total_exercises=len(workout_data.get('exercises', []))
+                    )
+                    saved = await AsyncWorkout.save(new_workout)
+                finally:
+                    workout_row.set_result(saved)
+                return workout_data, saved
+
+            async def build_diet():
+                if saved_diet:
+                    return saved_diet['diet_content'], saved_diet
+                replace_diet, diet_row = late_plan_replacer(
+                    DietPlan.replace_content, context.bot, update.effective_chat.id, 'diet plan'
+                )
+                saved = None
+                try:
+                    diet_data = await self.gemini_service.generate_diet_plan_async(
+                        user_profile, recent_diets,
+                        deadline=Config.GEMINI_PLAN_DEADLINE, on_late_result=replace_diet
+                    )
+                    new_diet = DietPlan(
+                        user_id=user_id,
+                        diet_content=diet_data,
+                        scheduled_date=today,
+                        status='scheduled'
+                    )
+                    saved = await AsyncDietPlan.save(new_diet)
+                finally:
+                    diet_row.set_result(saved)
+                return diet_data, saved
+
+            # Generate and save whatever was not pre-generated, workout and diet concurrently
+            (workout_data, saved_workout), (diet_data, saved_diet) = await asyncio.gather(
+                build_workout(), build_diet()
+            )
 
         if not saved_workout:
             logger.error(f"Failed to save workout for user {user_id}")
             await update.message.reply_text("❌ Error saving workout. Please try again.")
             if session:
-                session.update_state(Config.States.ACTIVE)
+                await AsyncUserSession.update_state(session, Config.States.ACTIVE)
             return
 
-        # Save diet
-        new_diet = DietPlan(
-            user_id=user_id,
-            diet_content=diet_data,
-            scheduled_date=date.today().isoformat(),
-            status='scheduled'
-        )
-        saved_diet = new_diet.save()
-
         if not saved_diet:
             logger.error(f"Failed to save diet plan for user {user_id}")
             await update.message.reply_text("❌ Error saving diet plan. Please try again.")
             if session:
-                session.update_state(Config.States.ACTIVE)
+                await AsyncUserSession.update_state(session, Config.States.ACTIVE)
             return
 
+        # Start creating reminders while the plans are being sent
+        logger.info(f"Creating reminders for user {user_id}")
+        reminders_task = asyncio.create_task(run_db(
+            ReminderService.create_daily_reminders,
+            user_id=user_id,
+            workout_data=saved_workout,
+            diet_data=saved_diet,
+            workout_time=user.workout_time,
+            breakfast_time=user.breakfast_time,
+            lunch_time=user.lunch_time,
+            dinner_time=user.dinner_time,
+            snack_time=user.snack_time
+        ))
+
         # Format and send message
         await self.send_formatted_workout(update, workout_data, saved_workout['id'], show_per_exercise_buttons=False)
         
@@ -729,29 +830,13 @@ class BotHandlers:
         )
         await update.message.reply_text(diet_message, parse_mode='Markdown')
 
-        # Create reminders for today's schedule
-        logger.info(f"Creating reminders for user {user_id}")
-        logger.info(f"User times: workout={user.workout_time}, breakfast={user.breakfast_time}, lunch={user.lunch_time}, dinner={user.dinner_time}, snack={user.snack_time}")
-        logger.info(f"Workout data: {saved_workout}")
-        logger.info(f"Diet data: {saved_diet}")
-        
         reminder_count = 0
         try:
-            ReminderService.create_daily_reminders(
-                user_id=user_id,
-                workout_data=saved_workout,
-                diet_data=saved_diet,
-                workout_time=user.workout_time,
-                breakfast_time=user.breakfast_time,
-                lunch_time=user.lunch_time,
-                dinner_time=user.dinner_time,
-                snack_time=user.snack_time
-            )
+            created_reminders = await reminders_task
             
-            # Count created reminders
-            from src.database.models import Reminder
-            user_reminders = Reminder.get_user_reminders(user_id)
-            reminder_count = len([r for r in user_reminders if r.status == 'pending'])
+            # Hand the new reminders straight to the scheduler
+            get_services(context).reminder_service.schedule_reminders(created_reminders)
+            reminder_count = len(created_reminders)
             
             logger.info(f"Successfully created {reminder_count} reminders for user {user_id}")
             
@@ -785,7 +870,7 @@ class BotHandlers:
 
         # Reset session state back to ACTIVE
         if session:
-            session.update_state(Config.States.ACTIVE)
+            await AsyncUserSession.update_state(session, Config.States.ACTIVE)
     
     async def send_formatted_workout(self, update, workout_data, workout_id, show_per_exercise_buttons=False):
         """Send beautifully formatted workout to user"""
@@ -880,12 +965,13 @@ class BotHandlers:
     
     async def handle_fitness_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle fitness and nutrition related questions"""
+        answer_msg = None
         try:
             question = update.message.text
             user_id = update.effective_user.id
             
             # Get user profile for personalized answers
-            user = User.get_by_user_id(user_id)
+            user = await AsyncUser.get_by_user_id(user_id)
             user_profile = {
                 'age': user.age if user else None,
                 'height': user.height if user else None,
@@ -894,8 +980,16 @@ class BotHandlers:
                 'goals': user.goals if user else None
             } if user else None
             
-            # Get answer from Gemini
-            answer = self.gemini_service.answer_fitness_question(question, user_profile)
+            # Post a placeholder and fill it in as Gemini streams the answer
+            answer_msg = await update.message.reply_text("🤔 Thinking...")
+            shown = ""
+            last_edit = time.monotonic()
+            answer = ""
+            async for answer in self.gemini_service.answer_fitness_question_stream(question, user_profile):
+                if time.monotonic() - last_edit < Config.QA_STREAM_EDIT_INTERVAL:
+                    continue
+                shown = await self._edit_streamed_answer(answer_msg, answer + " ▌", shown)
+                last_edit = time.monotonic()
             
             # Create keyboard with only Ask Another button
             keyboard = [[InlineKeyboardButton("❓ Ask Another Question", callback_data="ask_question")]]
@@ -908,11 +1002,48 @@ class BotHandlers:
                 chat_id=update.effective_chat.id,
                 reply_to_message_id=update.message.message_id
             )
-            await update.message.reply_text(answer, reply_markup=reply_markup)
+            # The placeholder takes the first part of a long answer, follow-ups the rest;
+            # only the last message gets the keyboard
+            parts = [answer[i:i + TELEGRAM_MESSAGE_LIMIT] for i in range(0, len(answer), TELEGRAM_MESSAGE_LIMIT)]
+            await self._edit_streamed_answer(
+                answer_msg, parts[0], shown, reply_markup=reply_markup if len(parts) == 1 else None
+            )
+            for number, part in enumerate(parts[1:], start=2):
+                await update.message.reply_text(part, reply_markup=reply_markup if number == len(parts) else None)
             
         except Exception as e:
             logger.error(f"Error answering fitness question: {e}", exc_info=True)
-            await update.message.reply_text("❌ Sorry, I couldn't process your question. Please try again.")
+            error_text = "❌ Sorry, I couldn't process your question. Please try again."
+            if answer_msg is not None:
+                # Replace the placeholder rather than leave "Thinking..." behind
+                try:
+                    await answer_msg.edit_text(error_text)
+                    return
+                except Exception as edit_error:
+                    logger.error(f"Error replacing answer placeholder: {edit_error}")
+            await update.message.reply_text(error_text)
+    
+    @staticmethod
+    async def _edit_streamed_answer(message, text: str, shown: str, reply_markup=None) -> str:
+        """Edit a streaming answer into place; returns the text now shown"""
+        text = text[:TELEGRAM_MESSAGE_LIMIT]
+        if text == shown and reply_markup is None:
+            return shown
+        try:
+            await message.edit_text(text, reply_markup=reply_markup)
+            return text
+        except RetryAfter as e:
+            # Over the edit limit: skip this update, the next one catches up
+            logger.warning(f"Answer edit rate limited, retry after {e.retry_after}s")
+            if reply_markup is not None:
+                await asyncio.sleep(e.retry_after)
+                await message.edit_text(text, reply_markup=reply_markup)
+                return text
+            return shown
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                raise
+            return shown
     
     @staticmethod
     async def handle_workout_completion(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -924,7 +1055,7 @@ class BotHandlers:
         user_id = query.from_user.id
         
         # Get and update workout
-        workouts = Workout.get_user_workouts(user_id, limit=20)
+        workouts = await AsyncWorkout.get_user_workouts(user_id, limit=20)
         target_workout = None
         for workout in workouts:
             if workout.id == workout_id:
@@ -932,7 +1063,7 @@ class BotHandlers:
                 break
         
         if target_workout:
-            target_workout.mark_completed()
+            await AsyncWorkout.mark_completed(target_workout)
             
             await query.edit_message_text(
                 f"🎉 **Workout Completed!** 💪\n\n"
@@ -969,14 +1100,14 @@ class BotHandlers:
             status_emoji = "✅" if status == 'completed' else "⏭️"
 
             # Get the workout
-            workouts = Workout.get_user_workouts(user_id, limit=10)
+            workouts = await AsyncWorkout.get_user_workouts(user_id, limit=10)
             workout = next((w for w in workouts if w.id == workout_id), None)
             if not workout or workout.user_id != user_id:
                 await query.edit_message_text("❌ Workout not found.")
                 return
 
             # Check if exercise was already completed/skipped
-            if ExerciseCompletion.exists(workout_id, index):
+            if await AsyncExerciseCompletion.exists(workout_id, index):
                 await query.answer(f"⚠️ This exercise was already marked as {status}.", show_alert=True)
                 return
 
@@ -984,7 +1115,7 @@ class BotHandlers:
             exercise_name = workout.workout_content['exercises'][index]['name']
 
             # Record this completion/skip
-            completion_result = ExerciseCompletion.create(
+            completion_result = await AsyncExerciseCompletion.create(
                 workout_id=workout_id,
                 exercise_index=index,
                 exercise_name=exercise_name,
@@ -996,7 +1127,7 @@ class BotHandlers:
                 return
 
             # Refresh the completion counts from the database
-            workout.refresh_completion_count()
+            await AsyncWorkout.refresh_completion_count(workout)
 
             # Update the message to show progress
             message = query.message.text
@@ -1067,7 +1198,7 @@ class BotHandlers:
         message_id = update.message.message_id
 
         # Get current session state for logging
-        session = UserSession.get_by_user_id(user_id)
+        session = await AsyncUserSession.get_by_user_id(user_id)
         session_state = session.conversation_state if session else None
 
         # Log user message
@@ -1100,8 +1231,8 @@ class BotHandlers:
 
         state = session.conversation_state
 
-        # Create handlers instance for AI methods
-        handlers = BotHandlers()
+        # Shared handlers instance for AI methods
+        handlers = get_services(context).handlers
 
         # Handle messages based on current state
         if state == Config.States.COLLECTING_AGE:
@@ -1137,21 +1268,13 @@ class BotHandlers:
                         "You can ask me anything about workouts, nutrition, or progress!"
                     )
                     
-                    # Log bot response
-                    log_bot_response(
-                        user_id=user_id,
-                        message_text=response_text,
-                        chat_id=chat_id,
-                        reply_to_message_id=message_id,
-                        session_state=session_state
-                    )
-                    
                     # Log greeting response
                     log_general_message(
                         user_id=user_id,
                         message_text=response_text,
                         chat_id=chat_id,
-                        reply_to_message_id=message_id
+                        reply_to_message_id=message_id,
+                        session_state=session_state
                     )
                     await update.message.reply_text(response_text)
                 else:
@@ -1166,7 +1289,7 @@ class BotHandlers:
         query = update.callback_query
         data = query.data
         
-        handlers = BotHandlers()
+        handlers = get_services(context).handlers
         
         if data.startswith("level_"):
             await BotHandlers.handle_fitness_level(update, context)
@@ -1186,17 +1309,16 @@ class BotHandlers:
                 # Get user ID from the callback query
                 user_id = query.from_user.id
                 
-                # Get recent workouts and diet plans
-                workouts = Workout.get_user_workouts(user_id, limit=30)
-                diet_plans = DietPlan.get_user_diets(user_id, limit=30)
-                
-                # Get all exercise completions for the user
-                all_completions = ExerciseCompletion.get_user_completions(user_id)
+                # Recent workouts and diet plans plus all of the user's completions, fetched together
+                workouts, diet_plans, all_completions, all_diet_completions = await asyncio.gather(
+                    AsyncWorkout.get_user_workouts(user_id, limit=30),
+                    AsyncDietPlan.get_user_diets(user_id, limit=30),
+                    AsyncExerciseCompletion.get_user_completions(user_id),
+                    AsyncDietCompletion.get_user_completions(user_id)
+                )
                 total_completed_exercises = len([c for c in all_completions if c.get('status') == 'completed'])
                 total_skipped_exercises = len([c for c in all_completions if c.get('status') == 'skipped'])
 
-                # Get all diet completions for the user
-                all_diet_completions = DietCompletion.get_user_completions(user_id)
                 total_completed_meals = len([c for c in all_diet_completions if c.get('status') == 'completed'])
                 total_skipped_meals = len([c for c in all_diet_completions if c.get('status') == 'skipped'])
 
@@ -1237,6 +1359,15 @@ class BotHandlers:
                 recent_workouts = sorted(workouts, 
                                       key=lambda x: x.scheduled_date or x.created_date, 
                                       reverse=True)[:5]
+                recent_diets = sorted(diet_plans, 
+                                    key=lambda x: x.get('scheduled_date') or x.get('created_date'), 
+                                    reverse=True)[:3]
+                
+                # Completions of every listed workout and diet, one query each
+                completions_by_workout, completions_by_diet = await asyncio.gather(
+                    AsyncExerciseCompletion.get_for_workouts([w.id for w in recent_workouts]),
+                    AsyncDietCompletion.get_for_diets([d.get('id') for d in recent_diets])
+                )
                 
                 for workout in recent_workouts:
                     date_str = workout.scheduled_date or workout.created_date
@@ -1249,7 +1380,7 @@ class BotHandlers:
                     workout_type = workout.workout_content.get('workout_type', 'Workout') if workout.workout_content else 'Workout'
                     
                     # Get exercise completion for this workout
-                    workout_completions = ExerciseCompletion.get_workout_completions(workout.id)
+                    workout_completions = completions_by_workout.get(workout.id, [])
                     exercises_done = len([c for c in workout_completions if c.get('status') == 'completed'])
                     exercises_skipped = len([c for c in workout_completions if c.get('status') == 'skipped'])
                     total_exercises = workout.total_exercises or 0
@@ -1266,10 +1397,6 @@ class BotHandlers:
                     message += "\n"
 
                 # Add recent diet activity
-                recent_diets = sorted(diet_plans, 
-                                    key=lambda x: x.get('scheduled_date') or x.get('created_date'), 
-                                    reverse=True)[:3]
-                
                 if recent_diets:
                     message += "🍽️ **Recent Diet Activity**\n"
                     for diet in recent_diets:
@@ -1282,7 +1409,7 @@ class BotHandlers:
                         status_emoji = "✅" if diet.get('status') == "completed" else "⏭️" if diet.get('status') == "skipped" else "⏳"
                         
                         # Get meal completion for this diet
-                        diet_completions = DietCompletion.get_diet_completions(diet.get('id'))
+                        diet_completions = completions_by_diet.get(diet.get('id'), [])
                         meals_done = len([c for c in diet_completions if c.get('status') == 'completed'])
                         meals_skipped = len([c for c in diet_completions if c.get('status') == 'skipped'])
                         total_meals = len(diet_completions)
@@ -1364,7 +1491,7 @@ class BotHandlers:
             logger.info(f"Processing diet {action} for user {user_id}, diet {diet_id}")
             
             # Get the diet plan using DietPlan methods
-            user_diets = DietPlan.get_user_diets(user_id, limit=10)  # Get recent diets
+            user_diets = await AsyncDietPlan.get_user_diets(user_id, limit=10)  # Get recent diets
             diet_data = next((d for d in user_diets if d.get('id') == diet_id), None)
             
             if not diet_data:
@@ -1382,11 +1509,11 @@ class BotHandlers:
                 status=status,
                 id=diet_id,
                 created_date=diet_data.get('created_date'),
-                completion_date=datetime.now().date().isoformat()
+                completion_date=local_today().isoformat()
             )
             
             # Save the updated diet plan
-            saved_result = diet.save()
+            saved_result = await AsyncDietPlan.save(diet)
             if saved_result:
                 logger.info(f"Successfully marked diet {diet_id} as {status}")
                 # Update the message to show completion/skip
@@ -1459,17 +1586,16 @@ class BotHandlers:
         try:
             user_id = update.effective_user.id
             
-            # Get recent workouts and diet plans
-            workouts = Workout.get_user_workouts(user_id, limit=30)
-            diet_plans = DietPlan.get_user_diets(user_id, limit=30)
-            
-            # Get all exercise completions for the user
-            all_completions = ExerciseCompletion.get_user_completions(user_id)
+            # Recent workouts and diet plans plus all of the user's completions, fetched together
+            workouts, diet_plans, all_completions, all_diet_completions = await asyncio.gather(
+                AsyncWorkout.get_user_workouts(user_id, limit=30),
+                AsyncDietPlan.get_user_diets(user_id, limit=30),
+                AsyncExerciseCompletion.get_user_completions(user_id),
+                AsyncDietCompletion.get_user_completions(user_id)
+            )
             total_completed_exercises = len([c for c in all_completions if c.get('status') == 'completed'])
             total_skipped_exercises = len([c for c in all_completions if c.get('status') == 'skipped'])
 
-            # Get all diet completions for the user
-            all_diet_completions = DietCompletion.get_user_completions(user_id)
             total_completed_meals = len([c for c in all_diet_completions if c.get('status') == 'completed'])
             total_skipped_meals = len([c for c in all_diet_completions if c.get('status') == 'skipped'])
 
@@ -1510,6 +1636,15 @@ class BotHandlers:
             recent_workouts = sorted(workouts, 
                                   key=lambda x: x.scheduled_date or x.created_date, 
                                   reverse=True)[:5]
+            recent_diets = sorted(diet_plans, 
+                                key=lambda x: x.get('scheduled_date') or x.get('created_date'), 
+                                reverse=True)[:3]
+            
+            # Completions of every listed workout and diet, one query each
+            completions_by_workout, completions_by_diet = await asyncio.gather(
+                AsyncExerciseCompletion.get_for_workouts([w.id for w in recent_workouts]),
+                AsyncDietCompletion.get_for_diets([d.get('id') for d in recent_diets])
+            )
             
             for workout in recent_workouts:
                 date_str = workout.scheduled_date or workout.created_date
@@ -1522,7 +1657,7 @@ class BotHandlers:
                 workout_type = workout.workout_content.get('workout_type', 'Workout') if workout.workout_content else 'Workout'
                 
                 # Get exercise completion for this workout
-                workout_completions = ExerciseCompletion.get_workout_completions(workout.id)
+                workout_completions = completions_by_workout.get(workout.id, [])
                 exercises_done = len([c for c in workout_completions if c.get('status') == 'completed'])
                 exercises_skipped = len([c for c in workout_completions if c.get('status') == 'skipped'])
                 total_exercises = workout.total_exercises or 0
@@ -1539,10 +1674,6 @@ class BotHandlers:
                 message += "\n"
 
             # Add recent diet activity
-            recent_diets = sorted(diet_plans, 
-                                key=lambda x: x.get('scheduled_date') or x.get('created_date'), 
-                                reverse=True)[:3]
-            
             if recent_diets:
                 message += "🍽️ **Recent Diet Activity**\n"
                 for diet in recent_diets:
@@ -1555,7 +1686,7 @@ class BotHandlers:
                     status_emoji = "✅" if diet.get('status') == "completed" else "⏭️" if diet.get('status') == "skipped" else "⏳"
                     
                     # Get meal completion for this diet
-                    diet_completions = DietCompletion.get_diet_completions(diet.get('id'))
+                    diet_completions = completions_by_diet.get(diet.get('id'), [])
                     meals_done = len([c for c in diet_completions if c.get('status') == 'completed'])
                     meals_skipped = len([c for c in diet_completions if c.get('status') == 'skipped'])
                     total_meals = len(diet_completions)
@@ -1635,85 +1766,48 @@ class BotHandlers:
     async def test_reminders_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Test command to create reminders manually"""
         user_id = update.effective_user.id
-        user = User.get_by_user_id(user_id)
+        user = await AsyncUser.get_by_user_id(user_id)
         
         if not user or not user.is_complete_profile():
             await update.message.reply_text("Please complete your profile first using /start.")
             return
         
         try:
-            # Create test reminders for the near future (2-5 minutes from now)
-            from datetime import datetime, timedelta
-            
-            # Create multiple test reminders
-            test_reminders = []
-            
-            # Reminder 1: 2 minutes from now
-            test_time_1 = (datetime.now() + timedelta(minutes=2)).strftime('%H:%M')
-            reminder_1 = Reminder.create_reminder(
-                user_id=user_id,
-                reminder_type='workout',
-                scheduled_time=test_time_1,
-                content={
-                    'workout_type': 'Test Workout 1',
-                    'duration_minutes': 30,
-                    'calories_estimate': 250
-                },
-                related_id=1,
-                related_type='workout'
-            )
-            if reminder_1:
-                test_reminders.append(f"✅ Workout at {test_time_1} (ID: {reminder_1.get('id')})")
-            
-            # Reminder 2: 3 minutes from now
-            test_time_2 = (datetime.now() + timedelta(minutes=3)).strftime('%H:%M')
-            reminder_2 = Reminder.create_reminder(
-                user_id=user_id,
-                reminder_type='breakfast',
-                scheduled_time=test_time_2,
-                content={
-                    'meal_name': 'Test Breakfast',
-                    'total_calories': 400
-                },
-                related_id=2,
-                related_type='diet'
-            )
-            if reminder_2:
-                test_reminders.append(f"✅ Breakfast at {test_time_2} (ID: {reminder_2.get('id')})")
-            
-            # Reminder 3: 4 minutes from now
-            test_time_3 = (datetime.now() + timedelta(minutes=4)).strftime('%H:%M')
-            reminder_3 = Reminder.create_reminder(
-                user_id=user_id,
-                reminder_type='lunch',
-                scheduled_time=test_time_3,
-                content={
-                    'meal_name': 'Test Lunch',
-                    'total_calories': 600
-                },
-                related_id=3,
-                related_type='diet'
-            )
-            if reminder_3:
-                test_reminders.append(f"✅ Lunch at {test_time_3} (ID: {reminder_3.get('id')})")
-            
-            # Check pending reminders
-            from src.database.models import Reminder
-            pending = Reminder.get_pending_reminders()
+            # Test reminders that go out 2, 3 and 4 minutes from now. Reminders
+            # fire 5 minutes before their scheduled time, read in Config.TIMEZONE.
+            now = local_now()
+            tests = [
+                (2, 'workout', {'workout_type': 'Test Workout 1', 'duration_minutes': 30, 'calories_estimate': 250}, 1, 'workout'),
+                (3, 'breakfast', {'meal_name': 'Test Breakfast', 'total_calories': 400}, 2, 'diet'),
+                (4, 'lunch', {'meal_name': 'Test Lunch', 'total_calories': 600}, 3, 'diet')
+            ]
+            reminders = []
+            for minutes, reminder_type, content, related_id, related_type in tests:
+                scheduled = now + timedelta(minutes=minutes + 5)
+                reminders.append(Reminder.build(
+                    user_id=user_id,
+                    reminder_type=reminder_type,
+                    scheduled_time=scheduled.strftime('%H:%M'),
+                    content=content,
+                    related_id=related_id,
+                    related_type=related_type,
+                    scheduled_date=scheduled.date()
+                ))
+            
+            # One insert, then straight to the scheduler so they fire on time
+            created = await AsyncReminder.bulk_create(reminders)
+            get_services(context).reminder_service.schedule_reminders(created)
             
             # Create response message
             message = f"🧪 **Test Reminders Created!**\n\n"
-            message += "Created the following test reminders:\n"
-            for reminder in test_reminders:
-                message += f"• {reminder}\n"
-            
-            message += f"\n📊 **Pending Reminders**: {len(pending)}\n"
-            if pending:
-                message += "You should receive notifications soon!\n\n"
-                for r in pending:
-                    message += f"• {r.reminder_type.title()} at {r.reminder_time}\n"
+            if created:
+                message += "You should receive these notifications soon:\n"
+                for reminder in created:
+                    due = reminder.due_at.astimezone(now.tzinfo).strftime('%H:%M')
+                    message += f"• {reminder.reminder_type.title()} at {due} (ID: {reminder.id})\n"
+                message += "\n"
             else:
-                message += "No pending reminders found.\n\n"
+                message += "No test reminders could be created.\n\n"
             
             message += "⏰ **Reminder System Status**:\n"
             message += "• Reminders are created 5 minutes before scheduled time\n"
@@ -1788,8 +1882,7 @@ class BotHandlers:
             status_emoji = "✅" if status == 'completed' else "⏭️"
 
             # Get the diet plan
-            from src.database.models import DietPlan, DietCompletion
-            user_diets = DietPlan.get_user_diets(user_id, limit=10)
+            user_diets = await AsyncDietPlan.get_user_diets(user_id, limit=10)
             diet_data = next((d for d in user_diets if d.get('id') == diet_id), None)
             
             if not diet_data:
@@ -1808,7 +1901,7 @@ class BotHandlers:
             )
 
             # Check if meal was already completed/skipped
-            if DietCompletion.exists(diet_id, meal_type):
+            if await AsyncDietCompletion.exists(diet_id, meal_type):
                 await query.answer(f"⚠️ This meal was already marked as {status}.", show_alert=True)
                 return
 
@@ -1825,16 +1918,16 @@ class BotHandlers:
             
             # Mark meal as completed/skipped
             if action == 'complete':
-                success = diet.mark_meal_completed(meal_type, meal_name)
+                success = await AsyncDietPlan.mark_meal_completed(diet, meal_type, meal_name)
             else:
-                success = diet.mark_meal_skipped(meal_type, meal_name)
+                success = await AsyncDietPlan.mark_meal_skipped(diet, meal_type, meal_name)
 
             if not success:
                 await query.answer(f"❌ Error marking meal as {status}.", show_alert=True)
                 return
 
             # Get updated completion counts
-            completions = DietCompletion.get_diet_completions(diet_id)
+            completions = await AsyncDietCompletion.get_diet_completions(diet_id)
             completed_meals = len([c for c in completions if c.get('status') == 'completed'])
             skipped_meals = len([c for c in completions if c.get('status') == 'skipped'])
             total_meals = len(completions)
@@ -2,9 +2,9 @@ import logging
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 from config.config import Config
 from src.bot.handlers import BotHandlers
-import asyncio
-import threading
-import time
+from src.services.container import install_services
+from src.database.session_store import session_store
+from src.database.chat_log_writer import chat_log_writer
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -15,11 +15,36 @@ logger = logging.getLogger(__name__)
 class WorkoutBot:
     def __init__(self):
         """Initialize the workout bot"""
-        self.application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
-        self.handlers = BotHandlers()
+        self.application = (
+            Application.builder()
+            .token(Config.TELEGRAM_BOT_TOKEN)
+            .post_init(self._post_init)
+            .post_stop(self._post_stop)
+            .post_shutdown(self._post_shutdown)
+            .build()
+        )
+        self.services = install_services(self.application)
+        self.handlers = self.services.handlers
         self.reminder_service = None
-        self.reminder_thread = None
-        self.stop_reminders = False
+    
+    async def _post_init(self, application):
+        """Start background services that live on the bot's event loop"""
+        await session_store.start()
+        await chat_log_writer.start()
+        self.start_reminder_service()
+        if Config.PREGENERATION_ENABLED:
+            self.services.pregeneration_service.start_background()
+    
+    async def _post_stop(self, application):
+        """Let in-flight reminders finish while the bot can still send"""
+        await self.stop_reminder_service()
+        if Config.PREGENERATION_ENABLED:
+            await self.services.pregeneration_service.shutdown()
+    
+    async def _post_shutdown(self, application):
+        """Persist buffered state before the process exits"""
+        await chat_log_writer.stop()
+        await session_store.stop()
     
     def setup_handlers(self):
         """Set up all bot handlers"""
@@ -79,40 +104,23 @@ class WorkoutBot:
         logger.info("All handlers set up successfully")
     
     def start_reminder_service(self):
-        """Start the reminder service in a background thread"""
+        """Start the reminder service as a task on the application's event loop"""
         try:
-            from src.services.reminder_service import ReminderService
-            self.reminder_service = ReminderService(self.application.bot)
-            
-            # Start reminder service in a separate thread
-            self.reminder_thread = threading.Thread(target=self._run_reminder_service, daemon=True)
-            self.reminder_thread.start()
-            
+            self.reminder_service = self.services.reminder_service
+            self.reminder_service.start_background()
             logger.info("Reminder service started successfully")
         except Exception as e:
             logger.error(f"Failed to start reminder service: {e}")
     
-    def _run_reminder_service(self):
-        """Run the reminder service in a separate thread"""
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(self.reminder_service.start())
-        except Exception as e:
-            logger.error(f"Reminder service error: {e}")
-    
-    def stop_reminder_service(self):
-        """Stop the reminder service"""
+    async def stop_reminder_service(self):
+        """Stop the reminder service, draining the batch being sent"""
         if self.reminder_service:
-            self.reminder_service.stop()
-            self.stop_reminders = True
-            if self.reminder_thread:
-                self.reminder_thread.join(timeout=5)
-            logger.info("Reminder service stopped")
+            await self.reminder_service.shutdown()
     
     async def update_name_command(self, update, context):
         """Command to manually update user name information"""
         from src.database.models import User
+        from src.database.async_models import AsyncUser
         
         user_id = update.effective_user.id
         first_name = update.effective_user.first_name
@@ -120,7 +128,7 @@ class WorkoutBot:
         username = update.effective_user.username
         
         # Get or create user
-        user = User.get_by_user_id(user_id)
+        user = await AsyncUser.get_by_user_id(user_id)
         if not user:
             user = User(
                 user_id=user_id,
@@ -134,7 +142,7 @@ class WorkoutBot:
             user.last_name = last_name
             user.username = username
         
-        user.save()
+        await AsyncUser.save(user)
         
         await update.message.reply_text(
             f"✅ Name information updated!\n\n"
@@ -152,20 +160,19 @@ class WorkoutBot:
             self.setup_handlers()
             logger.info("Bot handlers set")
 
-            # Start reminder service
-            self.start_reminder_service()
-
             logger.info("🤖 Bot is running! Press Ctrl+C to stop.")
             
             # Start the bot
             self.application.run_polling(allowed_updates=["message", "callback_query"])
+            
+            # Release the DB worker threads once polling has stopped
+            from src.database.async_models import shutdown_db_executor
+            shutdown_db_executor()
 
         except KeyboardInterrupt:
             logger.info("Bot stopped by user")
-            self.stop_reminder_service()
         except Exception as e:
             logger.error(f"Bot crashed: {e}")
-            self.stop_reminder_service()
             raise
 
 def main():
@@ -0,0 +1,183 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any
+from config.config import Config
+from src.database.models import (
+    User, Workout, DietPlan, ExerciseCompletion, DietCompletion,
+    UserSession, Reminder, ChatMessage
+)
+
+logger = logging.getLogger(__name__)
+
+# The supabase client is synchronous, so every query is pushed onto a bounded
+# pool of worker threads instead of running on the bot's event loop.
+_db_executor = ThreadPoolExecutor(
+    max_workers=Config.DB_MAX_WORKERS,
+    thread_name_prefix='supabase-db'
+)
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking database call on the DB executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(func, *args, **kwargs))
+
+def shutdown_db_executor(wait: bool = True):
+    """Stop the DB executor (call once the bot has stopped)"""
+    _db_executor.shutdown(wait=wait)
+    logger.info("Database executor shut down")
+
+class AsyncUser:
+    """Awaitable counterpart of User"""
+
+    @staticmethod
+    async def get_by_user_id(user_id: int) -> Optional[User]:
+        return await run_db(User.get_by_user_id, user_id)
+
+    @staticmethod
+    async def save(user: User):
+        return await run_db(user.save)
+
+class AsyncUserSession:
+    """Awaitable counterpart of UserSession"""
+
+    @staticmethod
+    async def get_by_user_id(user_id: int) -> Optional[UserSession]:
+        return await run_db(UserSession.get_by_user_id, user_id)
+
+    @staticmethod
+    async def save(session: UserSession):
+        return await run_db(session.save)
+
+    @staticmethod
+    async def update_state(session: UserSession, new_state: str, temp_data: Optional[Dict] = None):
+        return await run_db(session.update_state, new_state, temp_data)
+
+class AsyncWorkout:
+    """Awaitable counterpart of Workout"""
+
+    @staticmethod
+    async def get_user_workouts(user_id: int, limit: int = 10) -> list:
+        return await run_db(Workout.get_user_workouts, user_id, limit)
+
+    @staticmethod
+    async def get_today_workout(user_id: int) -> Optional[Workout]:
+        return await run_db(Workout.get_today_workout, user_id)
+
+    @staticmethod
+    async def save(workout: Workout):
+        return await run_db(workout.save)
+
+    @staticmethod
+    async def mark_completed(workout: Workout):
+        return await run_db(workout.mark_completed)
+
+    @staticmethod
+    async def refresh_completion_count(workout: Workout) -> bool:
+        return await run_db(workout.refresh_completion_count)
+
+class AsyncDietPlan:
+    """Awaitable counterpart of DietPlan"""
+
+    @staticmethod
+    async def get_user_diets(user_id: int, limit: int = 10) -> list:
+        return await run_db(DietPlan.get_user_diets, user_id, limit)
+
+    @staticmethod
+    async def get_today_diet(user_id: int) -> Optional[DietPlan]:
+        return await run_db(DietPlan.get_today_diet, user_id)
+
+    @staticmethod
+    async def save(diet: DietPlan):
+        return await run_db(diet.save)
+
+    @staticmethod
+    async def mark_meal_completed(diet: DietPlan, meal_type: str, meal_name: str) -> bool:
+        return await run_db(diet.mark_meal_completed, meal_type, meal_name)
+
+    @staticmethod
+    async def mark_meal_skipped(diet: DietPlan, meal_type: str, meal_name: str) -> bool:
+        return await run_db(diet.mark_meal_skipped, meal_type, meal_name)
+
+class AsyncExerciseCompletion:
+    """Awaitable counterpart of ExerciseCompletion"""
+
+    @staticmethod
+    async def create(workout_id: int, exercise_name: str, exercise_index: int, status: str = 'completed'):
+        return await run_db(ExerciseCompletion.create, workout_id, exercise_name, exercise_index, status)
+
+    @staticmethod
+    async def exists(workout_id: int, exercise_index: int) -> bool:
+        return await run_db(ExerciseCompletion.exists, workout_id, exercise_index)
+
+    @staticmethod
+    async def get_workout_completions(workout_id: int) -> list:
+        return await run_db(ExerciseCompletion.get_workout_completions, workout_id)
+
+    @staticmethod
+    async def get_user_completions(user_id: int) -> list:
+        return await run_db(ExerciseCompletion.get_user_completions, user_id)
+
+    @staticmethod
+    async def get_for_workouts(workout_ids: list) -> Dict[int, list]:
+        return await run_db(ExerciseCompletion.get_for_workouts, workout_ids)
+
+class AsyncDietCompletion:
+    """Awaitable counterpart of DietCompletion"""
+
+    @staticmethod
+    async def exists(diet_id: int, meal_type: str) -> bool:
+        return await run_db(DietCompletion.exists, diet_id, meal_type)
+
+    @staticmethod
+    async def get_diet_completions(diet_id: int) -> list:
+        return await run_db(DietCompletion.get_diet_completions, diet_id)
+
+    @staticmethod
+    async def get_user_completions(user_id: int) -> list:
+        return await run_db(DietCompletion.get_user_completions, user_id)
+
+    @staticmethod
+    async def get_for_diets(diet_ids: list) -> Dict[int, list]:
+        return await run_db(DietCompletion.get_for_diets, diet_ids)
+
+class AsyncReminder:
+    """Awaitable counterpart of Reminder"""
+
+    @staticmethod
+    async def get_pending_reminders() -> list:
+        return await run_db(Reminder.get_pending_reminders)
+
+    @staticmethod
+    async def get_user_reminders(user_id: int, date: str = None) -> list:
+        return await run_db(Reminder.get_user_reminders, user_id, date)
+
+    @staticmethod
+    async def create_reminder(user_id: int, reminder_type: str, scheduled_time: str,
+                              content: Dict[str, Any], related_id: int, related_type: str):
+        return await run_db(Reminder.create_reminder, user_id, reminder_type, scheduled_time,
+                            content, related_id, related_type)
+
+    @staticmethod
+    async def bulk_create(reminders: list) -> list:
+        return await run_db(Reminder.bulk_create, reminders)
+
+    @staticmethod
+    async def mark_sent(reminder: Reminder):
+        return await run_db(reminder.mark_sent)
+
+    @staticmethod
+    async def mark_failed(reminder: Reminder):
+        return await run_db(reminder.mark_failed)
+
+class AsyncChatMessage:
+    """Awaitable counterpart of ChatMessage"""
+
+    @staticmethod
+    async def create_user_message(user_id: int, message_text: str, **kwargs):
+        return await run_db(ChatMessage.create_user_message, user_id, message_text, **kwargs)
+
+    @staticmethod
+    async def create_bot_message(user_id: int, message_text: str, **kwargs):
+        return await run_db(ChatMessage.create_bot_message, user_id, message_text, **kwargs)
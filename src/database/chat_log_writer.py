@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Dict, List
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+class ChatLogWriter:
+    """Buffered writer for chat_messages
+
+    Logging a message only appends its row to a bounded in-memory queue; a
+    background task bulk-inserts the queue every flush_interval_ms or as
+    soon as batch_size rows are waiting. When the queue is full the oldest
+    rows are dropped (and counted) so a slow database can never grow memory
+    or block a reply. Remaining rows are written on shutdown. When the
+    writer is not running (dashboard, scripts) rows are inserted directly.
+    """
+
+    def __init__(self, flush_interval_ms: int = 500, batch_size: int = 200, max_queue: int = 10000):
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._running = False
+        self._task = None
+        self._loop = None
+        self._wake = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def log_user_message(self, user_id: int, message_text: str, **kwargs):
+        """Queue a user message (same arguments as ChatMessage.create_user_message)"""
+        from src.database.models import ChatMessage
+        self.enqueue(ChatMessage.build_user_message(user_id, message_text, **kwargs)._to_row())
+
+    def log_bot_message(self, user_id: int, message_text: str, **kwargs):
+        """Queue a bot message (same arguments as ChatMessage.create_bot_message)"""
+        from src.database.models import ChatMessage
+        self.enqueue(ChatMessage.build_bot_message(user_id, message_text, **kwargs)._to_row())
+
+    def enqueue(self, row: Dict):
+        """Add a chat_messages row to the queue; safe to call from any thread"""
+        if not self._running:
+            self._write_through(row)
+            return
+
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning(f"Chat log queue full, dropped {self.dropped} messages so far")
+            self._queue.append(row)
+            queued = len(self._queue)
+
+        if queued >= self.batch_size:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _write_through(self, row: Dict):
+        from src.database.models import ChatMessage
+        try:
+            ChatMessage.bulk_insert([row])
+        except Exception as e:
+            logger.error(f"Error saving chat message for user {row.get('user_id')}: {e}")
+
+    def _take_batch(self) -> List[Dict]:
+        with self._lock:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    async def flush(self):
+        """Write everything currently queued"""
+        from src.database.async_models import run_db
+        from src.database.models import ChatMessage
+
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                break
+            try:
+                self.written += await run_db(ChatMessage.bulk_insert, batch)
+            except Exception as e:
+                # Chat history is best effort: drop the batch rather than retry forever
+                self.failed += len(batch)
+                logger.error(f"Error writing {len(batch)} chat messages: {e}")
+
+    async def _flush_loop(self):
+        while self._running:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error in chat log flush loop: {e}")
+
+    async def start(self):
+        """Start queueing messages and flushing them in the background"""
+        if self._running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._running = True
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info("Chat log writer started")
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still queued"""
+        if not self._running:
+            return
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        logger.info(f"Chat log writer stopped ({self.written} written, {self.dropped} dropped, {self.failed} failed)")
+
+    def stats(self) -> Dict[str, int]:
+        """Queue counters for monitoring"""
+        with self._lock:
+            queued = len(self._queue)
+        return {
+            'queued': queued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed
+        }
+
+# Create a global instance
+chat_log_writer = ChatLogWriter(
+    flush_interval_ms=Config.CHAT_LOG_FLUSH_INTERVAL_MS,
+    batch_size=Config.CHAT_LOG_BATCH_SIZE,
+    max_queue=Config.CHAT_LOG_MAX_QUEUE
+)
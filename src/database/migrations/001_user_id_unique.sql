@@ -0,0 +1,33 @@
+-- User.save / UserSession.save upsert with on_conflict='user_id',
+-- which needs a unique index on that column.
+
+-- The old select-then-insert path could race and store a user_id twice.
+-- Keep the most recently updated row of each user_id (highest id on a tie)
+-- so the indexes below can be built.
+DELETE FROM users
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY user_id ORDER BY updated_at DESC NULLS LAST, id DESC
+        ) AS rank
+        FROM users
+    ) ranked
+    WHERE rank > 1
+);
+
+DELETE FROM user_sessions
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY user_id ORDER BY updated_at DESC NULLS LAST, id DESC
+        ) AS rank
+        FROM user_sessions
+    ) ranked
+    WHERE rank > 1
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS users_user_id_key
+    ON users (user_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS user_sessions_user_id_key
+    ON user_sessions (user_id);
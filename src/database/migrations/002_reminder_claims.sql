@@ -0,0 +1,13 @@
+-- Reminder.claim moves due rows from 'pending' to 'sending' and records
+-- which worker holds them until lease_expires_at.
+ALTER TABLE reminders
+    ADD COLUMN IF NOT EXISTS claimed_by TEXT,
+    ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+
+-- Reminder.release_expired_claims looks up stale 'sending' rows
+CREATE INDEX IF NOT EXISTS reminders_sending_lease_idx
+    ON reminders (lease_expires_at)
+    WHERE status = 'sending';
+
+-- A claimed reminder that can never be delivered (unknown user, bot
+-- blocked) goes straight to 'failed' rather than back to 'pending'.
@@ -0,0 +1,21 @@
+-- Reminders carry an absolute due time so the scheduler can query a
+-- bounded window instead of every pending row ever created.
+ALTER TABLE reminders
+    ADD COLUMN IF NOT EXISTS due_at TIMESTAMPTZ;
+
+-- Backfill existing rows: reminder_time on the day the reminder was created,
+-- read in the bot's TIMEZONE. Set it for the session first, e.g.
+--   SET app.timezone = 'Europe/Berlin';
+-- (falls back to UTC, the TIMEZONE default, when unset)
+UPDATE reminders
+SET due_at = ((created_at AT TIME ZONE tz.name)::date + reminder_time::time) AT TIME ZONE tz.name
+FROM (SELECT COALESCE(NULLIF(current_setting('app.timezone', true), ''), 'UTC') AS name) AS tz
+WHERE due_at IS NULL;
+
+-- Rows that can no longer be sent are expired by the sweeper
+-- (Reminder.expire_stale); 'expired' joins the existing status values.
+
+-- Reminder.get_upcoming_reminders / expire_stale: status = 'pending' AND due_at in a window
+CREATE INDEX IF NOT EXISTS reminders_pending_due_at_idx
+    ON reminders (due_at)
+    WHERE status = 'pending';
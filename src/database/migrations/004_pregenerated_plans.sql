@@ -0,0 +1,9 @@
+-- The nightly batch stores plans with status = 'pregenerated';
+-- /schedule claims them by (user_id, scheduled_date).
+CREATE INDEX IF NOT EXISTS workouts_pregenerated_idx
+    ON workouts (scheduled_date, user_id)
+    WHERE status = 'pregenerated';
+
+CREATE INDEX IF NOT EXISTS diet_plans_pregenerated_idx
+    ON diet_plans (scheduled_date, user_id)
+    WHERE status = 'pregenerated';
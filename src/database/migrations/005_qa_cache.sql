@@ -0,0 +1,13 @@
+-- Persistent tier of the Q&A answer cache (src/gemini/answer_cache.py).
+-- cache_key = profile bucket + normalized question.
+CREATE TABLE IF NOT EXISTS qa_cache (
+    cache_key TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    profile_bucket TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS qa_cache_expires_at_idx
+    ON qa_cache (expires_at);
@@ -1,12 +1,27 @@
-from datetime import datetime, date
+from datetime import datetime, date, timedelta, timezone
+from zoneinfo import ZoneInfo
 from typing import Optional, Dict, Any
 import json
 import logging
 from src.database.supabase_client import supabase_client
+from src.database.cache import TTLCache
+from src.database.session_store import session_store
+from config.config import Config
 
 logger = logging.getLogger(__name__)
 
+def local_now() -> datetime:
+    """Current time in Config.TIMEZONE, the zone plans and reminders are dated in"""
+    return datetime.now(ZoneInfo(Config.TIMEZONE))
+
+def local_today() -> date:
+    """Today's date in Config.TIMEZONE; use it for every scheduled_date and completion_date"""
+    return local_now().date()
+
 class User:
+    # Read-through cache of users rows keyed by Telegram user_id
+    profile_cache = TTLCache(maxsize=Config.PROFILE_CACHE_SIZE, ttl=Config.PROFILE_CACHE_TTL, name='profiles')
+    
     def __init__(self, user_id: int, age: Optional[int] = None, height: Optional[float] = None, 
                  weight: Optional[float] = None, fitness_level: Optional[str] = None, 
                  goals: Optional[str] = None, id: Optional[int] = None, 
@@ -35,80 +50,155 @@ class User:
         self.username = username
         self.trainer_id = trainer_id
     
+    def _to_row(self) -> Dict[str, Any]:
+        """Column values written for this user"""
+        return {
+            'user_id': self.user_id,
+            'age': self.age,
+            'height': self.height,
+            'weight': self.weight,
+            'fitness_level': self.fitness_level,
+            'goals': self.goals,
+            'workout_time': self.workout_time,
+            'breakfast_time': self.breakfast_time,
+            'lunch_time': self.lunch_time,
+            'dinner_time': self.dinner_time,
+            'snack_time': self.snack_time,
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'username': self.username,
+            'trainer_id': self.trainer_id,
+            'updated_at': datetime.now().isoformat()
+        }
+    
     def save(self):
-        """Save user to database"""
+        """Save user to database (single upsert on user_id)"""
         try:
-            user_data = {
-                'user_id': self.user_id,
-                'age': self.age,
-                'height': self.height,
-                'weight': self.weight,
-                'fitness_level': self.fitness_level,
-                'goals': self.goals,
-                'workout_time': self.workout_time,
-                'breakfast_time': self.breakfast_time,
-                'lunch_time': self.lunch_time,
-                'dinner_time': self.dinner_time,
-                'snack_time': self.snack_time,
-                'first_name': self.first_name,
-                'last_name': self.last_name,
-                'username': self.username,
-                'trainer_id': self.trainer_id,
-                'updated_at': datetime.now().isoformat()
-            }
-            
-            # Check if user already exists
-            existing = supabase_client.client.table('users').select('*').eq('user_id', self.user_id).execute()
-            
-            if existing.data:
-                # Update existing user
-                result = supabase_client.client.table('users').update(user_data).eq('user_id', self.user_id).execute()
-                logger.info(f"Updated user {self.user_id}")
-            else:
-                # Create new user
-                result = supabase_client.client.table('users').insert(user_data).execute()
-                logger.info(f"Created new user {self.user_id}")
+            result = supabase_client.client.table('users').upsert(
+                self._to_row(), on_conflict='user_id'
+            ).execute()
             
-            return result.data[0] if result.data else None
+            if result.data:
+                logger.info(f"Saved user {self.user_id}")
+                # Keep the profile cache in step with what was written
+                User.profile_cache.set(self.user_id, result.data[0])
+                self.id = result.data[0].get('id', self.id)
+                return result.data[0]
+            User.profile_cache.invalidate(self.user_id)
+            return None
             
         except Exception as e:
             logger.error(f"Error saving user {self.user_id}: {e}")
+            User.profile_cache.invalidate(self.user_id)
             return None
     
+    @staticmethod
+    def bulk_upsert(users: list) -> list:
+        """Save many users in one round trip; returns the written rows"""
+        # One row per user_id, last write wins (Postgres rejects duplicate keys in one upsert)
+        rows = list({user.user_id: user._to_row() for user in users}.values())
+        if not rows:
+            return []
+        try:
+            result = supabase_client.client.table('users').upsert(rows, on_conflict='user_id').execute()
+            for data in result.data or []:
+                User.profile_cache.set(data['user_id'], data)
+            return result.data or []
+        except Exception as e:
+            logger.error(f"Error bulk saving {len(rows)} users: {e}")
+            for row in rows:
+                User.profile_cache.invalidate(row['user_id'])
+            return []
+    
     @classmethod
     def get_by_user_id(cls, user_id: int):
         """Get user by Telegram user ID"""
+        data = cls.profile_cache.get(user_id)
+        if data is not None:
+            return cls._from_row(data)
+        
         try:
             result = supabase_client.client.table('users').select('*').eq('user_id', user_id).execute()
             
             if result.data:
                 data = result.data[0]
-                return cls(
-                    id=data['id'],
-                    user_id=data['user_id'],
-                    age=data['age'],
-                    height=data['height'],
-                    weight=data['weight'],
-                    fitness_level=data['fitness_level'],
-                    goals=data['goals'],
-                    created_at=data['created_at'],
-                    updated_at=data['updated_at'],
-                    workout_time=data.get('workout_time'),
-                    breakfast_time=data.get('breakfast_time'),
-                    lunch_time=data.get('lunch_time'),
-                    dinner_time=data.get('dinner_time'),
-                    snack_time=data.get('snack_time'),
-                    first_name=data.get('first_name'),
-                    last_name=data.get('last_name'),
-                    username=data.get('username'),
-                    trainer_id=data.get('trainer_id')
-                )
+                cls.profile_cache.set(user_id, data)
+                return cls._from_row(data)
             return None
             
         except Exception as e:
             logger.error(f"Error getting user {user_id}: {e}")
             return None
     
+    @classmethod
+    def get_by_user_ids(cls, user_ids: list) -> Dict[int, 'User']:
+        """Get many users at once (cache first, one `in` query for the rest)"""
+        users = {}
+        missing = []
+        for user_id in set(user_ids):
+            data = cls.profile_cache.get(user_id)
+            if data is not None:
+                users[user_id] = cls._from_row(data)
+            else:
+                missing.append(user_id)
+        
+        if missing:
+            try:
+                result = supabase_client.client.table('users').select('*').in_('user_id', missing).execute()
+                for data in result.data:
+                    cls.profile_cache.set(data['user_id'], data)
+                    users[data['user_id']] = cls._from_row(data)
+            except Exception as e:
+                logger.error(f"Error getting {len(missing)} users: {e}")
+        
+        return users
+    
+    @classmethod
+    def _from_row(cls, data: Dict[str, Any]):
+        """Build a fresh User from a users row (callers may mutate it freely)"""
+        return cls(
+            id=data['id'],
+            user_id=data['user_id'],
+            age=data['age'],
+            height=data['height'],
+            weight=data['weight'],
+            fitness_level=data['fitness_level'],
+            goals=data['goals'],
+            created_at=data['created_at'],
+            updated_at=data['updated_at'],
+            workout_time=data.get('workout_time'),
+            breakfast_time=data.get('breakfast_time'),
+            lunch_time=data.get('lunch_time'),
+            dinner_time=data.get('dinner_time'),
+            snack_time=data.get('snack_time'),
+            first_name=data.get('first_name'),
+            last_name=data.get('last_name'),
+            username=data.get('username'),
+            trainer_id=data.get('trainer_id')
+        )
+    
+    @classmethod
+    def get_complete_profiles(cls, page_size: int = 1000) -> list:
+        """Get every user whose profile is complete (read in pages)"""
+        users = []
+        try:
+            start = 0
+            while True:
+                result = supabase_client.client.table('users').select('*') \
+                    .order('user_id').range(start, start + page_size - 1).execute()
+                for data in result.data:
+                    user = cls._from_row(data)
+                    if user.is_complete_profile():
+                        users.append(user)
+                if len(result.data) < page_size:
+                    break
+                start += page_size
+            
+        except Exception as e:
+            logger.error(f"Error getting complete profiles: {e}")
+        
+        return users
+    
     def is_complete_profile(self) -> bool:
         """Check if user has completed their profile"""
         required_fields = [self.age, self.height, self.weight, self.fitness_level, self.goals]
@@ -183,32 +273,47 @@ class Workout:
     def get_user_workouts(cls, user_id: int, limit: int = 10):
         """Get recent workouts for a user"""
         try:
-            result = supabase_client.client.table('workouts').select('*').eq('user_id', user_id).order('created_date', desc=True).limit(limit).execute()
-            
-            workouts = []
-            for data in result.data:
-                workout = cls(
-                    id=data['id'],
-                    user_id=data['user_id'],
-                    workout_content=data['workout_content'],
-                    status=data['status'],
-                    trainer_feedback=data['trainer_feedback'],
-                    created_date=data['created_date'],
-                    completion_date=data['completion_date'],
-                    scheduled_date=data.get('scheduled_date'),
-                    workout_type=data.get('workout_type', 'daily'),
-                    exercises_completed=data.get('exercises_completed', 0),
-                    total_exercises=data.get('total_exercises', 0),
-                    skipped_exercises=data.get('skipped_exercises', 0)
-                )
-                workouts.append(workout)
+            result = supabase_client.client.table('workouts').select('*').eq('user_id', user_id) \
+                .neq('status', 'pregenerated').order('created_date', desc=True).limit(limit).execute()
             
-            return workouts
+            return [cls._from_row(data) for data in result.data]
             
         except Exception as e:
             logger.error(f"Error getting workouts for user {user_id}: {e}")
             return []
     
+    @classmethod
+    def _from_row(cls, data: Dict[str, Any]):
+        """Build a Workout from a workouts row"""
+        return cls(
+            id=data['id'],
+            user_id=data['user_id'],
+            workout_content=data['workout_content'],
+            status=data['status'],
+            trainer_feedback=data.get('trainer_feedback'),
+            created_date=data['created_date'],
+            completion_date=data['completion_date'],
+            scheduled_date=data.get('scheduled_date'),
+            workout_type=data.get('workout_type', 'daily'),
+            exercises_completed=data.get('exercises_completed', 0),
+            total_exercises=data.get('total_exercises', 0),
+            skipped_exercises=data.get('skipped_exercises', 0)
+        )
+    
+    @classmethod
+    def get_by_ids(cls, workout_ids: list) -> Dict[int, 'Workout']:
+        """Get many workouts by id with one `in` query"""
+        workout_ids = list(set(workout_ids))
+        if not workout_ids:
+            return {}
+        try:
+            result = supabase_client.client.table('workouts').select('*').in_('id', workout_ids).execute()
+            return {data['id']: cls._from_row(data) for data in result.data}
+            
+        except Exception as e:
+            logger.error(f"Error getting {len(workout_ids)} workouts: {e}")
+            return {}
+    
     def mark_completed(self):
         """Mark workout as completed"""
         self.status = 'completed'
@@ -236,25 +341,65 @@ class Workout:
     @staticmethod
     def get_today_workout(user_id: int):
         try:
-            today = datetime.now().date().isoformat()
+            today = local_today().isoformat()
             result = supabase_client.client.table('workouts').select('*') \
-                .eq('user_id', user_id).eq('scheduled_date', today).limit(1).execute()
+                .eq('user_id', user_id).eq('scheduled_date', today) \
+                .neq('status', 'pregenerated').limit(1).execute()
             if result.data:
-                data = result.data[0]
-                return Workout(
-                    id=data['id'],
-                    user_id=data['user_id'],
-                    workout_content=data['workout_content'],
-                    status=data['status'],
-                    trainer_feedback=data.get('trainer_feedback'),
-                    created_date=data['created_date'],
-                    completion_date=data['completion_date']
-                )
+                return Workout._from_row(result.data[0])
             return None
         except Exception as e:
             logger.error(f"Error fetching today's workout: {e}")
             return None
 
+    @staticmethod
+    def get_pregenerated_user_ids(scheduled_date: str) -> set:
+        """User ids that already have a pre-generated workout for the date"""
+        try:
+            result = supabase_client.client.table('workouts').select('user_id') \
+                .eq('scheduled_date', scheduled_date).eq('status', 'pregenerated').execute()
+            return {data['user_id'] for data in result.data}
+        except Exception as e:
+            logger.error(f"Error getting pre-generated workouts for {scheduled_date}: {e}")
+            return set()
+    
+    @staticmethod
+    def claim_pregenerated(user_id: int, scheduled_date: str):
+        """Switch the user's pre-generated workout for the date to 'scheduled' and return it"""
+        try:
+            result = supabase_client.client.table('workouts').update({'status': 'scheduled'}) \
+                .eq('user_id', user_id).eq('scheduled_date', scheduled_date) \
+                .eq('status', 'pregenerated').execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error claiming pre-generated workout for user {user_id}: {e}")
+            return None
+    
+    @staticmethod
+    def delete_stale_pregenerated(before_date: str) -> int:
+        """Delete pre-generated workouts nobody claimed before their date passed"""
+        try:
+            result = supabase_client.client.table('workouts').delete() \
+                .eq('status', 'pregenerated').lt('scheduled_date', before_date).execute()
+            return len(result.data)
+        except Exception as e:
+            logger.error(f"Error deleting stale pre-generated workouts before {before_date}: {e}")
+            return 0
+    
+    @staticmethod
+    def replace_content(workout_id: int, workout_content: Dict) -> bool:
+        """Swap in new content for a workout the user has not started yet"""
+        try:
+            result = supabase_client.client.table('workouts').update({
+                'workout_content': workout_content,
+                'total_exercises': len(workout_content.get('exercises', []))
+            }).eq('id', workout_id).in_('status', ['generated', 'scheduled']) \
+                .eq('exercises_completed', 0).eq('skipped_exercises', 0).execute()
+            return bool(result.data)
+        except Exception as e:
+            logger.error(f"Error replacing content of workout {workout_id}: {e}")
+            return False
+    
     @staticmethod
     def create_scheduled_workout(user_id: int, workout_content: Dict, scheduled_date: str):
         try:
@@ -428,7 +573,7 @@ class DietPlan:
                 # Mark as completed if at least one meal is completed
                 elif completed_meals > 0:
                     self.status = "completed"
-                self.completion_date = datetime.now().date().isoformat()
+                self.completion_date = local_today().isoformat()
             
             self.save()
             return True
@@ -457,9 +602,10 @@ class DietPlan:
     def get_today_diet(user_id: int):
         """Get today's diet plan for a user"""
         try:
-            today = datetime.now().date().isoformat()
+            today = local_today().isoformat()
             result = supabase_client.client.table('diet_plans').select('*') \
-                .eq('user_id', user_id).eq('scheduled_date', today).limit(1).execute()
+                .eq('user_id', user_id).eq('scheduled_date', today) \
+                .neq('status', 'pregenerated').limit(1).execute()
             
             if result.data:
                 data = result.data[0]
@@ -478,12 +624,72 @@ class DietPlan:
             logger.error(f"Error fetching today's diet: {e}")
             return None
 
+    @staticmethod
+    def get_pregenerated_user_ids(scheduled_date: str) -> set:
+        """User ids that already have a pre-generated diet plan for the date"""
+        try:
+            result = supabase_client.client.table('diet_plans').select('user_id') \
+                .eq('scheduled_date', scheduled_date).eq('status', 'pregenerated').execute()
+            return {data['user_id'] for data in result.data}
+        except Exception as e:
+            logger.error(f"Error getting pre-generated diet plans for {scheduled_date}: {e}")
+            return set()
+    
+    @staticmethod
+    def claim_pregenerated(user_id: int, scheduled_date: str):
+        """Switch the user's pre-generated diet plan for the date to 'scheduled' and return it"""
+        try:
+            result = supabase_client.client.table('diet_plans').update({'status': 'scheduled'}) \
+                .eq('user_id', user_id).eq('scheduled_date', scheduled_date) \
+                .eq('status', 'pregenerated').execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error claiming pre-generated diet plan for user {user_id}: {e}")
+            return None
+    
+    @staticmethod
+    def delete_stale_pregenerated(before_date: str) -> int:
+        """Delete pre-generated diet plans nobody claimed before their date passed"""
+        try:
+            result = supabase_client.client.table('diet_plans').delete() \
+                .eq('status', 'pregenerated').lt('scheduled_date', before_date).execute()
+            return len(result.data)
+        except Exception as e:
+            logger.error(f"Error deleting stale pre-generated diet plans before {before_date}: {e}")
+            return 0
+    
+    @staticmethod
+    def replace_content(diet_id: int, diet_content: Dict[str, Any]) -> bool:
+        """Swap in new content for a diet plan that is still only scheduled"""
+        try:
+            result = supabase_client.client.table('diet_plans').update({'diet_content': diet_content}) \
+                .eq('id', diet_id).eq('status', 'scheduled').execute()
+            return bool(result.data)
+        except Exception as e:
+            logger.error(f"Error replacing content of diet plan {diet_id}: {e}")
+            return False
+    
+    @staticmethod
+    def get_by_ids(diet_ids: list) -> Dict[int, Dict[str, Any]]:
+        """Get many diet plan rows by id with one `in` query"""
+        diet_ids = list(set(diet_ids))
+        if not diet_ids:
+            return {}
+        try:
+            result = supabase_client.client.table('diet_plans').select('*').in_('id', diet_ids).execute()
+            return {data['id']: data for data in result.data}
+            
+        except Exception as e:
+            logger.error(f"Error getting {len(diet_ids)} diet plans: {e}")
+            return {}
+    
     @staticmethod
     def get_user_diets(user_id: int, limit: int = 10):
         """Get recent diet plans for a user"""
         try:
             result = supabase_client.client.table('diet_plans').select('*') \
-                .eq('user_id', user_id).order('created_date', desc=True).limit(limit).execute()
+                .eq('user_id', user_id).neq('status', 'pregenerated') \
+                .order('created_date', desc=True).limit(limit).execute()
             
             return result.data
             
@@ -539,6 +745,26 @@ class ExerciseCompletion:
             logger.error(f"Error getting workout completions: {e}")
             return []
 
+    @staticmethod
+    def get_for_workouts(workout_ids: list) -> Dict[int, list]:
+        """Completions for many workouts with one `in` query, keyed by workout id"""
+        workout_ids = list(set(workout_ids))
+        if not workout_ids:
+            return {}
+        try:
+            result = supabase_client.client.table('exercise_completions') \
+                .select('*') \
+                .in_('workout_id', workout_ids) \
+                .order('exercise_index') \
+                .execute()
+            completions = {workout_id: [] for workout_id in workout_ids}
+            for data in result.data or []:
+                completions.setdefault(data['workout_id'], []).append(data)
+            return completions
+        except Exception as e:
+            logger.error(f"Error getting completions for {len(workout_ids)} workouts: {e}")
+            return {}
+
     @staticmethod
     def get_user_completions(user_id: int) -> list:
         """Get all exercise completions/skips for a user across all workouts"""
@@ -570,52 +796,94 @@ class UserSession:
         self.updated_at = updated_at
     
     def save(self):
-        """Save user session to database"""
+        """Save user session (write-behind through the session store when it is running)"""
+        session_data = {
+            'user_id': self.user_id,
+            'conversation_state': self.conversation_state,
+            'temp_data': dict(self.temp_data),
+            'updated_at': datetime.now().isoformat()
+        }
+        
+        if session_store.is_running:
+            session_data['id'] = self.id
+            session_store.put(session_data)
+            return session_data
+        
         try:
-            session_data = {
-                'user_id': self.user_id,
-                'conversation_state': self.conversation_state,
-                'temp_data': self.temp_data,
-                'updated_at': datetime.now().isoformat()
-            }
-            
-            # Check if session already exists
-            existing = supabase_client.client.table('user_sessions').select('*').eq('user_id', self.user_id).execute()
-            
-            if existing.data:
-                # Update existing session
-                result = supabase_client.client.table('user_sessions').update(session_data).eq('user_id', self.user_id).execute()
-            else:
-                # Create new session
-                result = supabase_client.client.table('user_sessions').insert(session_data).execute()
-            
-            return result.data[0] if result.data else None
-            
+            return UserSession._write_row(session_data)
         except Exception as e:
             logger.error(f"Error saving session for user {self.user_id}: {e}")
             return None
     
+    @staticmethod
+    def _write_row(session_data: Dict[str, Any]):
+        """Upsert a single user_sessions row"""
+        saved = UserSession.write_rows([session_data])
+        return saved[0] if saved else None
+    
+    @staticmethod
+    def write_rows(rows: list) -> list:
+        """Upsert a batch of session rows in one round trip (used by the session store flush)"""
+        # Row ids are assigned by the database; one row per user_id, last write wins
+        rows = list({
+            row['user_id']: {k: v for k, v in row.items() if k != 'id'}
+            for row in rows
+        }.values())
+        if not rows:
+            return []
+        result = supabase_client.client.table('user_sessions').upsert(rows, on_conflict='user_id').execute()
+        return result.data or []
+    
+    @staticmethod
+    def bulk_upsert(sessions: list) -> list:
+        """Save many sessions at once, bypassing the session store; returns the written rows"""
+        rows = [{
+            'user_id': session.user_id,
+            'conversation_state': session.conversation_state,
+            'temp_data': dict(session.temp_data),
+            'updated_at': datetime.now().isoformat()
+        } for session in sessions]
+        try:
+            return UserSession.write_rows(rows)
+        except Exception as e:
+            logger.error(f"Error bulk saving {len(rows)} sessions: {e}")
+            return []
+    
     @classmethod
     def get_by_user_id(cls, user_id: int):
         """Get user session by Telegram user ID"""
+        if session_store.is_running:
+            data = session_store.get(user_id)
+            if data is not None:
+                return cls._from_row(data)
+        
         try:
             result = supabase_client.client.table('user_sessions').select('*').eq('user_id', user_id).execute()
             
             if result.data:
                 data = result.data[0]
-                return cls(
-                    id=data['id'],
-                    user_id=data['user_id'],
-                    conversation_state=data['conversation_state'],
-                    temp_data=data['temp_data'],
-                    updated_at=data['updated_at']
-                )
+                if session_store.is_running:
+                    session_store.load(data)
+                    # Another update may have cached a newer state meanwhile
+                    data = session_store.get(user_id) or data
+                return cls._from_row(data)
             return None
             
         except Exception as e:
             logger.error(f"Error getting session for user {user_id}: {e}")
             return None
     
+    @classmethod
+    def _from_row(cls, data: Dict[str, Any]):
+        """Build a UserSession from a user_sessions row"""
+        return cls(
+            id=data.get('id'),
+            user_id=data['user_id'],
+            conversation_state=data['conversation_state'],
+            temp_data=dict(data.get('temp_data') or {}),
+            updated_at=data.get('updated_at')
+        )
+    
     def update_state(self, new_state: str, temp_data: Optional[Dict] = None):
         """Update conversation state"""
         self.conversation_state = new_state
@@ -628,18 +896,24 @@ class Reminder:
                  reminder_time: str, content: Dict[str, Any], related_id: int, 
                  related_type: str, status: str = 'pending', id: Optional[int] = None,
                  created_at: Optional[datetime] = None, sent_at: Optional[datetime] = None,
-                 completed_at: Optional[datetime] = None):
+                 completed_at: Optional[datetime] = None, due_at: Optional[datetime] = None):
         self.id = id
         self.user_id = user_id
         self.reminder_type = reminder_type  # 'workout', 'breakfast', 'lunch', 'dinner', 'snack'
         self.scheduled_time = scheduled_time  # Time when the activity should happen
         self.reminder_time = reminder_time    # Time when reminder should be sent (5 min before)
         self.content = content
-        self.status = status  # 'pending', 'sent', 'completed', 'skipped'
+        self.status = status  # 'pending', 'sending', 'sent', 'failed', 'expired', 'completed', 'skipped'
         self.related_id = related_id
         self.related_type = related_type  # 'workout', 'diet'
         self.created_at = created_at
         
+        # Absolute, timezone-aware moment the reminder is due (date + reminder_time)
+        if isinstance(due_at, str):
+            self.due_at = datetime.fromisoformat(due_at.replace('Z', '+00:00'))
+        else:
+            self.due_at = due_at
+        
         # Handle sent_at - convert string to datetime if needed
         if isinstance(sent_at, str):
             try:
@@ -660,30 +934,35 @@ class Reminder:
         else:
             self.completed_at = completed_at
     
+    def _to_row(self) -> Dict[str, Any]:
+        """Column values written for this reminder"""
+        return {
+            'user_id': self.user_id,
+            'reminder_type': self.reminder_type,
+            'scheduled_time': self.scheduled_time,
+            'reminder_time': self.reminder_time,
+            'content': self.content,
+            'status': self.status,
+            'related_id': self.related_id,
+            'related_type': self.related_type,
+            'sent_at': self.sent_at.isoformat() if hasattr(self.sent_at, 'isoformat') else self.sent_at,
+            'completed_at': self.completed_at.isoformat() if hasattr(self.completed_at, 'isoformat') else self.completed_at,
+            'due_at': self.due_at.isoformat() if self.due_at else None
+        }
+    
     def save(self):
         """Save reminder to database"""
         try:
-            reminder_data = {
-                'user_id': self.user_id,
-                'reminder_type': self.reminder_type,
-                'scheduled_time': self.scheduled_time,
-                'reminder_time': self.reminder_time,
-                'content': self.content,
-                'status': self.status,
-                'related_id': self.related_id,
-                'related_type': self.related_type,
-                'sent_at': self.sent_at.isoformat() if hasattr(self.sent_at, 'isoformat') else self.sent_at,
-                'completed_at': self.completed_at.isoformat() if hasattr(self.completed_at, 'isoformat') else self.completed_at
-            }
+            reminder_data = self._to_row()
             
-            logger.info(f"Attempting to save reminder: {reminder_data}")
+            logger.debug(f"Attempting to save reminder: {reminder_data}")
             
             if self.id:
                 result = supabase_client.client.table('reminders').update(reminder_data).eq('id', self.id).execute()
-                logger.info(f"Update result: {result}")
+                logger.debug(f"Update result: {result}")
             else:
                 result = supabase_client.client.table('reminders').insert(reminder_data).execute()
-                logger.info(f"Insert result: {result}")
+                logger.debug(f"Insert result: {result}")
             
             if result.data:
                 self.id = result.data[0]['id']
@@ -699,42 +978,124 @@ class Reminder:
     
     @classmethod
     def get_pending_reminders(cls):
-        """Get all pending reminders that need to be sent"""
+        """Get pending reminders that are due now (not older than REMINDER_STALE_MINUTES)"""
+        return cls.get_upcoming_reminders(until=datetime.now(timezone.utc))
+    
+    @classmethod
+    def _from_row(cls, data: Dict[str, Any]):
+        """Build a Reminder from a reminders row"""
+        return cls(
+            id=data['id'],
+            user_id=data['user_id'],
+            reminder_type=data['reminder_type'],
+            scheduled_time=data['scheduled_time'],
+            reminder_time=data['reminder_time'],
+            content=data['content'],
+            status=data['status'],
+            related_id=data['related_id'],
+            related_type=data['related_type'],
+            created_at=data.get('created_at'),
+            sent_at=data.get('sent_at'),
+            completed_at=data.get('completed_at'),
+            due_at=data.get('due_at')
+        )
+    
+    @staticmethod
+    def compute_due_at(reminder_time: str, on_date: Optional[date] = None) -> datetime:
+        """Combine an HH:MM[:SS] reminder time with a date in Config.TIMEZONE"""
+        tz = ZoneInfo(Config.TIMEZONE)
+        fmt = '%H:%M:%S' if reminder_time.count(':') == 2 else '%H:%M'
+        on_date = on_date or local_today()
+        return datetime.combine(on_date, datetime.strptime(reminder_time, fmt).time(), tzinfo=tz)
+    
+    @classmethod
+    def get_upcoming_reminders(cls, until: datetime, since: Optional[datetime] = None, limit: int = 5000):
+        """Get pending reminders with due_at in [since, until] (uses the due_at index)"""
         try:
-            from datetime import datetime, time
-            now = datetime.now()
-            current_time = now.strftime('%H:%M:%S')
+            if since is None:
+                since = datetime.now(timezone.utc) - timedelta(minutes=Config.REMINDER_STALE_MINUTES)
             
             result = supabase_client.client.table('reminders') \
                 .select('*') \
                 .eq('status', 'pending') \
-                .lte('reminder_time', current_time) \
+                .gte('due_at', since.isoformat()) \
+                .lte('due_at', until.isoformat()) \
+                .order('due_at') \
+                .limit(limit) \
                 .execute()
             
-            reminders = []
-            for data in result.data:
-                reminder = cls(
-                    id=data['id'],
-                    user_id=data['user_id'],
-                    reminder_type=data['reminder_type'],
-                    scheduled_time=data['scheduled_time'],
-                    reminder_time=data['reminder_time'],
-                    content=data['content'],
-                    status=data['status'],
-                    related_id=data['related_id'],
-                    related_type=data['related_type'],
-                    created_at=data['created_at'],
-                    sent_at=data['sent_at'],
-                    completed_at=data['completed_at']
-                )
-                reminders.append(reminder)
+            return [cls._from_row(data) for data in result.data]
+            
+        except Exception as e:
+            logger.error(f"Error getting upcoming reminders: {e}")
+            return []
+    
+    @staticmethod
+    def expire_stale(before: datetime) -> int:
+        """Mark pending reminders that were due before `before` as expired"""
+        try:
+            result = supabase_client.client.table('reminders') \
+                .update({'status': 'expired'}) \
+                .eq('status', 'pending') \
+                .lt('due_at', before.isoformat()) \
+                .execute()
+            
+            expired = len(result.data) if result.data else 0
+            if expired:
+                logger.info(f"Expired {expired} stale reminders")
+            return expired
+            
+        except Exception as e:
+            logger.error(f"Error expiring stale reminders: {e}")
+            return 0
+    
+    @classmethod
+    def claim(cls, reminder_ids: list, worker_id: str, lease_seconds: int):
+        """Atomically move pending reminders to 'sending' for this worker
+        
+        Only rows still pending are updated, so when several workers race
+        for the same reminder exactly one of them gets it back.
+        """
+        if not reminder_ids:
+            return []
+        try:
+            lease_expires_at = datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)
+            result = supabase_client.client.table('reminders') \
+                .update({
+                    'status': 'sending',
+                    'claimed_by': worker_id,
+                    'lease_expires_at': lease_expires_at.isoformat()
+                }) \
+                .in_('id', list(reminder_ids)) \
+                .eq('status', 'pending') \
+                .execute()
             
-            return reminders
+            return [cls._from_row(data) for data in result.data]
             
         except Exception as e:
-            logger.error(f"Error getting pending reminders: {e}")
+            logger.error(f"Error claiming {len(reminder_ids)} reminders: {e}")
             return []
     
+    @staticmethod
+    def release_expired_claims() -> int:
+        """Return reminders whose lease ran out (worker crashed or send failed) to pending"""
+        try:
+            now = datetime.now(timezone.utc).isoformat()
+            result = supabase_client.client.table('reminders') \
+                .update({'status': 'pending', 'claimed_by': None, 'lease_expires_at': None}) \
+                .eq('status', 'sending') \
+                .lt('lease_expires_at', now) \
+                .execute()
+            
+            released = len(result.data) if result.data else 0
+            if released:
+                logger.info(f"Released {released} reminders with expired claims")
+            return released
+            
+        except Exception as e:
+            logger.error(f"Error releasing expired reminder claims: {e}")
+            return 0
+    
     @classmethod
     def get_user_reminders(cls, user_id: int, date: str = None):
         """Get reminders for a specific user and date"""
@@ -747,25 +1108,7 @@ class Reminder:
             
             result = query.order('reminder_time').execute()
             
-            reminders = []
-            for data in result.data:
-                reminder = cls(
-                    id=data['id'],
-                    user_id=data['user_id'],
-                    reminder_type=data['reminder_type'],
-                    scheduled_time=data['scheduled_time'],
-                    reminder_time=data['reminder_time'],
-                    content=data['content'],
-                    status=data['status'],
-                    related_id=data['related_id'],
-                    related_type=data['related_type'],
-                    created_at=data['created_at'],
-                    sent_at=data['sent_at'],
-                    completed_at=data['completed_at']
-                )
-                reminders.append(reminder)
-            
-            return reminders
+            return [cls._from_row(data) for data in result.data]
             
         except Exception as e:
             logger.error(f"Error getting user reminders: {e}")
@@ -777,6 +1120,11 @@ class Reminder:
         self.sent_at = datetime.now()
         return self.save()
     
+    def mark_failed(self):
+        """Mark reminder as failed (it can never be delivered, so it is not retried)"""
+        self.status = 'failed'
+        return self.save()
+    
     def mark_completed(self):
         """Mark reminder as completed"""
         self.status = 'completed'
@@ -789,41 +1137,62 @@ class Reminder:
         self.completed_at = datetime.now()
         return self.save()
     
+    @staticmethod
+    def build(user_id: int, reminder_type: str, scheduled_time: str, 
+              content: Dict[str, Any], related_id: int, related_type: str,
+              scheduled_date: Optional[date] = None):
+        """Build an unsaved reminder with 5-minute advance notice (for today unless scheduled_date is given)"""
+        # Handle time format - remove seconds if present
+        if scheduled_time.count(':') == 2:  # Format: HH:MM:SS
+            scheduled_time = scheduled_time[:5]  # Take only HH:MM
+        
+        # Parse scheduled time
+        scheduled_dt = datetime.strptime(scheduled_time, '%H:%M')
+        
+        # Calculate reminder time (5 minutes before)
+        reminder_dt = scheduled_dt - timedelta(minutes=5)
+        reminder_time = reminder_dt.strftime('%H:%M:%S')
+        
+        return Reminder(
+            user_id=user_id,
+            reminder_type=reminder_type,
+            scheduled_time=scheduled_time,
+            reminder_time=reminder_time,
+            content=content,
+            related_id=related_id,
+            related_type=related_type,
+            due_at=Reminder.compute_due_at(scheduled_time, scheduled_date) - timedelta(minutes=5)
+        )
+    
     @staticmethod
     def create_reminder(user_id: int, reminder_type: str, scheduled_time: str, 
-                       content: Dict[str, Any], related_id: int, related_type: str):
-        """Create a new reminder with 5-minute advance notice"""
+                       content: Dict[str, Any], related_id: int, related_type: str,
+                       scheduled_date: Optional[date] = None):
+        """Create a new reminder with 5-minute advance notice (for today unless scheduled_date is given)"""
         try:
-            from datetime import datetime, timedelta
-            
-            # Handle time format - remove seconds if present
-            if scheduled_time.count(':') == 2:  # Format: HH:MM:SS
-                scheduled_time = scheduled_time[:5]  # Take only HH:MM
-            
-            # Parse scheduled time
-            scheduled_dt = datetime.strptime(scheduled_time, '%H:%M')
-            
-            # Calculate reminder time (5 minutes before)
-            reminder_dt = scheduled_dt - timedelta(minutes=5)
-            reminder_time = reminder_dt.strftime('%H:%M:%S')
-            
-            reminder = Reminder(
-                user_id=user_id,
-                reminder_type=reminder_type,
-                scheduled_time=scheduled_time,
-                reminder_time=reminder_time,
-                content=content,
-                related_id=related_id,
-                related_type=related_type
-            )
-            
+            reminder = Reminder.build(user_id, reminder_type, scheduled_time, content,
+                                      related_id, related_type, scheduled_date)
             result = reminder.save()
-            logger.info(f"Created reminder: {reminder_type} for user {user_id} at {scheduled_time} (reminder at {reminder_time})")
+            logger.info(f"Created reminder: {reminder_type} for user {user_id} at {reminder.scheduled_time} (reminder at {reminder.reminder_time})")
             return result
             
         except Exception as e:
             logger.error(f"Error creating reminder: {e}", exc_info=True)
             return None
+    
+    @classmethod
+    def bulk_create(cls, reminders: list) -> list:
+        """Insert many unsaved reminders in one request; returns the created Reminders"""
+        if not reminders:
+            return []
+        try:
+            rows = [reminder._to_row() for reminder in reminders]
+            result = supabase_client.client.table('reminders').insert(rows).execute()
+            return [cls._from_row(data) for data in result.data]
+            
+        except Exception as e:
+            logger.error(f"Error bulk creating {len(reminders)} reminders: {e}", exc_info=True)
+            return []
 
 class DietCompletion:
     def __init__(self, diet_id: int, meal_name: str, meal_type: str, status: str = 'completed'):
@@ -888,6 +1257,26 @@ class DietCompletion:
             logger.error(f"Error getting diet completions: {e}")
             return []
     
+    @staticmethod
+    def get_for_diets(diet_ids: list) -> Dict[int, list]:
+        """Completions for many diet plans with one `in` query, keyed by diet id"""
+        diet_ids = list(set(diet_ids))
+        if not diet_ids:
+            return {}
+        try:
+            result = supabase_client.client.table('diet_completions') \
+                .select('*') \
+                .in_('diet_id', diet_ids) \
+                .order('completed_at') \
+                .execute()
+            completions = {diet_id: [] for diet_id in diet_ids}
+            for data in result.data or []:
+                completions.setdefault(data['diet_id'], []).append(data)
+            return completions
+        except Exception as e:
+            logger.error(f"Error getting completions for {len(diet_ids)} diet plans: {e}")
+            return {}
+    
     @staticmethod
     def get_user_completions(user_id: int) -> list:
         """Get all diet completions for a user"""
@@ -932,24 +1321,26 @@ class ChatMessage:
         self.timestamp = timestamp or datetime.now()
         self.message_category = message_category  # 'workout', 'diet', 'reminder', 'progress', etc.
     
+    def _to_row(self) -> Dict[str, Any]:
+        """Column values written for this message"""
+        return {
+            'user_id': self.user_id,
+            'message_text': self.message_text,
+            'message_type': self.message_type,
+            'message_id': self.message_id,
+            'chat_id': self.chat_id,
+            'reply_to_message_id': self.reply_to_message_id,
+            'is_command': self.is_command,
+            'command_name': self.command_name,
+            'session_state': self.session_state,
+            'timestamp': self.timestamp.isoformat(),
+            'message_category': self.message_category
+        }
+    
     def save(self):
         """Save chat message to database"""
         try:
-            message_data = {
-                'user_id': self.user_id,
-                'message_text': self.message_text,
-                'message_type': self.message_type,
-                'message_id': self.message_id,
-                'chat_id': self.chat_id,
-                'reply_to_message_id': self.reply_to_message_id,
-                'is_command': self.is_command,
-                'command_name': self.command_name,
-                'session_state': self.session_state,
-                'timestamp': self.timestamp.isoformat(),
-                'message_category': self.message_category
-            }
-            
-            result = supabase_client.client.table('chat_messages').insert(message_data).execute()
+            result = supabase_client.client.table('chat_messages').insert(self._to_row()).execute()
             
             if result.data:
                 self.id = result.data[0]['id']
@@ -961,13 +1352,21 @@ class ChatMessage:
             logger.error(f"Error saving chat message for user {self.user_id}: {e}")
             return None
     
+    @staticmethod
+    def bulk_insert(rows: list) -> int:
+        """Insert many chat_messages rows in one request; returns the number written"""
+        if not rows:
+            return 0
+        result = supabase_client.client.table('chat_messages').insert(rows).execute()
+        return len(result.data) if result.data else 0
+    
     @classmethod
-    def create_user_message(cls, user_id: int, message_text: str, message_id: int = None,
+    def build_user_message(cls, user_id: int, message_text: str, message_id: int = None,
                            chat_id: int = None, reply_to_message_id: int = None,
                            is_command: bool = False, command_name: str = None,
                            session_state: str = None):
-        """Create and save a user message"""
-        message = cls(
+        """Build an unsaved user message"""
+        return cls(
             user_id=user_id,
             message_text=message_text,
             message_type='user',
@@ -978,26 +1377,32 @@ class ChatMessage:
             command_name=command_name,
             session_state=session_state
         )
-        return message.save()
     
     @classmethod
-    def create_bot_message(cls, user_id: int, message_text: str, message_id: int = None,
+    def build_bot_message(cls, user_id: int, message_text: str, message_id: int = None,
                           chat_id: int = None, reply_to_message_id: int = None,
                           session_state: str = None, message_category: str = None):
-        """Create and save a bot message with optional category"""
-        message = cls(
+        """Build an unsaved bot message with optional category"""
+        return cls(
             user_id=user_id,
             message_text=message_text,
             message_type='bot',
             message_id=message_id,
             chat_id=chat_id,
             reply_to_message_id=reply_to_message_id,
-            session_state=session_state
+            session_state=session_state,
+            message_category=message_category
         )
-        # Add category to message data if provided
-        if message_category:
-            message.message_category = message_category
-        return message.save()
+    
+    @classmethod
+    def create_user_message(cls, user_id: int, message_text: str, **kwargs):
+        """Create and save a user message"""
+        return cls.build_user_message(user_id, message_text, **kwargs).save()
+    
+    @classmethod
+    def create_bot_message(cls, user_id: int, message_text: str, **kwargs):
+        """Create and save a bot message with optional category"""
+        return cls.build_bot_message(user_id, message_text, **kwargs).save()
     
     @classmethod
     def get_user_messages(cls, user_id: int, limit: int = 50, offset: int = 0):
@@ -1103,6 +1508,40 @@ class ChatMessage:
             logger.error(f"Error getting all messages: {e}")
             return []
 
+class CachedAnswer:
+    """Persistent Q&A answers shared across bot restarts and processes (qa_cache table)"""
+    
+    @staticmethod
+    def get(cache_key: str) -> Optional[Dict[str, Any]]:
+        """Get an unexpired cached answer row"""
+        try:
+            now = datetime.now(timezone.utc).isoformat()
+            result = supabase_client.client.table('qa_cache').select('*') \
+                .eq('cache_key', cache_key).gt('expires_at', now).limit(1).execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error reading cached answer: {e}")
+            return None
+    
+    @staticmethod
+    def save(cache_key: str, question: str, profile_bucket: str, answer: str, ttl_days: int):
+        """Store (or refresh) a cached answer"""
+        try:
+            now = datetime.now(timezone.utc)
+            data = {
+                'cache_key': cache_key,
+                'question': question,
+                'profile_bucket': profile_bucket,
+                'answer': answer,
+                'created_at': now.isoformat(),
+                'expires_at': (now + timedelta(days=ttl_days)).isoformat()
+            }
+            result = supabase_client.client.table('qa_cache').upsert(data, on_conflict='cache_key').execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error saving cached answer: {e}")
+            return None
+
 class Trainer:
     def __init__(self, trainer_id: int, first_name: str = None, last_name: str = None, email: str = None, phone: str = None, id: int = None, created_at=None, updated_at=None):
         self.id = id
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+class SessionStore:
+    """In-memory copy of user_sessions with write-behind persistence
+
+    While running, the store is the authoritative session state: reads are
+    served from memory and UserSession.save only marks the row dirty. A
+    background task flushes dirty rows in batches every flush_interval
+    seconds and once more on shutdown, so a burst of state changes for one
+    user costs a single write. When the store is not running (dashboard,
+    scripts) sessions are read and written straight through.
+    """
+
+    def __init__(self, flush_interval: float = 5.0, batch_size: int = 100, max_sessions: int = 10000):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # user_id -> user_sessions row
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._running = False
+        self._task = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def get(self, user_id: int) -> Optional[Dict]:
+        """Return a copy of the cached session row, if any"""
+        with self._lock:
+            row = self._sessions.get(user_id)
+            if row is None:
+                return None
+            self._sessions.move_to_end(user_id)
+            return dict(row)
+
+    def put(self, row: Dict):
+        """Record a changed session; it will be written on the next flush"""
+        user_id = row['user_id']
+        with self._lock:
+            existing = self._sessions.get(user_id)
+            if existing is not None and row.get('id') is None:
+                row['id'] = existing.get('id')
+            self._sessions[user_id] = row
+            self._sessions.move_to_end(user_id)
+            self._dirty.add(user_id)
+            self._evict_clean()
+
+    def load(self, row: Dict):
+        """Cache a row read from the database unless a newer one is already held"""
+        user_id = row['user_id']
+        with self._lock:
+            if user_id in self._sessions:
+                return
+            self._sessions[user_id] = row
+            self._evict_clean()
+
+    def _evict_clean(self):
+        # Only sessions that are already persisted may be dropped
+        if len(self._sessions) <= self.max_sessions:
+            return
+        for user_id in list(self._sessions.keys()):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if user_id not in self._dirty:
+                del self._sessions[user_id]
+
+    def _take_dirty(self) -> List[Dict]:
+        with self._lock:
+            rows = [dict(self._sessions[user_id]) for user_id in self._dirty if user_id in self._sessions]
+            self._dirty.clear()
+            return rows
+
+    def _restore_dirty(self, rows: List[Dict]):
+        # Re-queue rows whose write failed, unless they changed again meanwhile
+        with self._lock:
+            for row in rows:
+                if row['user_id'] in self._sessions:
+                    self._dirty.add(row['user_id'])
+
+    def _remember_ids(self, saved_rows: List[Dict]):
+        with self._lock:
+            for saved in saved_rows:
+                row = self._sessions.get(saved.get('user_id'))
+                if row is not None and row.get('id') is None:
+                    row['id'] = saved.get('id')
+
+    async def flush(self):
+        """Write every dirty session to the database in batches"""
+        from src.database.async_models import run_db
+        from src.database.models import UserSession
+
+        rows = self._take_dirty()
+        for i in range(0, len(rows), self.batch_size):
+            batch = rows[i:i + self.batch_size]
+            try:
+                saved_rows = await run_db(UserSession.write_rows, batch)
+                self._remember_ids(saved_rows)
+            except Exception as e:
+                logger.error(f"Error flushing {len(batch)} sessions: {e}")
+                self._restore_dirty(batch)
+        if rows:
+            logger.debug(f"Flushed {len(rows)} sessions")
+
+    async def _flush_loop(self):
+        while self._running:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error in session flush loop: {e}")
+
+    async def start(self):
+        """Start serving sessions from memory and flushing in the background"""
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info("Session store started")
+
+    async def stop(self):
+        """Stop the flush loop and persist everything still dirty"""
+        if not self._running:
+            return
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        logger.info("Session store stopped")
+
+# Create a global instance
+session_store = SessionStore(
+    flush_interval=Config.SESSION_FLUSH_INTERVAL,
+    batch_size=Config.SESSION_FLUSH_BATCH_SIZE,
+    max_sessions=Config.SESSION_STORE_MAX_SESSIONS
+)
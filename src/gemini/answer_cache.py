@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional
+from config.config import Config
+from src.database.cache import TTLCache
+from src.database.models import CachedAnswer
+from src.database.async_models import run_db
+from src.services.plan_engine import goal_category
+
+logger = logging.getLogger(__name__)
+
+# Words that carry no meaning for matching questions
+STOPWORDS = frozenset("""
+a an the i im me my we you your it its is are am was were be been being do does did doing
+should would could can will shall may might must to of in on at for with about as by from
+and or but if so than then that this these those what which who whom how why when where
+much many any some more most very just really please tell know need want get""".split())
+
+# Words that flip a question's meaning; "t" is what normalization leaves of "don't", "can't"
+NEGATIONS = frozenset("not no never avoid without t".split())
+
+class SimilarityIndex:
+    """Near-duplicate lookup over previously answered questions
+
+    Each question becomes a set of shingles (content words plus adjacent word
+    pairs). An inverted index from shingle to entry narrows the candidates,
+    and the best Jaccard overlap above `threshold` wins. A negated question
+    never matches a non-negated one, however similar the rest is. Entries are kept per
+    profile bucket and expire after `ttl` seconds; the oldest are evicted
+    past `maxsize`.
+    """
+
+    def __init__(self, threshold: float = 0.6, maxsize: int = 2000, ttl: float = 21600):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # entry key -> (shingles, negated, answer, expires_at)
+        self._postings = defaultdict(set)  # (bucket, shingle) -> entry keys
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def shingles(normalized_question: str) -> frozenset:
+        words = [AnswerCache.stem(w) for w in normalized_question.split() if w not in STOPWORDS]
+        pairs = [f"{a} {b}" for a, b in zip(words, words[1:])]
+        return frozenset(words + pairs)
+
+    @staticmethod
+    def is_negated(normalized_question: str) -> bool:
+        return any(word in NEGATIONS for word in normalized_question.split())
+
+    def add(self, bucket: str, normalized_question: str, answer: str):
+        shingles = self.shingles(normalized_question)
+        if not shingles:
+            return
+        key = (bucket, normalized_question)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (shingles, self.is_negated(normalized_question), answer, time.monotonic() + self.ttl)
+            for shingle in shingles:
+                self._postings[(bucket, shingle)].add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        bucket = key[0]
+        for shingle in entry[0]:
+            posting = self._postings.get((bucket, shingle))
+            if posting is not None:
+                posting.discard(key)
+                if not posting:
+                    del self._postings[(bucket, shingle)]
+
+    def find(self, bucket: str, normalized_question: str) -> Optional[str]:
+        """Answer of the most similar stored question in the bucket, if similar enough"""
+        shingles = self.shingles(normalized_question)
+        if not shingles:
+            return None
+        negated = self.is_negated(normalized_question)
+        now = time.monotonic()
+        with self._lock:
+            candidates = set()
+            for shingle in shingles:
+                candidates |= self._postings.get((bucket, shingle), set())
+
+            best_score, best_key = 0.0, None
+            for key in candidates:
+                entry_shingles, entry_negated, _, expires_at = self._entries[key]
+                if expires_at <= now or entry_negated != negated:
+                    continue
+                score = len(shingles & entry_shingles) / len(shingles | entry_shingles)
+                if score > best_score:
+                    best_score, best_key = score, key
+
+            if best_key is None or best_score < self.threshold:
+                return None
+            return self._entries[best_key][2]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class AnswerCache:
+    """Cache of Q&A answers keyed by normalized question and a coarse profile bucket
+
+    Lookups go to an in-memory LRU+TTL cache first, then to a local
+    similarity index that catches paraphrases, and then to the qa_cache
+    table, so answers survive restarts and are shared between processes.
+    """
+
+    def __init__(self, maxsize: int = 2000, ttl: float = 21600, db_ttl_days: int = 30,
+                 similarity_threshold: float = 0.6):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl, name='answers')
+        self.similar = SimilarityIndex(threshold=similarity_threshold, maxsize=maxsize, ttl=ttl)
+        self.similar_hits = 0
+        self.db_ttl_days = db_ttl_days
+        self._lock = threading.Lock()
+        self._pending_writes = set()
+        self.db_hits = 0
+        self.db_misses = 0
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """Lower-case, drop punctuation and collapse whitespace"""
+        text = re.sub(r"[^a-z0-9\s]", " ", question.lower())
+        return " ".join(text.split())
+
+    @staticmethod
+    def stem(word: str) -> str:
+        """Crude suffix stripping so 'exercises'/'exercise' and 'running'/'run' match"""
+        if len(word) > 5 and word.endswith('ing'):
+            word = word[:-3]
+        elif len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        # A final 'e' is dropped so 'exercise' meets 'exercis(ing)'
+        if len(word) > 3 and word.endswith('e'):
+            word = word[:-1]
+        if len(word) > 3 and word[-1] == word[-2]:
+            word = word[:-1]
+        return word
+
+    @staticmethod
+    def profile_bucket(user_profile: Optional[Dict[str, Any]]) -> str:
+        """fitness level / goal category / age band, e.g. 'beginner|fat_loss|30-44'"""
+        if not user_profile:
+            return 'anonymous'
+
+        level = (user_profile.get('fitness_level') or 'any').lower()
+
+        goal = goal_category(user_profile.get('goals'))
+
+        try:
+            age = int(user_profile.get('age') or 0)
+        except (TypeError, ValueError):
+            age = 0
+        if not age:
+            age_band = 'any'
+        elif age < 18:
+            age_band = 'under-18'
+        elif age < 30:
+            age_band = '18-29'
+        elif age < 45:
+            age_band = '30-44'
+        elif age < 60:
+            age_band = '45-59'
+        else:
+            age_band = '60+'
+
+        return f"{level}|{goal}|{age_band}"
+
+    def make_key(self, question: str, user_profile: Optional[Dict[str, Any]] = None) -> str:
+        return f"{self.profile_bucket(user_profile)}|{self.normalize_question(question)}"
+
+    def _get_local(self, key: str, question: str, user_profile: Optional[Dict[str, Any]]) -> Optional[str]:
+        # Exact match first, then a paraphrase from the similarity index
+        answer = self.memory.get(key)
+        if answer is not None:
+            return answer
+        answer = self.similar.find(self.profile_bucket(user_profile), self.normalize_question(question))
+        if answer is not None:
+            with self._lock:
+                self.similar_hits += 1
+        return answer
+
+    def get(self, question: str, user_profile: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Look up an answer (memory, similar questions, then the qa_cache table)"""
+        key = self.make_key(question, user_profile)
+        answer = self._get_local(key, question, user_profile)
+        if answer is not None:
+            return answer
+        return self._from_row(key, question, user_profile, CachedAnswer.get(key))
+
+    async def get_async(self, question: str, user_profile: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Awaitable get; the table lookup runs on the DB executor"""
+        key = self.make_key(question, user_profile)
+        answer = self._get_local(key, question, user_profile)
+        if answer is not None:
+            return answer
+        return self._from_row(key, question, user_profile, await run_db(CachedAnswer.get, key))
+
+    def _from_row(self, key: str, question: str, user_profile: Optional[Dict[str, Any]],
+                  row: Optional[Dict[str, Any]]) -> Optional[str]:
+        with self._lock:
+            if row is None:
+                self.db_misses += 1
+                return None
+            self.db_hits += 1
+        self._remember(key, question, user_profile, row['answer'])
+        return row['answer']
+
+    def _remember(self, key: str, question: str, user_profile: Optional[Dict[str, Any]], answer: str):
+        self.memory.set(key, answer)
+        self.similar.add(self.profile_bucket(user_profile), self.normalize_question(question), answer)
+
+    def set(self, question: str, user_profile: Optional[Dict[str, Any]], answer: str):
+        """Store an answer in memory and in the qa_cache table"""
+        key = self.make_key(question, user_profile)
+        self._remember(key, question, user_profile, answer)
+        CachedAnswer.save(key, question, self.profile_bucket(user_profile), answer, self.db_ttl_days)
+
+    async def set_async(self, question: str, user_profile: Optional[Dict[str, Any]], answer: str):
+        """Store an answer; the table write happens in the background"""
+        key = self.make_key(question, user_profile)
+        self._remember(key, question, user_profile, answer)
+        task = asyncio.create_task(run_db(
+            CachedAnswer.save, key, question, self.profile_bucket(user_profile), answer, self.db_ttl_days
+        ))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the memory, similarity and table tiers"""
+        stats = self.memory.stats()
+        with self._lock:
+            stats['similar_hits'] = self.similar_hits
+            stats['db_hits'] = self.db_hits
+            stats['db_misses'] = self.db_misses
+        stats['similar_size'] = len(self.similar)
+        lookups = stats['hits'] + stats['misses']
+        answered = stats['hits'] + stats['similar_hits'] + stats['db_hits']
+        stats['overall_hit_rate'] = round(answered / lookups, 3) if lookups else 0.0
+        return stats
+
+# Create a global instance
+answer_cache = AnswerCache(
+    maxsize=Config.ANSWER_CACHE_SIZE,
+    ttl=Config.ANSWER_CACHE_TTL,
+    db_ttl_days=Config.ANSWER_CACHE_DB_TTL_DAYS,
+    similarity_threshold=Config.ANSWER_SIMILARITY_THRESHOLD
+)
@@ -1,11 +1,23 @@
-import json
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, Optional
 import google.generativeai as genai
 from config.config import Config
+from src.database.models import DietPlan
+from src.database.async_models import run_db
+from src.gemini.answer_cache import answer_cache
+from src.gemini.json_parser import json_parser
+from src.gemini.scheduler import Priority, GeminiOverloaded, gemini_scheduler
+from src.gemini.schemas import (
+    WORKOUT_SCHEMA, DIET_SCHEMA, DAILY_SCHEDULE_SCHEMA, USER_DETAILS_SCHEMA, response_schema
+)
+from src.services.plan_engine import plan_engine
 
 logger = logging.getLogger(__name__)
 
+QA_ERROR_MESSAGE = "I'm sorry, I'm having trouble processing your question right now. Please try again later or rephrase your question."
+
 class GeminiService:
     """Service class for Google Gemini AI integration"""
     
@@ -14,11 +26,120 @@ class GeminiService:
         try:
             genai.configure(api_key=Config.GEMINI_API_KEY)
             self.model = genai.GenerativeModel('models/gemini-1.5-flash')
+            self._semaphore = None  # Created lazily on the event loop that first uses it
+            self._in_flight = {}  # (prompt, options) -> task shared by identical concurrent calls
+            self._waiters = {}  # (prompt, options) -> callers still awaiting that task
+            self.coalesced_calls = 0
+            self._late_tasks = set()  # Generations still running after their deadline
+            # JSON mode: structured responses are constrained to these schemas
+            self.workout_config = self._json_config(WORKOUT_SCHEMA)
+            self.diet_config = self._json_config(DIET_SCHEMA)
+            self.schedule_config = self._json_config(DAILY_SCHEDULE_SCHEMA)
+            self.details_config = self._json_config(USER_DETAILS_SCHEMA)
             logger.info("Gemini AI client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Gemini client: {e}")
             raise
     
+    @staticmethod
+    def _json_config(schema: Dict[str, Any]) -> genai.GenerationConfig:
+        """Generation config asking for JSON that matches `schema`"""
+        return genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=response_schema(schema)
+        )
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Semaphore bounding concurrent Gemini calls to GEMINI_MAX_CONCURRENCY"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(Config.GEMINI_MAX_CONCURRENCY)
+        return self._semaphore
+    
+    async def _generate_content_async(self, prompt: str, priority: Priority = Priority.INTERACTIVE, **kwargs):
+        """Call Gemini without blocking the event loop
+        
+        Identical prompts issued while a call is still in flight share that
+        call's result instead of hitting the API again (single-flight).
+        Calls are admitted by the scheduler according to `priority`.
+        """
+        if kwargs.get('stream'):
+            # A stream can only be consumed once, so it is never shared
+            return await self._call_model(prompt, priority, **kwargs)
+        
+        # Priority is part of the key so a user never waits behind a batch call's queue slot
+        key = (prompt, priority, repr(sorted(kwargs.items())))
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._call_model(prompt, priority, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done, key=key: self._finish_in_flight(key, done))
+        else:
+            self.coalesced_calls += 1
+            logger.debug(f"Coalesced identical Gemini request ({self.coalesced_calls} so far)")
+        
+        # Shielded so one caller giving up does not cancel the call for the others;
+        # the call itself is cancelled once nobody is waiting for it
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[key] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+    
+    def _finish_in_flight(self, key, task: asyncio.Task):
+        self._in_flight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # Mark retrieved even if every waiter was cancelled
+    
+    async def _call_model(self, prompt: str, priority: Priority, **kwargs):
+        await gemini_scheduler.acquire(priority)
+        async with self._get_semaphore():
+            return await self.model.generate_content_async(prompt, **kwargs)
+    
+    async def _with_deadline(self, generation, deadline: Optional[float],
+                             on_late_result: Optional[Callable[[Dict[str, Any]], Awaitable[None]]], what: str):
+        """Await `generation`, raising asyncio.TimeoutError after `deadline` seconds
+        
+        Without on_late_result the generation is cancelled at the deadline,
+        which cancels the Gemini request too unless an identical coalesced
+        call is still waiting on it.
+        With it, the generation keeps running (up to GEMINI_LATE_RESULT_TIMEOUT)
+        and on_late_result is awaited with its result.
+        """
+        if deadline is None:
+            return await generation
+        
+        task = asyncio.create_task(generation)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=deadline)
+        except asyncio.TimeoutError:
+            logger.warning(f"{what} missed its {deadline:g}s deadline, using the local plan")
+            if on_late_result is None:
+                task.cancel()
+            else:
+                late = asyncio.create_task(self._deliver_late(task, on_late_result, what))
+                self._late_tasks.add(late)
+                late.add_done_callback(self._late_tasks.discard)
+            raise
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+    
+    async def _deliver_late(self, task: asyncio.Task, on_late_result, what: str):
+        try:
+            result = await asyncio.wait_for(task, timeout=Config.GEMINI_LATE_RESULT_TIMEOUT)
+            await on_late_result(result)
+            logger.info(f"Delivered late {what}")
+        except asyncio.TimeoutError:
+            logger.warning(f"Gave up on late {what} after {Config.GEMINI_LATE_RESULT_TIMEOUT:.0f}s")
+        except Exception as e:
+            logger.error(f"Error delivering late {what}: {e}")
+    
     def generate_workout(self, user_profile: Dict[str, Any], workout_history: Optional[list] = None) -> Dict[str, Any]:
         """
         Generate a personalized workout plan based on user profile and history
@@ -30,39 +151,87 @@ class GeminiService:
         Returns:
             Dictionary containing structured workout plan
         """
+        next_muscle_group = "Full Body"
         try:
-            # Define available muscle groups for rotation
-            muscle_groups = ["Arms", "Chest", "Back", "Legs", "Shoulders", "Abs", "Cardio"]
-            
-            # Determine next muscle group based on history
-            next_muscle_group = self._determine_next_muscle_group(workout_history, muscle_groups)
-            
-            # Prepare workout history context with rotation info
-            history_context = ""
-            if workout_history:
-                recent_workouts = workout_history[:3]  # Last 3 workouts
-                recent_types = [w.get('workout_type', 'General') for w in recent_workouts]
-                history_context = f"Recent workout history: {recent_types}\n"
-                history_context += f"Next workout should focus on: {next_muscle_group}"
-            
-            # Create structured prompt for workout generation
-            prompt = self._create_workout_prompt(user_profile, history_context, next_muscle_group)
+            prompt, next_muscle_group = self._prepare_workout_prompt(user_profile, workout_history)
             
             # Generate workout using Gemini
-            response = self.model.generate_content(prompt)
+            response = self.model.generate_content(prompt, generation_config=self.workout_config)
             
-            # Parse and validate response
-            workout_data = self._parse_workout_response(response.text)
+            return self._build_workout(response.text, next_muscle_group, user_profile)
             
-            # Ensure the workout type matches our rotation
-            workout_data['workout_type'] = next_muscle_group
+        except Exception as e:
+            logger.error(f"Error generating workout: {e}")
+            return self._get_fallback_workout(user_profile, next_muscle_group)
+    
+    async def generate_workout_async(self, user_profile: Dict[str, Any], workout_history: Optional[list] = None,
+                                     priority: Priority = Priority.INTERACTIVE, deadline: Optional[float] = None,
+                                     on_late_result: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+                                     fallback: bool = True) -> Dict[str, Any]:
+        """Awaitable variant of generate_workout for use from bot handlers and batches
+        
+        Past `deadline` seconds the local workout is returned; see _with_deadline
+        for on_late_result. With fallback=False errors are raised instead of
+        being replaced by the local workout.
+        """
+        next_muscle_group = "Full Body"
+        try:
+            prompt, next_muscle_group = self._prepare_workout_prompt(user_profile, workout_history)
             
-            logger.info(f"Generated {next_muscle_group} workout for user with goals: {user_profile.get('goals', 'Unknown')}")
-            return workout_data
+            return await self._with_deadline(
+                self._request_workout(prompt, priority, next_muscle_group, user_profile),
+                deadline, on_late_result, 'workout generation'
+            )
             
+        except asyncio.TimeoutError:
+            if not fallback:
+                raise
+            return self._get_fallback_workout(user_profile, next_muscle_group)
+        except GeminiOverloaded as e:
+            if not fallback:
+                raise
+            logger.warning(f"Using local workout: {e}")
+            return self._get_fallback_workout(user_profile, next_muscle_group)
         except Exception as e:
+            if not fallback:
+                raise
             logger.error(f"Error generating workout: {e}")
-            return self._get_fallback_workout(user_profile, next_muscle_group if 'next_muscle_group' in locals() else "Full Body")
+            return self._get_fallback_workout(user_profile, next_muscle_group)
+    
+    async def _request_workout(self, prompt: str, priority: Priority, next_muscle_group: str,
+                               user_profile: Dict[str, Any]) -> Dict[str, Any]:
+        response = await self._generate_content_async(prompt, priority, generation_config=self.workout_config)
+        return self._build_workout(response.text, next_muscle_group, user_profile)
+    
+    def _prepare_workout_prompt(self, user_profile: Dict[str, Any], workout_history: Optional[list]):
+        """Pick the next muscle group and build the workout prompt for it"""
+        # Define available muscle groups for rotation
+        muscle_groups = ["Arms", "Chest", "Back", "Legs", "Shoulders", "Abs", "Cardio"]
+        
+        # Determine next muscle group based on history
+        next_muscle_group = self._determine_next_muscle_group(workout_history, muscle_groups)
+        
+        # Prepare workout history context with rotation info
+        history_context = ""
+        if workout_history:
+            recent_workouts = workout_history[:3]  # Last 3 workouts
+            recent_types = [w.get('workout_type', 'General') for w in recent_workouts]
+            history_context = f"Recent workout history: {recent_types}\n"
+            history_context += f"Next workout should focus on: {next_muscle_group}"
+        
+        # Create structured prompt for workout generation
+        prompt = self._create_workout_prompt(user_profile, history_context, next_muscle_group)
+        return prompt, next_muscle_group
+    
+    def _build_workout(self, response_text: str, next_muscle_group: str, user_profile: Dict[str, Any]) -> Dict[str, Any]:
+        """Parse the Gemini workout response and pin it to the rotation's muscle group"""
+        workout_data = self._parse_workout_response(response_text)
+        
+        # Ensure the workout type matches our rotation
+        workout_data['workout_type'] = next_muscle_group
+        
+        logger.info(f"Generated {next_muscle_group} workout for user with goals: {user_profile.get('goals', 'Unknown')}")
+        return workout_data
     
     def answer_fitness_question(self, question: str, user_profile: Optional[Dict] = None) -> str:
         """
@@ -76,6 +245,12 @@ class GeminiService:
             AI-generated answer to the fitness question
         """
         try:
+            # Similar users asking the same question get the stored answer
+            cached = answer_cache.get(question, user_profile)
+            if cached:
+                logger.info(f"Answered fitness question from cache: {question[:50]}...")
+                return cached
+            
             # Create context-aware prompt
             prompt = self._create_qa_prompt(question, user_profile)
             
@@ -84,13 +259,98 @@ class GeminiService:
             
             # Clean and format response
             answer = self._format_qa_response(response.text)
+            if not answer:
+                raise ValueError("Gemini returned an empty answer")
+            answer_cache.set(question, user_profile, answer)
             
             logger.info(f"Answered fitness question: {question[:50]}...")
             return answer
             
         except Exception as e:
             logger.error(f"Error answering question: {e}")
-            return "I'm sorry, I'm having trouble processing your question right now. Please try again later or rephrase your question."
+            return QA_ERROR_MESSAGE
+    
+    async def answer_fitness_question_async(self, question: str, user_profile: Optional[Dict] = None) -> str:
+        """Awaitable variant of answer_fitness_question for use from bot handlers"""
+        try:
+            cached = await answer_cache.get_async(question, user_profile)
+            if cached:
+                logger.info(f"Answered fitness question from cache: {question[:50]}...")
+                return cached
+            
+            prompt = self._create_qa_prompt(question, user_profile)
+            
+            response = await self._generate_content_async(prompt)
+            
+            answer = self._format_qa_response(response.text)
+            if not answer:
+                raise ValueError("Gemini returned an empty answer")
+            await answer_cache.set_async(question, user_profile, answer)
+            
+            logger.info(f"Answered fitness question: {question[:50]}...")
+            return answer
+            
+        except Exception as e:
+            logger.error(f"Error answering question: {e}")
+            return QA_ERROR_MESSAGE
+    
+    async def answer_fitness_question_stream(self, question: str, user_profile: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Stream an answer to a fitness question
+        
+        Yields the answer text received so far each time Gemini sends a
+        chunk; the last value yielded is the complete, formatted answer.
+        Cached answers are yielded in one piece. The stream is read by a
+        separate task so the Gemini slot is freed as soon as the model is
+        done, however slowly the caller consumes the chunks.
+        """
+        started = time.monotonic()
+        text = ""
+        producer = None
+        try:
+            cached = await answer_cache.get_async(question, user_profile)
+            if cached:
+                logger.info(f"Answered fitness question from cache: {question[:50]}...")
+                yield cached
+                return
+            
+            prompt = self._create_qa_prompt(question, user_profile)
+            
+            chunks = asyncio.Queue()
+            producer = asyncio.create_task(self._read_stream(prompt, chunks))
+            while (chunk := await chunks.get()) is not None:
+                if not text:
+                    logger.info(f"Q&A time to first token: {time.monotonic() - started:.2f}s")
+                text += chunk
+                yield text
+            await producer  # Re-raises a failed stream
+            
+            answer = self._format_qa_response(text)
+            if not answer:
+                raise ValueError("Gemini returned an empty answer")
+            await answer_cache.set_async(question, user_profile, answer)
+            
+            logger.info(f"Answered fitness question in {time.monotonic() - started:.2f}s: {question[:50]}...")
+            yield answer
+            
+        except Exception as e:
+            logger.error(f"Error answering question: {e}")
+            # Keep what the user has already seen rather than replacing it
+            yield self._format_qa_response(text) or QA_ERROR_MESSAGE
+        finally:
+            if producer is not None and not producer.done():
+                producer.cancel()
+    
+    async def _read_stream(self, prompt: str, chunks: asyncio.Queue):
+        """Put the text of each streamed chunk on `chunks`, then None"""
+        try:
+            await gemini_scheduler.acquire(Priority.INTERACTIVE)
+            async with self._get_semaphore():
+                response = await self.model.generate_content_async(prompt, stream=True)
+                async for chunk in response:
+                    if chunk.text:
+                        chunks.put_nowait(chunk.text)
+        finally:
+            chunks.put_nowait(None)
     
     def extract_user_details(self, message: str) -> Dict[str, Any]:
         """
@@ -105,10 +365,10 @@ class GeminiService:
         try:
             prompt = self._create_extraction_prompt(message)
             
-            response = self.model.generate_content(prompt)
+            response = self.model.generate_content(prompt, generation_config=self.details_config)
             
             # Parse JSON response
-            extracted_data = json.loads(response.text.strip())
+            extracted_data = json_parser.parse(response.text, USER_DETAILS_SCHEMA, 'user details')
             
             logger.info(f"Extracted user details from message")
             return extracted_data
@@ -138,55 +398,84 @@ class GeminiService:
     3. 2 cool-down stretches for {target_muscle_group}
     4. Tracking-friendly structure with exercise index and name
 
-    Respond ONLY with valid JSON in this exact format:
-    {{
-    "workout_type": "{target_muscle_group}",
-    "duration_minutes": 30,
-    "difficulty": "Beginner/Intermediate/Advanced",
-    "exercises": [
-        {{
-        "name": "Exercise Name",
-        "type": "strength/cardio/flexibility",
-        "sets": 3,
-        "reps": "10-12",
-        "rest_seconds": 60,
-        "instructions": "How to perform",
-        "modifications": "Easier/harder variation"
-        }}
-    ],
-    "warmup": [
-        {{
-        "name": "Warm-up Exercise",
-        "duration_seconds": 30,
-        "instructions": "How to perform"
-        }}
-    ],
-    "cooldown": [
-        {{
-        "name": "Cool-down Stretch",
-        "duration_seconds": 30,
-        "instructions": "How to perform"
-        }}
-    ],
-    "tips": ["Safety tip", "Form cue", "Motivation"],
-    "calories_estimate": 200
-    }}
+    Set workout_type to "{target_muscle_group}". Give reps as a range string (e.g. "10-12")
+    and exercise type as strength, cardio or flexibility.
 
     Make the workout personalized, practical, and safe for their goals.
     Focus ALL exercises on {target_muscle_group} development.
     """
         return prompt
     
-    def generate_diet_plan(self, user_profile: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate a personalized diet plan based on user's profile"""
+    def generate_diet_plan(self, user_profile: Dict[str, Any], recent_diets: Optional[list] = None) -> Dict[str, Any]:
+        """Generate a personalized diet plan based on user's profile
+        
+        recent_diets may be passed in when the caller already fetched the
+        user's recent diet_plans rows; otherwise they are looked up here.
+        """
         try:
             # Get diet history for variety
-            diet_history = self._get_diet_history(user_profile.get('user_id'))
+            if recent_diets is not None:
+                diet_history = self._format_diet_history(recent_diets)
+            else:
+                diet_history = self._get_diet_history(user_profile.get('user_id'))
             
-            # Determine cuisine preference and variety
-            cuisine_preference = self._determine_cuisine_preference(diet_history)
+            prompt = self._create_diet_prompt(user_profile, diet_history)
+
+            response = self.model.generate_content(prompt, generation_config=self.diet_config)
+            return self._parse_diet_response(response.text)
+
+        except Exception as e:
+            logger.error(f"Error generating diet plan: {e}")
+            return self._get_fallback_diet_plan(user_profile)
+
+    async def generate_diet_plan_async(self, user_profile: Dict[str, Any], recent_diets: Optional[list] = None,
+                                       priority: Priority = Priority.INTERACTIVE, deadline: Optional[float] = None,
+                                       on_late_result: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+                                       fallback: bool = True) -> Dict[str, Any]:
+        """Awaitable variant of generate_diet_plan for use from bot handlers and batches
+        
+        Past `deadline` seconds the local diet plan is returned; see
+        _with_deadline for on_late_result. With fallback=False errors are
+        raised instead of being replaced by the local diet plan.
+        """
+        try:
+            if recent_diets is not None:
+                diet_history = self._format_diet_history(recent_diets)
+            else:
+                # History lookup is a blocking DB query, keep it off the event loop
+                diet_history = await run_db(self._get_diet_history, user_profile.get('user_id'))
             
-            prompt = f"""
+            prompt = self._create_diet_prompt(user_profile, diet_history)
+
+            return await self._with_deadline(
+                self._request_diet_plan(prompt, priority), deadline, on_late_result, 'diet plan generation'
+            )
+
+        except asyncio.TimeoutError:
+            if not fallback:
+                raise
+            return self._get_fallback_diet_plan(user_profile)
+        except GeminiOverloaded as e:
+            if not fallback:
+                raise
+            logger.warning(f"Using local diet plan: {e}")
+            return self._get_fallback_diet_plan(user_profile)
+        except Exception as e:
+            if not fallback:
+                raise
+            logger.error(f"Error generating diet plan: {e}")
+            return self._get_fallback_diet_plan(user_profile)
+
+    async def _request_diet_plan(self, prompt: str, priority: Priority) -> Dict[str, Any]:
+        response = await self._generate_content_async(prompt, priority, generation_config=self.diet_config)
+        return self._parse_diet_response(response.text)
+
+    def _create_diet_prompt(self, user_profile: Dict[str, Any], diet_history: str) -> str:
+        """Create structured prompt for daily diet generation"""
+        # Determine cuisine preference and variety
+        cuisine_preference = self._determine_cuisine_preference(diet_history)
+        
+        prompt = f"""
 You are a certified nutritionist specializing in both Western and Indian cuisine. Generate a structured daily diet plan for this user.
 
 USER PROFILE:
@@ -222,199 +511,17 @@ IMPORTANT GUIDELINES:
 6. Maintain proper protein, carb, and fat balance
 7. Consider user's fitness goals for portion sizes
 
-IMPORTANT: You MUST return ONLY a valid JSON object with the following EXACT structure. Do not include any other text, explanations, or markdown formatting:
-
-{{
-  "total_calories": number,
-  "cuisine_type": "Indian/Western/Mixed",
-  "meals": [
-    {{
-      "name": "Breakfast",
-      "time": "7:00 AM",
-      "items": [
-        {{
-          "name": "Example: Masala Oats with Vegetables",
-          "portion": "1 bowl",
-          "calories": 250,
-          "cuisine": "Indian",
-          "nutrition": {{
-            "protein": "8g",
-            "carbs": "45g",
-            "fats": "5g"
-          }}
-        }},
-        {{
-          "name": "Example: Greek Yogurt with Berries",
-          "portion": "1 cup",
-          "calories": 150,
-          "cuisine": "Western",
-          "nutrition": {{
-            "protein": "12g",
-            "carbs": "15g",
-            "fats": "3g"
-          }}
-        }}
-      ],
-      "total_calories": 400,
-      "cuisine": "Mixed"
-    }},
-    {{
-      "name": "Lunch",
-      "time": "12:30 PM",
-      "items": [
-        {{
-          "name": "Example: Roti with Dal and Sabzi",
-          "portion": "2 rotis, 1 bowl dal, 1 bowl sabzi",
-          "calories": 450,
-          "cuisine": "Indian",
-          "nutrition": {{
-            "protein": "15g",
-            "carbs": "60g",
-            "fats": "8g"
-          }}
-        }}
-      ],
-      "total_calories": 450,
-      "cuisine": "Indian"
-    }},
-    {{
-      "name": "Dinner",
-      "time": "7:00 PM",
-      "items": [
-        {{
-          "name": "Example: Grilled Chicken with Quinoa",
-          "portion": "150g chicken, 1 cup quinoa",
-          "calories": 400,
-          "cuisine": "Western",
-          "nutrition": {{
-            "protein": "35g",
-            "carbs": "45g",
-            "fats": "10g"
-          }}
-        }}
-      ],
-      "total_calories": 400,
-      "cuisine": "Western"
-    }}
-  ],
-  "snacks": [
-    {{
-      "time": "10:00 AM",
-      "items": [
-        {{
-          "name": "Example: Sprouts Chaat",
-          "portion": "1 bowl",
-          "calories": 150,
-          "cuisine": "Indian",
-          "nutrition": {{
-            "protein": "8g",
-            "carbs": "25g",
-            "fats": "3g"
-          }}
-        }}
-      ],
-      "total_calories": 150,
-      "cuisine": "Indian"
-    }},
-    {{
-      "time": "4:00 PM",
-      "items": [
-        {{
-          "name": "Example: Apple with Almonds",
-          "portion": "1 medium apple, 10 almonds",
-          "calories": 200,
-          "cuisine": "Western",
-          "nutrition": {{
-            "protein": "5g",
-            "carbs": "25g",
-            "fats": "10g"
-          }}
-        }}
-      ],
-      "total_calories": 200,
-      "cuisine": "Western"
-    }}
-  ],
-  "hydration": {{
-    "water": "8-10 glasses",
-    "other_beverages": [
-      "Green tea",
-      "Herbal tea",
-      "Buttermilk (chaas)",
-      "Coconut water"
-    ]
-  }},
-  "nutritional_summary": {{
-    "protein": "120g",
-    "carbs": "200g",
-    "fats": "60g",
-    "fiber": "25g"
-  }},
-  "notes": [
-    "Eat every 3-4 hours",
-    "Stay hydrated throughout the day",
-    "Adjust portions based on activity level",
-    "Include both Indian and Western options for variety"
-  ]
-}}
-
-Remember:
-1. Return ONLY the JSON object, no other text
-2. Include a mix of Indian and Western dishes
-3. Each meal must have detailed items with portions, calories, and nutrition info
-4. Include at least 2 snacks
-5. Total calories should match the sum of all meals and snacks
-6. Avoid repeating meals from recent history
+OUTPUT NOTES:
+1. Breakfast, Lunch and Dinner in meals (with times like "7:00 AM"), at least 2 snacks
+2. Each item has a portion, calories, cuisine and nutrition as gram strings (e.g. "8g")
+3. total_calories must match the sum of all meals and snacks
+4. Avoid repeating meals from recent history
 """
+        return prompt
 
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-
-            # Clean the response text
-            if response_text.startswith("```"):
-                response_text = response_text.replace("```json", "").replace("```", "").strip()
-            
-            # Remove any text before or after the JSON object
-            try:
-                start_idx = response_text.find("{")
-                end_idx = response_text.rfind("}") + 1
-                if start_idx == -1 or end_idx == 0:
-                    raise ValueError("No JSON object found in response")
-                response_text = response_text[start_idx:end_idx]
-            except Exception as e:
-                logger.error(f"Error extracting JSON from response: {e}")
-                raise
-
-            try:
-                diet_data = json.loads(response_text)
-                
-                # Validate required structure
-                required_keys = ["meals", "snacks", "hydration", "total_calories", "cuisine_type"]
-                for key in required_keys:
-                    if key not in diet_data:
-                        raise ValueError(f"Missing required key: {key}")
-                
-                # Validate meals structure
-                if not isinstance(diet_data["meals"], list) or len(diet_data["meals"]) < 3:
-                    raise ValueError("Must have at least 3 meals (breakfast, lunch, dinner)")
-                
-                # Validate each meal has required fields
-                for meal in diet_data["meals"]:
-                    if not all(k in meal for k in ["name", "time", "items", "total_calories", "cuisine"]):
-                        raise ValueError(f"Invalid meal structure: {meal}")
-                
-                return diet_data
-
-            except json.JSONDecodeError as e:
-                logger.error(f"Invalid JSON in diet response: {response_text}")
-                raise
-            except ValueError as e:
-                logger.error(f"Invalid diet plan structure: {e}")
-                raise
-
-        except Exception as e:
-            logger.error(f"Error generating diet plan: {e}")
-            return self._get_fallback_diet_plan(user_profile)
+    def _parse_diet_response(self, response_text: str) -> Dict[str, Any]:
+        """Parse and validate diet plan response from Gemini"""
+        return json_parser.parse(response_text, DIET_SCHEMA, 'diet plan')
 
     def _get_diet_history(self, user_id: Optional[int]) -> str:
         """Get recent diet history for the user"""
@@ -424,20 +531,25 @@ Remember:
         try:
             # Get last 5 diet plans
             recent_diets = DietPlan.get_user_diets(user_id, limit=5)
-            if not recent_diets:
-                return "No diet history available"
-            
-            history = "Recent meals:\n"
-            for diet in recent_diets:
-                if diet.diet_content and isinstance(diet.diet_content, dict):
-                    for meal in diet.diet_content.get('meals', []):
-                        history += f"- {meal.get('name')}: {[item.get('name') for item in meal.get('items', [])]}\n"
-            
-            return history
+            return self._format_diet_history(recent_diets)
         except Exception as e:
             logger.error(f"Error getting diet history: {e}")
             return "Error retrieving diet history"
 
+    def _format_diet_history(self, recent_diets: Optional[list]) -> str:
+        """Summarise recent diet plan rows for the diet prompt"""
+        if not recent_diets:
+            return "No diet history available"
+        
+        history = "Recent meals:\n"
+        for diet in recent_diets:
+            diet_content = diet.get('diet_content')
+            if diet_content and isinstance(diet_content, dict):
+                for meal in diet_content.get('meals', []):
+                    history += f"- {meal.get('name')}: {[item.get('name') for item in meal.get('items', [])]}\n"
+        
+        return history
+
     def _determine_cuisine_preference(self, diet_history: str) -> str:
         """Determine cuisine preference based on history and variety"""
         if "No diet history" in diet_history:
@@ -455,105 +567,9 @@ Remember:
             return "Mixed (Equal Indian and Western)"
 
     def _get_fallback_diet_plan(self, user_profile: Dict[str, Any]) -> Dict[str, Any]:
-        """Return a basic fallback diet plan if AI generation fails"""
-        return {
-            "total_calories": 2000,
-            "cuisine_type": "Mixed",
-            "meals": [
-                {
-                    "name": "Breakfast",
-                    "time": "7:00 AM",
-                    "items": [
-                        {
-                            "name": "Masala Oats with Vegetables",
-                            "portion": "1 bowl",
-                            "calories": 300,
-                            "cuisine": "Indian",
-                            "nutrition": {"protein": "10g", "carbs": "50g", "fats": "6g"}
-                        }
-                    ],
-                    "total_calories": 300,
-                    "cuisine": "Indian"
-                },
-                {
-                    "name": "Lunch",
-                    "time": "12:30 PM",
-                    "items": [
-                        {
-                            "name": "Roti with Dal and Sabzi",
-                            "portion": "2 rotis, 1 bowl dal, 1 bowl sabzi",
-                            "calories": 450,
-                            "cuisine": "Indian",
-                            "nutrition": {"protein": "15g", "carbs": "60g", "fats": "8g"}
-                        }
-                    ],
-                    "total_calories": 450,
-                    "cuisine": "Indian"
-                },
-                {
-                    "name": "Dinner",
-                    "time": "7:00 PM",
-                    "items": [
-                        {
-                            "name": "Grilled Chicken with Quinoa",
-                            "portion": "150g chicken, 1 cup quinoa",
-                            "calories": 400,
-                            "cuisine": "Western",
-                            "nutrition": {"protein": "35g", "carbs": "45g", "fats": "10g"}
-                        }
-                    ],
-                    "total_calories": 400,
-                    "cuisine": "Western"
-                }
-            ],
-            "snacks": [
-                {
-                    "time": "10:00 AM",
-                    "items": [
-                        {
-                            "name": "Sprouts Chaat",
-                            "portion": "1 bowl",
-                            "calories": 150,
-                            "cuisine": "Indian",
-                            "nutrition": {"protein": "8g", "carbs": "25g", "fats": "3g"}
-                        }
-                    ],
-                    "total_calories": 150,
-                    "cuisine": "Indian"
-                },
-                {
-                    "time": "4:00 PM",
-                    "items": [
-                        {
-                            "name": "Apple with Almonds",
-                            "portion": "1 medium apple, 10 almonds",
-                            "calories": 200,
-                            "cuisine": "Western",
-                            "nutrition": {"protein": "5g", "carbs": "25g", "fats": "10g"}
-                        }
-                    ],
-                    "total_calories": 200,
-                    "cuisine": "Western"
-                }
-            ],
-            "hydration": {
-                "water": "8-10 glasses",
-                "other_beverages": ["Green tea", "Buttermilk (chaas)", "Coconut water"]
-            },
-            "nutritional_summary": {
-                "protein": "100g",
-                "carbs": "180g",
-                "fats": "50g",
-                "fiber": "25g"
-            },
-            "notes": [
-                "Eat every 3-4 hours",
-                "Stay hydrated throughout the day",
-                "Include both Indian and Western options for variety",
-                "Consult a nutritionist for personalized advice"
-            ]
-        }
-    
+        """Return a locally built diet plan if AI generation fails"""
+        return plan_engine.generate_diet_plan(user_profile)
+
     def generate_daily_schedule(self, user_profile: Dict[str, Any], date: str) -> Dict[str, Any]:
         """Generate both workout and diet for a specific day"""
         try:
@@ -573,14 +589,10 @@ Remember:
     1. A 30-min targeted workout (see structure below)
     2. A full-day diet plan
 
-    Return JSON in this format:
-    {{
-    "workout": {{ ...same structure as generate_workout... }},
-    "diet": {{ ...same structure as generate_diet_plan... }}
-    }}
+    Return the workout under "workout" and the diet plan under "diet".
     """
-            response = self.model.generate_content(prompt)
-            return json.loads(response.text.strip())
+            response = self.model.generate_content(prompt, generation_config=self.schedule_config)
+            return json_parser.parse(response.text, DAILY_SCHEDULE_SCHEMA, 'daily schedule')
         except Exception as e:
             logger.error(f"Error generating full daily schedule: {e}")
             return {}
@@ -643,32 +655,7 @@ Message: "{message}"
     
     def _parse_workout_response(self, response_text: str) -> Dict[str, Any]:
         """Parse and validate workout response from Gemini"""
-        try:
-            # Clean response text (remove markdown formatting if present)
-            clean_text = response_text.strip()
-            if clean_text.startswith('```json'):
-                clean_text = clean_text[7:]
-            if clean_text.endswith('```'):
-                clean_text = clean_text[:-3]
-            
-            # Parse JSON
-            workout_data = json.loads(clean_text.strip())
-            
-            # Validate required fields
-            required_fields = ['workout_type', 'exercises', 'duration_minutes']
-            for field in required_fields:
-                if field not in workout_data:
-                    raise ValueError(f"Missing required field: {field}")
-            
-            # Ensure exercises is a list
-            if not isinstance(workout_data['exercises'], list) or len(workout_data['exercises']) == 0:
-                raise ValueError("Exercises must be a non-empty list")
-            
-            return workout_data
-            
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.error(f"Error parsing workout response: {e}")
-            raise
+        return json_parser.parse(response_text, WORKOUT_SCHEMA, 'workout')
     
     def _format_qa_response(self, response_text: str) -> str:
         """Format and clean Q&A response"""
@@ -691,238 +678,8 @@ Message: "{message}"
         return formatted
     
     def _get_fallback_workout(self, user_profile: Dict[str, Any], target_muscle_group: str = "Full Body") -> Dict[str, Any]:
-        """Return a basic fallback workout if AI generation fails"""
-        
-        fitness_level = user_profile.get('fitness_level', 'beginner')
-        
-        # Basic workout based on fitness level
-        if fitness_level == 'advanced':
-            reps = "12-15"
-            rest = 45
-            exercises_count = 6
-        elif fitness_level == 'intermediate':
-            reps = "10-12"
-            rest = 60
-            exercises_count = 5
-        else:  # beginner
-            reps = "8-10"
-            rest = 90
-            exercises_count = 4
-        
-        # Define exercises for each muscle group
-        muscle_group_exercises = {
-            "Arms": [
-                {
-                    "name": "Bicep Curls",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": reps,
-                    "rest_seconds": rest,
-                    "instructions": "Stand with dumbbells, curl weights up while keeping elbows close to body.",
-                    "modifications": "Use resistance bands (easier) or increase weight (harder)"
-                },
-                {
-                    "name": "Tricep Dips",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": reps,
-                    "rest_seconds": rest,
-                    "instructions": "Use a chair or bench, lower body by bending elbows, push back up.",
-                    "modifications": "Bend knees (easier) or straighten legs (harder)"
-                }
-            ],
-            "Chest": [
-                {
-                    "name": "Push-ups",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": reps,
-                    "rest_seconds": rest,
-                    "instructions": "Start in plank position, lower chest to ground, push back up.",
-                    "modifications": "Do on knees (easier) or elevate feet (harder)"
-                },
-                {
-                    "name": "Incline Push-ups",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": reps,
-                    "rest_seconds": rest,
-                    "instructions": "Place hands on elevated surface, perform push-up.",
-                    "modifications": "Use higher surface (easier) or lower surface (harder)"
-                }
-            ],
-            "Back": [
-                {
-                    "name": "Bent Over Rows",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": reps,
-                    "rest_seconds": rest,
-                    "instructions": "Bend at hips, pull weights to chest while squeezing shoulder blades.",
-                    "modifications": "Use lighter weights (easier) or heavier weights (harder)"
-                },
-                {
-                    "name": "Superman",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": "12-15",
-                    "rest_seconds": rest,
-                    "instructions": "Lie face down, lift arms and legs while squeezing back muscles.",
-                    "modifications": "Lift only upper body (easier) or add arm/leg pulses (harder)"
-                }
-            ],
-            "Legs": [
-                {
-                    "name": "Bodyweight Squats",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": reps,
-                    "rest_seconds": rest,
-                    "instructions": "Stand with feet shoulder-width apart, lower down as if sitting back into a chair.",
-                    "modifications": "Hold onto support (easier) or add jump (harder)"
-                },
-                {
-                    "name": "Lunges",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": reps,
-                    "rest_seconds": rest,
-                    "instructions": "Step forward, lower back knee toward ground, push back to start.",
-                    "modifications": "Hold onto support (easier) or add weights (harder)"
-                }
-            ],
-            "Shoulders": [
-                {
-                    "name": "Shoulder Press",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": reps,
-                    "rest_seconds": rest,
-                    "instructions": "Press weights overhead while keeping core engaged.",
-                    "modifications": "Use lighter weights (easier) or heavier weights (harder)"
-                },
-                {
-                    "name": "Lateral Raises",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": reps,
-                    "rest_seconds": rest,
-                    "instructions": "Raise arms to sides until parallel to ground.",
-                    "modifications": "Use lighter weights (easier) or heavier weights (harder)"
-                }
-            ],
-            "Abs": [
-                {
-                    "name": "Crunches",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": reps,
-                    "rest_seconds": rest,
-                    "instructions": "Lie on back, lift shoulders while engaging core.",
-                    "modifications": "Cross arms on chest (easier) or add weights (harder)"
-                },
-                {
-                    "name": "Plank",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": "30-45 seconds",
-                    "rest_seconds": rest,
-                    "instructions": "Hold straight line from head to heels, engage core.",
-                    "modifications": "Drop to knees (easier) or add leg lifts (harder)"
-                }
-            ],
-            "Cardio": [
-                {
-                    "name": "Jumping Jacks",
-                    "type": "cardio",
-                    "sets": 3,
-                    "reps": "30-45 seconds",
-                    "rest_seconds": rest,
-                    "instructions": "Jump while raising arms and legs out to sides.",
-                    "modifications": "Step instead of jump (easier) or add arm circles (harder)"
-                },
-                {
-                    "name": "High Knees",
-                    "type": "cardio",
-                    "sets": 3,
-                    "reps": "30-45 seconds",
-                    "rest_seconds": rest,
-                    "instructions": "Run in place while bringing knees up high.",
-                    "modifications": "March in place (easier) or add arm movements (harder)"
-                }
-            ],
-            "Full Body": [
-                {
-                    "name": "Bodyweight Squats",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": reps,
-                    "rest_seconds": rest,
-                    "instructions": "Stand with feet shoulder-width apart, lower down as if sitting back into a chair.",
-                    "modifications": "Hold onto support (easier) or add jump (harder)"
-                },
-                {
-                    "name": "Push-ups",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": reps,
-                    "rest_seconds": rest,
-                    "instructions": "Start in plank position, lower chest to ground, push back up.",
-                    "modifications": "Do on knees (easier) or elevate feet (harder)"
-                },
-                {
-                    "name": "Plank",
-                    "type": "strength",
-                    "sets": 3,
-                    "reps": "30-45 seconds",
-                    "rest_seconds": rest,
-                    "instructions": "Hold straight line from head to heels, engage core.",
-                    "modifications": "Drop to knees (easier) or add leg lifts (harder)"
-                }
-            ]
-        }
-        
-        # Get exercises for the target muscle group
-        exercises = muscle_group_exercises.get(target_muscle_group, muscle_group_exercises["Full Body"])
-        
-        fallback_workout = {
-            "workout_type": target_muscle_group,
-            "duration_minutes": 30,
-            "difficulty": fitness_level.title(),
-            "exercises": exercises,
-            "warmup": [
-                {
-                    "name": "Arm Circles",
-                    "duration_seconds": 30,
-                    "instructions": "Make large circles with your arms forward then backward"
-                },
-                {
-                    "name": "March in Place",
-                    "duration_seconds": 60,
-                    "instructions": "Lift knees high while marching in place"
-                }
-            ],
-            "cooldown": [
-                {
-                    "name": "Forward Fold",
-                    "duration_seconds": 30,
-                    "instructions": "Reach toward your toes, let your back round naturally"
-                },
-                {
-                    "name": "Shoulder Stretch",
-                    "duration_seconds": 30,
-                    "instructions": "Pull arm across chest, hold with other arm"
-                }
-            ],
-            "tips": [
-                "Focus on proper form over speed",
-                "Listen to your body and rest when needed",
-                "Stay hydrated throughout your workout"
-            ],
-            "calories_estimate": 150
-        }
-        
-        return fallback_workout
+        """Return a locally built workout if AI generation fails"""
+        return plan_engine.generate_workout(user_profile, target_muscle_group)
 
     def _determine_next_muscle_group(self, workout_history: Optional[list], muscle_groups: list) -> str:
         """Determine the next muscle group to target based on workout history"""
@@ -0,0 +1,288 @@
+import json
+import logging
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*$", re.MULTILINE)
+CLOSERS = {'{': '}', '[': ']'}
+
+class PlanParseError(ValueError):
+    """Model output that could not be parsed or repaired into the expected shape"""
+
+class TolerantJSONParser:
+    """Parses JSON from model output, repairing the defects Gemini commonly produces
+
+    Code fences and any prose around the JSON are dropped, trailing commas
+    are removed and output cut off mid-object is closed at the last complete
+    value. The result is checked against a schema (see src/gemini/schemas.py),
+    converting scalars where that is unambiguous. Counters record how often
+    each repair was needed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.clean = 0
+        self.failed = 0
+        self.repairs = Counter()
+
+    def parse(self, text: str, schema: Optional[Dict[str, Any]] = None, name: str = 'response') -> Any:
+        """Parse and validate `text`, raising PlanParseError if it cannot be repaired"""
+        repairs = []
+        try:
+            data = self._first_valid(self._decode(text or '', repairs), schema, name, repairs)
+        except PlanParseError as e:
+            with self._lock:
+                self.failed += 1
+            logger.error(f"Could not parse {name}: {e}")
+            raise
+
+        with self._lock:
+            self.parsed += 1
+            if repairs:
+                self.repairs.update(repairs)
+            else:
+                self.clean += 1
+        if repairs:
+            logger.warning(f"Repaired {name}: {', '.join(sorted(set(repairs)))}")
+        return data
+
+    def _first_valid(self, candidates, schema: Optional[Dict[str, Any]], name: str, repairs: List[str]) -> Any:
+        # Truncated output has several possible closings; take the first that fits the schema
+        error = None
+        for data in candidates:
+            if schema is None:
+                return data
+            attempt = []
+            try:
+                data = self._validate(data, schema, name, attempt)
+            except PlanParseError as e:
+                error = error or e
+                continue
+            repairs.extend(attempt)
+            return data
+        raise error or PlanParseError("truncated JSON could not be closed")
+
+    def _decode(self, text: str, repairs: List[str]):
+        """Yield the decoded value, or each decodable closing of truncated output"""
+        stripped = FENCE_RE.sub('', text)
+        if stripped != text:
+            repairs.append('fences')
+        text = stripped.strip()
+
+        start = min((i for i in (text.find('{'), text.find('[')) if i != -1), default=-1)
+        if start == -1:
+            raise PlanParseError("no JSON object found")
+
+        candidate, end, truncated = self._scan(text, start)
+        if start > 0 or end < len(text):
+            repairs.append('extracted')
+
+        without_commas = self._strip_trailing_commas(candidate)
+        if without_commas != candidate:
+            repairs.append('trailing_commas')
+            candidate = without_commas
+
+        if not truncated:
+            try:
+                yield json.loads(candidate)
+            except json.JSONDecodeError as e:
+                raise PlanParseError(f"invalid JSON: {e}") from e
+            return
+
+        repairs.append('truncated')
+        for attempt in self._truncation_candidates(candidate):
+            try:
+                yield json.loads(attempt)
+            except json.JSONDecodeError:
+                continue
+
+    @staticmethod
+    def _scan(text: str, start: int) -> Tuple[str, int, bool]:
+        """Find the end of the value starting at `start`; returns (text, end, truncated)"""
+        depth = 0
+        in_string = escaped = False
+        for i in range(start, len(text)):
+            char = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in '{[':
+                depth += 1
+            elif char in '}]':
+                depth -= 1
+                if depth == 0:
+                    return text[start:i + 1], i + 1, False
+        return text[start:], len(text), True
+
+    @staticmethod
+    def _strip_trailing_commas(text: str) -> str:
+        out = []
+        in_string = escaped = False
+        for i, char in enumerate(text):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == ',':
+                rest = text[i + 1:].lstrip()
+                if rest[:1] in ('}', ']'):
+                    continue
+            out.append(char)
+        return ''.join(out)
+
+    @staticmethod
+    def _truncation_candidates(text: str):
+        """Closings of cut-off JSON, most complete first
+
+        First the text as is (closing an open string), then the text cut back
+        to each earlier point where a complete value ended: before a comma or
+        just after an opening bracket.
+        """
+        stack = []
+        cuts = []  # (position, open brackets at that position)
+        in_string = escaped = False
+        for i, char in enumerate(text):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in '{[':
+                stack.append(char)
+                cuts.append((i + 1, tuple(stack)))
+            elif char in '}]':
+                if stack:
+                    stack.pop()
+            elif char == ',':
+                cuts.append((i, tuple(stack)))
+
+        def close(prefix: str, open_brackets) -> str:
+            return prefix.rstrip().rstrip(',') + ''.join(CLOSERS[b] for b in reversed(open_brackets))
+
+        tail = text + ('"' if in_string and not escaped else '')
+        yield close(tail, stack)
+        for position, open_brackets in reversed(cuts):
+            yield close(text[:position], open_brackets)
+
+    def _validate(self, value: Any, schema: Dict[str, Any], path: str, repairs: List[str]) -> Any:
+        kind = schema.get('type', 'OBJECT')
+        if value is None:
+            if schema.get('nullable') or kind not in ('OBJECT', 'ARRAY'):
+                return None
+            raise PlanParseError(f"{path} is null")
+
+        if kind == 'OBJECT':
+            if not isinstance(value, dict):
+                raise PlanParseError(f"{path} should be an object")
+            for key in schema.get('required', []):
+                if key not in value:
+                    raise PlanParseError(f"{path} is missing '{key}'")
+            for key, sub_schema in schema.get('properties', {}).items():
+                if key in value:
+                    value[key] = self._validate(value[key], sub_schema, f"{path}.{key}", repairs)
+            return value
+
+        if kind == 'ARRAY':
+            if isinstance(value, (str, dict)) and schema.get('items', {}).get('type') == kind_of(value):
+                # A lone item where a list was expected
+                repairs.append('wrapped')
+                value = [value]
+            if not isinstance(value, list):
+                raise PlanParseError(f"{path} should be a list")
+            if len(value) < schema.get('min_items', 0):
+                raise PlanParseError(f"{path} needs at least {schema['min_items']} items")
+            items = schema.get('items')
+            if items:
+                value = [self._validate(item, items, f"{path}[{i}]", repairs) for i, item in enumerate(value)]
+            return value
+
+        return self._coerce_scalar(value, schema, path, repairs)
+
+    @staticmethod
+    def _coerce_scalar(value: Any, schema: Dict[str, Any], path: str, repairs: List[str]) -> Any:
+        kind = schema['type']
+        if kind == 'STRING':
+            if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                raise PlanParseError(f"{path} should be a string")
+            if not isinstance(value, str):
+                repairs.append('coerced')
+                value = str(value)
+            enum = schema.get('enum')
+            if enum and value not in enum:
+                match = next((option for option in enum if option.lower() == value.strip().lower()), None)
+                if match is None:
+                    raise PlanParseError(f"{path} should be one of {enum}")
+                repairs.append('coerced')
+                value = match
+            return value
+
+        if kind in ('INTEGER', 'NUMBER'):
+            if isinstance(value, bool):
+                raise PlanParseError(f"{path} should be a number")
+            if isinstance(value, str):
+                # "300 kcal", "45 min" -> leading number
+                match = re.match(r"\s*(-?\d+(?:\.\d+)?)", value)
+                if not match:
+                    raise PlanParseError(f"{path} should be a number")
+                repairs.append('coerced')
+                value = float(match.group(1))
+            if not isinstance(value, (int, float)):
+                raise PlanParseError(f"{path} should be a number")
+            if kind == 'INTEGER' and not isinstance(value, int):
+                if value != int(value):
+                    repairs.append('coerced')
+                value = int(round(value))
+            return value
+
+        if kind == 'BOOLEAN':
+            if not isinstance(value, bool):
+                raise PlanParseError(f"{path} should be true or false")
+            return value
+
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Parse counters: clean parses, repaired parses by repair kind, failures"""
+        with self._lock:
+            total = self.parsed + self.failed
+            return {
+                'parsed': self.parsed,
+                'clean': self.clean,
+                'repaired': self.parsed - self.clean,
+                'failed': self.failed,
+                'repairs': dict(self.repairs),
+                'success_rate': round(self.parsed / total, 3) if total else 0.0
+            }
+
+def kind_of(value: Any) -> str:
+    """Schema type name of a decoded JSON value"""
+    if isinstance(value, dict):
+        return 'OBJECT'
+    if isinstance(value, list):
+        return 'ARRAY'
+    if isinstance(value, str):
+        return 'STRING'
+    return 'NUMBER'
+
+# Create a global instance
+json_parser = TolerantJSONParser()
@@ -0,0 +1,126 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from enum import IntEnum
+from typing import Any, Dict, Optional
+from config.config import Config
+from src.utils.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+class Priority(IntEnum):
+    """Gemini request classes, served in this order"""
+    INTERACTIVE = 0  # A user is waiting on the reply
+    BATCH = 1  # Nightly pre-generation
+    ANALYTICS = 2  # Reports and other background work
+
+class GeminiOverloaded(Exception):
+    """Raised instead of queueing when a request would wait past its deadline"""
+
+class GeminiScheduler:
+    """Admits Gemini calls at the quota rate, highest priority first
+
+    Calls take a token from a bucket refilled at rate_per_minute. When none
+    is left they queue, and each freed token goes to the oldest waiter of
+    the most urgent class. A request whose expected wait exceeds its class's
+    max wait is shed right away with GeminiOverloaded; a queued request
+    whose deadline passes gives up the same way. Callers then serve the
+    local fallback.
+    """
+
+    def __init__(self, rate_per_minute: float = 60, burst: Optional[float] = None,
+                 max_wait: Optional[Dict[Priority, float]] = None):
+        self.bucket = TokenBucket(rate_per_minute / 60, burst)
+        self.max_wait = max_wait or {}
+        self._heap = []  # (priority, sequence, future)
+        self._sequence = itertools.count()
+        self._pump_task = None
+        self.queued = {priority: 0 for priority in Priority}
+        self.max_queued = {priority: 0 for priority in Priority}
+        self.granted = {priority: 0 for priority in Priority}
+        self.shed = {priority: 0 for priority in Priority}
+        self.wait_seconds = {priority: 0.0 for priority in Priority}
+
+    def _expected_wait(self, priority: Priority) -> float:
+        # Everyone of equal or higher priority already queued is served first
+        ahead = sum(count for p, count in self.queued.items() if p <= priority)
+        return self.bucket.time_until(ahead + 1)
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE, deadline: Optional[float] = None):
+        """Wait for permission to call Gemini
+
+        `deadline` is the longest the caller will wait in seconds; it defaults
+        to the class's max wait. Raises GeminiOverloaded when it cannot be met.
+        """
+        if deadline is None:
+            deadline = self.max_wait.get(priority)
+
+        if not self._heap and self.bucket.try_acquire():
+            self.granted[priority] += 1
+            return
+
+        if deadline is not None and self._expected_wait(priority) > deadline:
+            self.shed[priority] += 1
+            raise GeminiOverloaded(f"{priority.name} Gemini request shed, queue wait exceeds {deadline:.0f}s")
+
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._sequence), future))
+        self.queued[priority] += 1
+        self.max_queued[priority] = max(self.max_queued[priority], self.queued[priority])
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=deadline)
+        except asyncio.TimeoutError:
+            self.shed[priority] += 1
+            raise GeminiOverloaded(f"{priority.name} Gemini request waited {deadline:.0f}s without a slot")
+        finally:
+            if not future.done():
+                # Timed out or cancelled: leave the token for the next waiter
+                future.cancel()
+                self.queued[priority] -= 1
+
+        self.granted[priority] += 1
+        self.wait_seconds[priority] += time.monotonic() - started
+
+    async def _pump(self):
+        """Hand out tokens to queued waiters as the bucket refills"""
+        while self._heap:
+            if self._heap[0][2].done():
+                heapq.heappop(self._heap)
+                continue
+            if self.bucket.try_acquire():
+                priority, _, future = heapq.heappop(self._heap)
+                self.queued[priority] -= 1
+                future.set_result(None)
+            else:
+                await asyncio.sleep(self.bucket.time_until(1))
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, admissions, shed requests and mean wait per priority class"""
+        stats = {'tokens_available': round(self.bucket.available, 2)}
+        for priority in Priority:
+            waited = self.granted[priority]
+            stats[priority.name.lower()] = {
+                'queued': self.queued[priority],
+                'max_queued': self.max_queued[priority],
+                'granted': waited,
+                'shed': self.shed[priority],
+                'mean_wait_seconds': round(self.wait_seconds[priority] / waited, 3) if waited else 0.0
+            }
+        return stats
+
+# Create a global instance
+gemini_scheduler = GeminiScheduler(
+    rate_per_minute=Config.GEMINI_REQUESTS_PER_MINUTE,
+    burst=Config.GEMINI_BURST,
+    max_wait={
+        Priority.INTERACTIVE: Config.GEMINI_INTERACTIVE_MAX_WAIT,
+        Priority.BATCH: Config.GEMINI_BATCH_MAX_WAIT,
+        Priority.ANALYTICS: Config.GEMINI_ANALYTICS_MAX_WAIT
+    }
+)
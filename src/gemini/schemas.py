@@ -0,0 +1,147 @@
+"""Response schemas for Gemini plan output
+
+Written in the OpenAPI subset Gemini accepts as a response_schema (upper
+case types, properties, required, items, nullable, enum). The parser also
+validates against them. min_items is enforced by the parser only and is
+removed by response_schema() before a schema is sent to Gemini.
+"""
+
+# Keys the parser understands but the Gemini API does not
+VALIDATION_ONLY_KEYS = ('min_items',)
+
+STRING = {"type": "STRING"}
+INTEGER = {"type": "INTEGER"}
+NUMBER = {"type": "NUMBER"}
+
+def string_list() -> dict:
+    return {"type": "ARRAY", "items": STRING}
+
+TIMED_STEP_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "name": STRING,
+        "duration_seconds": INTEGER,
+        "instructions": STRING
+    },
+    "required": ["name", "duration_seconds", "instructions"]
+}
+
+EXERCISE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "name": STRING,
+        "type": STRING,
+        "sets": INTEGER,
+        "reps": STRING,
+        "rest_seconds": INTEGER,
+        "instructions": STRING,
+        "modifications": STRING
+    },
+    "required": ["name", "sets", "reps", "instructions"]
+}
+
+WORKOUT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "workout_type": STRING,
+        "duration_minutes": INTEGER,
+        "difficulty": STRING,
+        "exercises": {"type": "ARRAY", "items": EXERCISE_SCHEMA, "min_items": 1},
+        "warmup": {"type": "ARRAY", "items": TIMED_STEP_SCHEMA},
+        "cooldown": {"type": "ARRAY", "items": TIMED_STEP_SCHEMA},
+        "tips": string_list(),
+        "calories_estimate": INTEGER
+    },
+    "required": ["workout_type", "exercises", "duration_minutes"]
+}
+
+FOOD_ITEM_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "name": STRING,
+        "portion": STRING,
+        "calories": INTEGER,
+        "cuisine": STRING,
+        "nutrition": {
+            "type": "OBJECT",
+            "properties": {"protein": STRING, "carbs": STRING, "fats": STRING}
+        }
+    },
+    "required": ["name", "portion", "calories"]
+}
+
+MEAL_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "name": STRING,
+        "time": STRING,
+        "items": {"type": "ARRAY", "items": FOOD_ITEM_SCHEMA},
+        "total_calories": INTEGER,
+        "cuisine": STRING
+    },
+    "required": ["name", "time", "items", "total_calories", "cuisine"]
+}
+
+SNACK_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "time": STRING,
+        "items": {"type": "ARRAY", "items": FOOD_ITEM_SCHEMA},
+        "total_calories": INTEGER,
+        "cuisine": STRING
+    },
+    "required": ["time", "items"]
+}
+
+DIET_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "total_calories": INTEGER,
+        "cuisine_type": STRING,
+        "meals": {"type": "ARRAY", "items": MEAL_SCHEMA, "min_items": 3},
+        "snacks": {"type": "ARRAY", "items": SNACK_SCHEMA},
+        "hydration": {
+            "type": "OBJECT",
+            "properties": {"water": STRING, "other_beverages": string_list()}
+        },
+        "nutritional_summary": {
+            "type": "OBJECT",
+            "properties": {"protein": STRING, "carbs": STRING, "fats": STRING, "fiber": STRING}
+        },
+        "notes": string_list()
+    },
+    "required": ["meals", "snacks", "hydration", "total_calories", "cuisine_type"]
+}
+
+DAILY_SCHEDULE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "workout": WORKOUT_SCHEMA,
+        "diet": DIET_SCHEMA
+    },
+    "required": ["workout", "diet"]
+}
+
+USER_DETAILS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "age": {"type": "INTEGER", "nullable": True},
+        "height": {"type": "NUMBER", "nullable": True},
+        "weight": {"type": "NUMBER", "nullable": True},
+        "fitness_level": {"type": "STRING", "format": "enum", "nullable": True, "enum": ["beginner", "intermediate", "advanced"]},
+        "goals": {"type": "STRING", "nullable": True}
+    }
+}
+
+def response_schema(schema: dict) -> dict:
+    """Copy of `schema` without the parser-only keys, for generation_config"""
+    cleaned = {}
+    for key, value in schema.items():
+        if key in VALIDATION_ONLY_KEYS:
+            continue
+        if key == 'properties':
+            value = {name: response_schema(sub) for name, sub in value.items()}
+        elif key == 'items':
+            value = response_schema(value)
+        cleaned[key] = value
+    return cleaned
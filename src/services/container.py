@@ -0,0 +1,118 @@
+import logging
+import threading
+from typing import Optional
+from telegram import Bot
+from telegram.ext import ContextTypes
+from src.database.supabase_client import supabase_client
+from src.database.models import User
+from src.gemini.answer_cache import answer_cache
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+class ServiceContainer:
+    """Process-wide services shared by every update
+
+    Each service is built on first use and then reused, so handlers no longer
+    construct a GeminiService (and re-run genai.configure) per message.
+    """
+
+    def __init__(self, bot: Optional[Bot] = None):
+        self.bot = bot
+        self.caches = {'profiles': User.profile_cache, 'answers': answer_cache}  # Named in-process caches shared across handlers
+        self._gemini_service = None
+        self._reminder_service = None
+        self._pregeneration_service = None
+        self._handlers = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self):
+        """Shared Supabase client"""
+        return supabase_client.client
+
+    @property
+    def gemini_service(self):
+        """Shared Gemini client"""
+        if self._gemini_service is None:
+            with self._lock:
+                if self._gemini_service is None:
+                    from src.gemini.gemini_service import GeminiService
+                    self._gemini_service = GeminiService()
+                    logger.info("Shared Gemini service created")
+        return self._gemini_service
+
+    @property
+    def reminder_service(self):
+        """Shared reminder service (needs the bot to send messages)"""
+        if self._reminder_service is None:
+            if self.bot is None:
+                raise RuntimeError("Reminder service requires a bot instance")
+            with self._lock:
+                if self._reminder_service is None:
+                    from src.services.reminder_service import ReminderService
+                    self._reminder_service = ReminderService(self.bot)
+        return self._reminder_service
+
+    @property
+    def pregeneration_service(self):
+        """Shared nightly plan pre-generation batch"""
+        if self._pregeneration_service is None:
+            gemini_service = self.gemini_service
+            with self._lock:
+                if self._pregeneration_service is None:
+                    from src.services.pregeneration_service import PregenerationService
+                    self._pregeneration_service = PregenerationService(
+                        gemini_service,
+                        concurrency=Config.PREGENERATION_CONCURRENCY,
+                        run_at=Config.PREGENERATION_TIME,
+                        retry_interval=Config.PREGENERATION_RETRY_INTERVAL
+                    )
+        return self._pregeneration_service
+    
+    @property
+    def handlers(self):
+        """Shared BotHandlers instance for the AI-backed handler methods"""
+        if self._handlers is None:
+            gemini_service = self.gemini_service
+            with self._lock:
+                if self._handlers is None:
+                    from src.bot.handlers import BotHandlers
+                    self._handlers = BotHandlers(gemini_service=gemini_service)
+        return self._handlers
+
+    def chat_log_stats(self) -> dict:
+        """Queue counters for the buffered chat log writer"""
+        from src.database.chat_log_writer import chat_log_writer
+        return chat_log_writer.stats()
+    
+    def json_parse_stats(self) -> dict:
+        """Clean/repaired/failed counts for parsed Gemini output"""
+        from src.gemini.json_parser import json_parser
+        return json_parser.stats()
+    
+    def gemini_scheduler_stats(self) -> dict:
+        """Queue depth, admissions and shed requests per Gemini priority class"""
+        from src.gemini.scheduler import gemini_scheduler
+        return gemini_scheduler.stats()
+    
+    def cache_stats(self) -> dict:
+        """Hit/miss counters for every registered cache"""
+        return {name: cache.stats() for name, cache in self.caches.items()}
+
+# Fallback container for code paths that run without an Application
+_default_container = ServiceContainer()
+
+def install_services(application) -> ServiceContainer:
+    """Create the container for an Application and expose it via bot_data"""
+    services = ServiceContainer(application.bot)
+    application.bot_data['services'] = services
+    return services
+
+def get_services(context: Optional[ContextTypes.DEFAULT_TYPE] = None) -> ServiceContainer:
+    """Return the container installed on the running Application"""
+    if context is not None:
+        services = context.application.bot_data.get('services')
+        if services is not None:
+            return services
+    return _default_container
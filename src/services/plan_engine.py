@@ -0,0 +1,349 @@
+import hashlib
+import logging
+import random
+from datetime import date
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Goal keywords mapped to coarse categories, checked in order. muscle_gain
+# comes first so "gain weight" never reads as weight loss; "weight" on its
+# own says nothing about direction and is only matched in phrases.
+GOAL_CATEGORIES = [
+    ('muscle_gain', ('gain weight', 'put on weight', 'muscle', 'gain', 'bulk', 'mass', 'strength', 'strong', 'lifting')),
+    ('fat_loss', ('lose weight', 'weight loss', 'lose', 'loss', 'fat', 'cut', 'slim')),
+    ('endurance', ('endurance', 'stamina', 'cardio', 'run', 'marathon')),
+]
+
+def goal_category(goals: Optional[str]) -> str:
+    """Map free-text goals to 'fat_loss', 'muscle_gain', 'endurance' or 'general'"""
+    goals = (goals or '').lower()
+    for category, keywords in GOAL_CATEGORIES:
+        if any(keyword in goals for keyword in keywords):
+            return category
+    return 'general'
+
+# sets, reps, rest and number of main exercises per fitness level
+LEVEL_SETTINGS = {
+    'beginner': {'sets': 2, 'reps': '8-10', 'rest_seconds': 90, 'count': 4, 'kcal_per_minute': 5},
+    'intermediate': {'sets': 3, 'reps': '10-12', 'rest_seconds': 60, 'count': 5, 'kcal_per_minute': 7},
+    'advanced': {'sets': 4, 'reps': '12-15', 'rest_seconds': 45, 'count': 6, 'kcal_per_minute': 9},
+}
+
+# Goal-specific rep schemes override the level default for strength work
+GOAL_REPS = {
+    'fat_loss': '12-15',
+    'muscle_gain': '8-12',
+    'endurance': '15-20',
+}
+
+EXERCISE_CATALOG = {
+    'Arms': [
+        ('Bicep Curls', 'strength', "Stand with dumbbells, curl weights up while keeping elbows close to body.", "Use resistance bands (easier) or increase weight (harder)"),
+        ('Tricep Dips', 'strength', "Use a chair or bench, lower body by bending elbows, push back up.", "Bend knees (easier) or straighten legs (harder)"),
+        ('Hammer Curls', 'strength', "Hold dumbbells with palms facing each other and curl to shoulder height.", "Lighter weights (easier) or slow 3-second lowering (harder)"),
+        ('Diamond Push-ups', 'strength', "Push-up with hands together under the chest to load the triceps.", "Do on knees (easier) or elevate feet (harder)"),
+        ('Overhead Tricep Extension', 'strength', "Hold one dumbbell overhead with both hands, lower behind head, press up.", "Seated (easier) or single arm (harder)"),
+        ('Concentration Curls', 'strength', "Seated, elbow braced on inner thigh, curl the dumbbell slowly.", "Lighter weight (easier) or pause at the top (harder)"),
+    ],
+    'Chest': [
+        ('Push-ups', 'strength', "Start in plank position, lower chest to ground, push back up.", "Do on knees (easier) or elevate feet (harder)"),
+        ('Incline Push-ups', 'strength', "Place hands on elevated surface, perform push-up.", "Use higher surface (easier) or lower surface (harder)"),
+        ('Dumbbell Floor Press', 'strength', "Lie on the floor and press dumbbells up from chest level.", "Lighter weights (easier) or single arm (harder)"),
+        ('Wide Push-ups', 'strength', "Push-up with hands wider than shoulders to target the outer chest.", "Do on knees (easier) or add a pause at the bottom (harder)"),
+        ('Dumbbell Flyes', 'strength', "Lying on a bench or floor, open arms wide with a soft elbow and squeeze back up.", "Lighter weights (easier) or slower tempo (harder)"),
+        ('Decline Push-ups', 'strength', "Feet on a bench, hands on the floor, lower chest and press up.", "Lower bench (easier) or higher bench (harder)"),
+    ],
+    'Back': [
+        ('Bent Over Rows', 'strength', "Bend at hips, pull weights to chest while squeezing shoulder blades.", "Use lighter weights (easier) or heavier weights (harder)"),
+        ('Superman Hold', 'strength', "Lie face down, lift arms and legs off the floor and hold.", "Lift arms only (easier) or add small pulses (harder)"),
+        ('Single-Arm Dumbbell Row', 'strength', "One hand on a bench, row the dumbbell to the hip.", "Lighter weight (easier) or pause at the top (harder)"),
+        ('Reverse Snow Angels', 'strength', "Face down, sweep arms from hips to overhead keeping them off the floor.", "Smaller range (easier) or hold light plates (harder)"),
+        ('Resistance Band Pull-Aparts', 'strength', "Hold a band at shoulder height and pull it apart to your chest.", "Lighter band (easier) or heavier band (harder)"),
+        ('Inverted Rows', 'strength', "Under a sturdy table or bar, pull chest up to it with a straight body.", "Bend knees (easier) or elevate feet (harder)"),
+    ],
+    'Legs': [
+        ('Bodyweight Squats', 'strength', "Feet shoulder-width apart, sit hips back and down, stand up tall.", "Squat to a chair (easier) or hold dumbbells (harder)"),
+        ('Lunges', 'strength', "Step forward and lower the back knee toward the floor, push back up.", "Hold a support (easier) or walking lunges with weights (harder)"),
+        ('Glute Bridges', 'strength', "Lie on your back, knees bent, drive hips up and squeeze glutes.", "Both legs (easier) or single leg (harder)"),
+        ('Step-ups', 'strength', "Step onto a sturdy bench or stair and drive through the front heel.", "Lower step (easier) or hold dumbbells (harder)"),
+        ('Romanian Deadlifts', 'strength', "Hinge at the hips with a flat back, lower weights along the legs, stand up.", "Lighter weights (easier) or single leg (harder)"),
+        ('Calf Raises', 'strength', "Rise onto the balls of your feet and lower slowly.", "Both legs (easier) or single leg on a step (harder)"),
+    ],
+    'Shoulders': [
+        ('Shoulder Press', 'strength', "Press dumbbells from shoulder height to overhead without arching the back.", "Seated (easier) or standing single arm (harder)"),
+        ('Lateral Raises', 'strength', "Raise dumbbells out to the sides to shoulder height.", "Bent elbows (easier) or slow lowering (harder)"),
+        ('Front Raises', 'strength', "Raise dumbbells in front to shoulder height, lower with control.", "Lighter weights (easier) or alternate arms with a pause (harder)"),
+        ('Pike Push-ups', 'strength', "Hips high in an inverted V, lower head toward the floor and press up.", "Hands on a bench (easier) or feet elevated (harder)"),
+        ('Rear Delt Flyes', 'strength', "Bent over, raise dumbbells out to the sides squeezing the upper back.", "Lighter weights (easier) or pause at the top (harder)"),
+        ('Arnold Press', 'strength', "Start palms facing you, rotate outward while pressing overhead.", "Seated (easier) or slower tempo (harder)"),
+    ],
+    'Abs': [
+        ('Plank', 'strength', "Hold straight line from head to heels, engage core.", "Drop to knees (easier) or add leg lifts (harder)"),
+        ('Crunches', 'strength', "Lie on your back, knees bent, curl shoulders toward hips.", "Smaller range (easier) or hold a weight (harder)"),
+        ('Bicycle Crunches', 'strength', "Alternate elbow to opposite knee while extending the other leg.", "Slower pace (easier) or straighter legs (harder)"),
+        ('Leg Raises', 'strength', "Lying flat, raise straight legs to vertical and lower slowly.", "Bent knees (easier) or hover at the bottom (harder)"),
+        ('Russian Twists', 'strength', "Seated with feet lifted, rotate the torso side to side.", "Feet down (easier) or hold a weight (harder)"),
+        ('Dead Bug', 'strength', "On your back, extend opposite arm and leg while keeping the lower back flat.", "Move one limb at a time (easier) or hold light weights (harder)"),
+    ],
+    'Cardio': [
+        ('Jumping Jacks', 'cardio', "Jump feet out while raising arms overhead, return to start.", "Step out instead of jumping (easier) or faster pace (harder)"),
+        ('High Knees', 'cardio', "Run in place driving knees to hip height.", "March in place (easier) or sprint pace (harder)"),
+        ('Mountain Climbers', 'cardio', "In plank, drive knees toward chest alternately.", "Slow steps (easier) or faster pace (harder)"),
+        ('Burpees', 'cardio', "Squat, kick feet back to plank, return and jump up.", "Step back instead of jumping (easier) or add a push-up (harder)"),
+        ('Skater Jumps', 'cardio', "Leap side to side landing on one foot.", "Step side to side (easier) or wider jumps (harder)"),
+        ('Jump Rope', 'cardio', "Skip rope at a steady rhythm on the balls of your feet.", "Imaginary rope (easier) or double-unders (harder)"),
+    ],
+    'Full Body': [
+        ('Push-ups', 'strength', "Start in plank position, lower chest to ground, push back up.", "Do on knees (easier) or elevate feet (harder)"),
+        ('Bodyweight Squats', 'strength', "Feet shoulder-width apart, sit hips back and down, stand up tall.", "Squat to a chair (easier) or hold dumbbells (harder)"),
+        ('Plank', 'strength', "Hold straight line from head to heels, engage core.", "Drop to knees (easier) or add leg lifts (harder)"),
+        ('Bent Over Rows', 'strength', "Bend at hips, pull weights to chest while squeezing shoulder blades.", "Use lighter weights (easier) or heavier weights (harder)"),
+        ('Lunges', 'strength', "Step forward and lower the back knee toward the floor, push back up.", "Hold a support (easier) or walking lunges with weights (harder)"),
+        ('Burpees', 'cardio', "Squat, kick feet back to plank, return and jump up.", "Step back instead of jumping (easier) or add a push-up (harder)"),
+        ('Shoulder Press', 'strength', "Press dumbbells from shoulder height to overhead without arching the back.", "Seated (easier) or standing single arm (harder)"),
+    ],
+}
+
+WARMUPS = [
+    ('Arm Circles', 30, "Make large circles with your arms forward then backward"),
+    ('March in Place', 60, "Lift knees high while marching in place"),
+    ('Hip Circles', 30, "Hands on hips, rotate the hips in wide circles both ways"),
+    ('Leg Swings', 30, "Hold a wall and swing each leg forward and back"),
+    ('Torso Twists', 30, "Rotate the upper body side to side with arms relaxed"),
+    ('Jumping Jacks', 45, "Light, easy jacks to raise the heart rate"),
+]
+
+COOLDOWNS = [
+    ('Forward Fold', 30, "Reach toward your toes, let your back round naturally"),
+    ('Shoulder Stretch', 30, "Pull arm across chest, hold with other arm"),
+    ('Quad Stretch', 30, "Standing, pull one heel toward the glutes and hold"),
+    ("Child's Pose", 45, "Kneel, sit back on your heels and reach the arms forward"),
+    ('Chest Opener', 30, "Clasp hands behind your back and lift gently"),
+    ('Cat-Cow', 45, "On all fours, alternate arching and rounding the spine slowly"),
+]
+
+TIPS = {
+    'fat_loss': ["Keep rest periods short to keep your heart rate up", "Pair training with a modest calorie deficit"],
+    'muscle_gain': ["Add weight or reps when the last set feels easy", "Eat protein within a couple of hours after training"],
+    'endurance': ["Keep a steady pace you could hold a conversation at", "Increase volume by no more than 10% a week"],
+    'general': ["Consistency beats intensity - aim for regular sessions", "Mix strength and cardio through the week"],
+}
+COMMON_TIPS = ["Focus on proper form over speed", "Listen to your body and rest when needed", "Stay hydrated throughout your workout"]
+
+# name, portion, calories, protein g, carbs g, fats g, cuisine
+FOOD_CATALOG = {
+    'breakfast': [
+        ('Masala Oats with Vegetables', '1 bowl', 300, 10, 50, 6, 'Indian'),
+        ('Vegetable Poha', '1 plate', 280, 6, 50, 7, 'Indian'),
+        ('Moong Dal Chilla with Mint Chutney', '2 chillas', 320, 18, 40, 8, 'Indian'),
+        ('Idli with Sambar', '3 idlis, 1 bowl sambar', 330, 12, 60, 4, 'Indian'),
+        ('Greek Yogurt with Berries and Granola', '1 bowl', 310, 20, 40, 8, 'Western'),
+        ('Scrambled Eggs on Whole Wheat Toast', '2 eggs, 2 slices', 350, 20, 30, 15, 'Western'),
+        ('Peanut Butter Banana Smoothie', '1 large glass', 380, 15, 50, 14, 'Western'),
+    ],
+    'lunch': [
+        ('Roti with Dal and Sabzi', '2 rotis, 1 bowl dal, 1 bowl sabzi', 450, 15, 60, 8, 'Indian'),
+        ('Rajma Chawal', '1 bowl rajma, 1 cup rice', 480, 18, 80, 8, 'Indian'),
+        ('Chicken Curry with Brown Rice', '150g chicken, 1 cup rice', 550, 38, 55, 16, 'Indian'),
+        ('Paneer Bhurji with Roti', '100g paneer, 2 rotis', 500, 25, 45, 22, 'Indian'),
+        ('Grilled Chicken Salad', '150g chicken, large salad', 420, 40, 20, 18, 'Western'),
+        ('Quinoa Bowl with Chickpeas', '1 large bowl', 460, 18, 65, 12, 'Western'),
+        ('Tuna Whole Wheat Wrap', '1 wrap', 430, 30, 40, 14, 'Western'),
+    ],
+    'dinner': [
+        ('Grilled Chicken with Quinoa', '150g chicken, 1 cup quinoa', 400, 35, 45, 10, 'Western'),
+        ('Baked Salmon with Vegetables', '150g salmon, 1 cup vegetables', 450, 35, 15, 25, 'Western'),
+        ('Palak Paneer with Roti', '1 bowl, 2 rotis', 480, 22, 45, 22, 'Indian'),
+        ('Dal Khichdi with Curd', '1 bowl khichdi, 1 small bowl curd', 420, 16, 65, 9, 'Indian'),
+        ('Egg Curry with Rice', '2 eggs, 1 cup rice', 460, 20, 55, 16, 'Indian'),
+        ('Tofu Stir Fry with Noodles', '1 plate', 430, 22, 50, 14, 'Asian'),
+        ('Turkey Meatballs with Whole Wheat Pasta', '1 plate', 500, 35, 55, 14, 'Western'),
+    ],
+    'snack': [
+        ('Sprouts Chaat', '1 bowl', 150, 8, 25, 3, 'Indian'),
+        ('Apple with Almonds', '1 medium apple, 10 almonds', 200, 5, 25, 10, 'Western'),
+        ('Roasted Chana', '1 small bowl', 160, 9, 25, 3, 'Indian'),
+        ('Buttermilk with Roasted Makhana', '1 glass, 1 cup', 140, 6, 20, 4, 'Indian'),
+        ('Cottage Cheese with Pineapple', '1 cup', 180, 20, 15, 4, 'Western'),
+        ('Boiled Eggs', '2 eggs', 155, 13, 1, 11, 'Western'),
+        ('Hummus with Carrot Sticks', '3 tbsp, 1 cup', 170, 6, 18, 8, 'Western'),
+    ],
+}
+
+MEAL_SLOTS = [
+    # slot, display name, default time, share of daily calories
+    ('breakfast', 'Breakfast', '7:00 AM', 0.25),
+    ('lunch', 'Lunch', '12:30 PM', 0.30),
+    ('dinner', 'Dinner', '7:00 PM', 0.30),
+]
+SNACK_SLOTS = [('10:00 AM', 0.07), ('4:00 PM', 0.08)]
+
+class LocalPlanEngine:
+    """Builds workout and diet plans locally from exercise and food catalogs
+
+    Plans have the same shape as the Gemini ones. Choices are seeded from
+    the user, the date and the focus, so the same request gives the same
+    plan while different days and users get variety. Used as the fallback
+    when Gemini fails and as a fast path when it is slow or over budget.
+    """
+
+    @staticmethod
+    def _rng(*parts) -> random.Random:
+        # hashlib rather than hash() so plans are stable across processes
+        seed = hashlib.sha256('|'.join(str(part) for part in parts).encode()).hexdigest()
+        return random.Random(int(seed[:16], 16))
+
+    def generate_workout(self, user_profile: Dict[str, Any], target_muscle_group: str = "Full Body",
+                         on_date: Optional[date] = None) -> Dict[str, Any]:
+        """Build a workout for the muscle group, scaled to fitness level and goal"""
+        on_date = on_date or date.today()
+        fitness_level = (user_profile.get('fitness_level') or 'beginner').lower()
+        settings = LEVEL_SETTINGS.get(fitness_level, LEVEL_SETTINGS['beginner'])
+        goal = goal_category(user_profile.get('goals'))
+        rng = self._rng(user_profile.get('user_id'), on_date.isoformat(), target_muscle_group)
+
+        catalog = EXERCISE_CATALOG.get(target_muscle_group, EXERCISE_CATALOG['Full Body'])
+        picked = rng.sample(catalog, min(settings['count'], len(catalog)))
+        rest = settings['rest_seconds'] - (15 if goal in ('fat_loss', 'endurance') else 0)
+
+        exercises = []
+        for name, kind, instructions, modifications in picked:
+            if kind == 'cardio':
+                reps = f"{30 + 15 * (settings['count'] - 4)} seconds"
+            elif name in ('Plank', 'Superman Hold'):
+                reps = f"{20 + 10 * (settings['count'] - 3)} seconds"
+            else:
+                reps = GOAL_REPS.get(goal, settings['reps'])
+            exercises.append({
+                "name": name,
+                "type": kind,
+                "sets": settings['sets'],
+                "reps": reps,
+                "rest_seconds": rest,
+                "instructions": instructions,
+                "modifications": modifications
+            })
+
+        duration = 10 + len(exercises) * settings['sets'] * 2
+        return {
+            "workout_type": target_muscle_group,
+            "duration_minutes": duration,
+            "difficulty": fitness_level.title(),
+            "exercises": exercises,
+            "warmup": [
+                {"name": name, "duration_seconds": seconds, "instructions": instructions}
+                for name, seconds, instructions in rng.sample(WARMUPS, 2)
+            ],
+            "cooldown": [
+                {"name": name, "duration_seconds": seconds, "instructions": instructions}
+                for name, seconds, instructions in rng.sample(COOLDOWNS, 2)
+            ],
+            "tips": TIPS[goal] + rng.sample(COMMON_TIPS, 1),
+            "calories_estimate": duration * settings['kcal_per_minute']
+        }
+
+    @staticmethod
+    def daily_calorie_target(user_profile: Dict[str, Any]) -> int:
+        """Mifflin-St Jeor estimate (sex-neutral constant), adjusted for level and goal"""
+        try:
+            weight = float(user_profile.get('weight'))
+            height = float(user_profile.get('height'))
+            age = float(user_profile.get('age'))
+        except (TypeError, ValueError):
+            return 2000
+
+        bmr = 10 * weight + 6.25 * height - 5 * age - 78
+        activity = {'beginner': 1.4, 'intermediate': 1.55, 'advanced': 1.7}
+        calories = bmr * activity.get((user_profile.get('fitness_level') or '').lower(), 1.4)
+        calories += {'fat_loss': -400, 'muscle_gain': 300}.get(goal_category(user_profile.get('goals')), 0)
+        return int(round(max(1200, min(calories, 4000)) / 50) * 50)
+
+    @staticmethod
+    def _portion(food: tuple, calorie_budget: float) -> Dict[str, Any]:
+        """Scale a catalog item in quarter steps toward the calorie budget"""
+        name, portion, calories, protein, carbs, fats, cuisine = food
+        scale = min(2.0, max(0.75, round(calorie_budget / calories * 4) / 4))
+        if scale != 1.0:
+            portion = f"{portion} (x{scale:g})"
+        return {
+            "name": name,
+            "portion": portion,
+            "calories": int(calories * scale),
+            "cuisine": cuisine,
+            "nutrition": {
+                "protein": f"{int(protein * scale)}g",
+                "carbs": f"{int(carbs * scale)}g",
+                "fats": f"{int(fats * scale)}g"
+            },
+            "_macros": (protein * scale, carbs * scale, fats * scale)
+        }
+
+    def generate_diet_plan(self, user_profile: Dict[str, Any], on_date: Optional[date] = None) -> Dict[str, Any]:
+        """Build a day of meals and snacks that adds up to the user's calorie target"""
+        on_date = on_date or date.today()
+        target = self.daily_calorie_target(user_profile)
+        goal = goal_category(user_profile.get('goals'))
+        rng = self._rng(user_profile.get('user_id'), on_date.isoformat(), 'diet')
+
+        if goal == 'muscle_gain':
+            # Favour the highest-protein options
+            def choose(slot):
+                return max(rng.sample(FOOD_CATALOG[slot], 3), key=lambda food: food[3])
+        else:
+            def choose(slot):
+                return rng.choice(FOOD_CATALOG[slot])
+
+        items = []
+        meals = []
+        for slot, display_name, meal_time, share in MEAL_SLOTS:
+            item = self._portion(choose(slot), target * share)
+            items.append(item)
+            meals.append({
+                "name": display_name,
+                "time": meal_time,
+                "items": [item],
+                "total_calories": item['calories'],
+                "cuisine": item['cuisine']
+            })
+
+        snacks = []
+        for snack_time, share in SNACK_SLOTS:
+            item = self._portion(choose('snack'), target * share)
+            items.append(item)
+            snacks.append({
+                "time": snack_time,
+                "items": [item],
+                "total_calories": item['calories'],
+                "cuisine": item['cuisine']
+            })
+
+        protein, carbs, fats = (sum(item['_macros'][i] for item in items) for i in range(3))
+        for item in items:
+            del item['_macros']
+
+        return {
+            "total_calories": sum(item['calories'] for item in items),
+            "cuisine_type": "Mixed",
+            "meals": meals,
+            "snacks": snacks,
+            "hydration": {
+                "water": "8-10 glasses",
+                "other_beverages": ["Green tea", "Buttermilk (chaas)", "Coconut water"]
+            },
+            "nutritional_summary": {
+                "protein": f"{int(protein)}g",
+                "carbs": f"{int(carbs)}g",
+                "fats": f"{int(fats)}g",
+                "fiber": "25g"
+            },
+            "notes": [
+                f"Built around a daily target of about {target} calories",
+                "Eat every 3-4 hours",
+                "Stay hydrated throughout the day",
+                "Consult a nutritionist for personalized advice"
+            ]
+        }
+
+# Create a global instance
+plan_engine = LocalPlanEngine()
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from src.database.models import User, Workout, DietPlan, local_now, local_today
+from src.database.async_models import run_db
+from src.gemini.scheduler import GeminiOverloaded, Priority
+
+logger = logging.getLogger(__name__)
+
+class PregenerationService:
+    """Nightly batch that builds tomorrow's workout and diet plans in advance
+
+    Every user with a complete profile gets a workout and a diet plan saved
+    with status 'pregenerated' and tomorrow's scheduled_date, generated by a
+    bounded pool of workers. /schedule claims those rows instead of waiting
+    on Gemini. Only Gemini plans are stored: a user Gemini cannot serve
+    (quota, errors) is retried every retry_interval seconds until the day
+    starts, after which /schedule generates their plans on demand.
+    """
+
+    def __init__(self, gemini_service, concurrency: int = 4, run_at: str = '22:00', retry_interval: float = 900):
+        self.gemini_service = gemini_service
+        self.concurrency = concurrency
+        self.retry_interval = retry_interval
+        self.run_at = datetime.strptime(run_at, '%H:%M').time()
+        self.is_running = False
+        self._task = None
+
+    async def run_for_date(self, scheduled_date: str) -> int:
+        """Pre-generate plans for every complete profile; returns the number of users still missing one"""
+        started = time.monotonic()
+        users, have_workout, have_diet = await asyncio.gather(
+            run_db(User.get_complete_profiles),
+            run_db(Workout.get_pregenerated_user_ids, scheduled_date),
+            run_db(DietPlan.get_pregenerated_user_ids, scheduled_date)
+        )
+        # Skip users finished by an earlier (interrupted) run
+        pending = [user for user in users if not (user.user_id in have_workout and user.user_id in have_diet)]
+        logger.info(f"Pre-generating plans for {len(pending)} users for {scheduled_date}")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def worker(user: User) -> bool:
+            async with semaphore:
+                return await self.generate_for_user(
+                    user, scheduled_date,
+                    workout=user.user_id not in have_workout,
+                    diet=user.user_id not in have_diet
+                )
+
+        results = await asyncio.gather(*(worker(user) for user in pending))
+        done = sum(1 for result in results if result)
+        logger.info(f"Pre-generated plans for {done}/{len(pending)} users in {time.monotonic() - started:.1f}s")
+        return len(pending) - done
+
+    async def generate_for_user(self, user: User, scheduled_date: str, workout: bool = True, diet: bool = True) -> bool:
+        """Generate and store one user's plans for the date
+
+        Returns False, storing nothing for the plan that failed, when Gemini
+        cannot produce it; the local fallback plans are never stored.
+        """
+        try:
+            user_profile = {
+                'user_id': user.user_id,
+                'age': user.age,
+                'height': user.height,
+                'weight': user.weight,
+                'fitness_level': user.fitness_level,
+                'goals': user.goals
+            }
+            recent_workouts, recent_diets = await asyncio.gather(
+                run_db(Workout.get_user_workouts, user.user_id, 3),
+                run_db(DietPlan.get_user_diets, user.user_id, 5)
+            )
+            workout_history = [w.workout_content for w in recent_workouts if w.workout_content]
+
+            # Each plan is saved as soon as it exists, so a retry only redoes the missing one
+            if workout:
+                workout_data = await self.gemini_service.generate_workout_async(
+                    user_profile, workout_history, priority=Priority.BATCH, fallback=False
+                )
+                saved = await run_db(Workout(
+                    user_id=user.user_id,
+                    workout_content=workout_data,
+                    status='pregenerated',
+                    scheduled_date=scheduled_date,
+                    total_exercises=len(workout_data.get('exercises', []))
+                ).save)
+                if not saved:
+                    return False
+            if diet:
+                diet_data = await self.gemini_service.generate_diet_plan_async(
+                    user_profile, recent_diets, priority=Priority.BATCH, fallback=False
+                )
+                saved = await run_db(DietPlan(
+                    user_id=user.user_id,
+                    diet_content=diet_data,
+                    scheduled_date=scheduled_date,
+                    status='pregenerated'
+                ).save)
+                if not saved:
+                    return False
+
+            return True
+
+        except GeminiOverloaded as e:
+            logger.warning(f"Pre-generation for user {user.user_id} deferred to the next retry: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Error pre-generating plans for user {user.user_id}: {e}")
+            return False
+
+    async def delete_stale(self, today: str) -> int:
+        """Drop pre-generated plans whose day passed without the user claiming them"""
+        workouts, diets = await asyncio.gather(
+            run_db(Workout.delete_stale_pregenerated, today),
+            run_db(DietPlan.delete_stale_pregenerated, today)
+        )
+        if workouts or diets:
+            logger.info(f"Deleted {workouts} unclaimed pre-generated workouts and {diets} diet plans")
+        return workouts + diets
+
+    def _seconds_until_next_run(self) -> float:
+        now = local_now()
+        next_run = datetime.combine(now.date(), self.run_at, tzinfo=now.tzinfo)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    async def start(self):
+        """Run the batch every night at the configured time"""
+        self.is_running = True
+        logger.info("Pre-generation service started")
+
+        while self.is_running:
+            try:
+                await asyncio.sleep(self._seconds_until_next_run())
+                # Same calendar /schedule uses for scheduled_date
+                today = local_today()
+                await self.delete_stale(today.isoformat())
+                scheduled_date = (today + timedelta(days=1)).isoformat()
+                remaining = await self.run_for_date(scheduled_date)
+                # Retry users Gemini could not serve until their plans' day begins
+                while remaining and self.is_running and local_today() == today:
+                    await asyncio.sleep(self.retry_interval)
+                    if local_today() != today:
+                        break
+                    remaining = await self.run_for_date(scheduled_date)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in pre-generation service: {e}")
+                await asyncio.sleep(60)
+
+    def start_background(self) -> asyncio.Task:
+        """Run start() as a task on the current (application) event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.start())
+        return self._task
+
+    async def shutdown(self):
+        """Stop the nightly loop (a batch in progress resumes on the next run)"""
+        self.is_running = False
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Pre-generation service stopped")
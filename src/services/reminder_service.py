@@ -1,74 +1,281 @@
 import logging
 import asyncio
-from datetime import datetime, timedelta
+import heapq
+import time
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from telegram import Bot
-from src.database.models import Reminder, User, Workout, DietPlan
+from telegram.error import BadRequest, Forbidden, RetryAfter
+from src.database.models import Reminder, User, Workout, DietPlan, local_now, local_today
 from src.database.supabase_client import supabase_client
+from src.database.async_models import run_db
 from config.config import Config
 from src.utils.chat_logger import log_reminder_message, log_completion_message
+from src.utils.rate_limiter import TokenBucket, KeyedTokenBucket
 
 logger = logging.getLogger(__name__)
 
 class ReminderService:
-    """Service for handling reminders and notifications"""
+    """Service for handling reminders and notifications
+
+    Upcoming reminders are kept in a min-heap ordered by due time. The
+    service sleeps until the earliest one is due (or until new reminders
+    are pushed in), and only re-reads the reminders table every
+    resync_interval seconds, for the window up to the next resync.
+    Reminders overdue by more than REMINDER_STALE_MINUTES are expired. Due reminders are claimed atomically before
+    sending, so several bot processes can share the same table.
+    """
     
     def __init__(self, bot: Bot):
         self.bot = bot
         self.is_running = False
-        self.check_interval = 30  # Check every 30 seconds
+        self.resync_interval = Config.REMINDER_RESYNC_INTERVAL
+        self.worker_id = Config.REMINDER_WORKER_ID
+        self.lease_seconds = Config.REMINDER_LEASE_SECONDS
+        # Claim no more than half a lease's worth of sends at the global rate,
+        # so every claimed reminder goes out well before its lease runs out
+        self.claim_chunk_size = max(1, int(Config.TELEGRAM_GLOBAL_RATE * self.lease_seconds / 2))
+        self._heap = []  # (due_at, reminder_id, Reminder)
+        self._scheduled_ids = set()
+        self._loop = None
+        self._wake = None
+        self._next_resync = 0.0
+        self._task = None
+        # Fan-out for due reminders, kept inside Telegram's flood limits
+        self._dispatch_semaphore = asyncio.Semaphore(Config.REMINDER_DISPATCH_CONCURRENCY)
+        self._global_limiter = TokenBucket(Config.TELEGRAM_GLOBAL_RATE)
+        self._chat_limiter = KeyedTokenBucket(Config.TELEGRAM_PER_CHAT_RATE)
     
     async def start(self):
         """Start the reminder service"""
         self.is_running = True
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._next_resync = 0.0
         logger.info("Reminder service started")
         
         while self.is_running:
             try:
+                if time.monotonic() >= self._next_resync:
+                    await self.resync()
                 await self.check_and_send_reminders()
-                await asyncio.sleep(self.check_interval)
+                await self._sleep_until_next_due()
             except Exception as e:
                 logger.error(f"Error in reminder service: {e}")
-                await asyncio.sleep(self.check_interval)
+                await asyncio.sleep(1)
+    
+    def start_background(self) -> asyncio.Task:
+        """Run start() as a task on the current (application) event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.start())
+        return self._task
     
     def stop(self):
         """Stop the reminder service"""
         self.is_running = False
+        if self._loop and self._wake:
+            self._loop.call_soon_threadsafe(self._wake.set)
         logger.info("Reminder service stopped")
     
+    async def shutdown(self, timeout: float = 30):
+        """Stop scheduling and wait up to `timeout` seconds for the current batch to be sent"""
+        self.stop()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Reminder dispatch did not drain in time, cancelling")
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+    
+    async def resync(self):
+        """Reload the heap from the reminders table (due within the next resync interval)"""
+        now = datetime.now(timezone.utc)
+        stale_before = now - timedelta(minutes=Config.REMINDER_STALE_MINUTES)
+        
+        await run_db(Reminder.release_expired_claims)
+        await run_db(Reminder.expire_stale, stale_before)
+        reminders = await run_db(
+            Reminder.get_upcoming_reminders,
+            until=now + timedelta(seconds=self.resync_interval),
+            since=stale_before
+        )
+        
+        self._heap = []
+        self._scheduled_ids = set()
+        self._push(reminders)
+        self._next_resync = time.monotonic() + self.resync_interval
+        logger.debug(f"Reminder heap re-synced with {len(self._heap)} reminders")
+    
+    def schedule_reminders(self, reminders: list):
+        """Add newly created reminders to the heap; safe to call from any thread"""
+        if not reminders or not self._loop:
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._push(reminders)
+        else:
+            self._loop.call_soon_threadsafe(self._push, reminders)
+    
+    def _push(self, reminders: list):
+        for reminder in reminders:
+            if reminder.status != 'pending' or reminder.id in self._scheduled_ids:
+                continue
+            due_at = self._due_at(reminder)
+            if due_at is None:
+                continue
+            heapq.heappush(self._heap, (due_at, reminder.id, reminder))
+            self._scheduled_ids.add(reminder.id)
+        if self._wake:
+            self._wake.set()
+    
+    @staticmethod
+    def _due_at(reminder: Reminder) -> Optional[datetime]:
+        """Timezone-aware moment at which the reminder should go out"""
+        if reminder.due_at:
+            return reminder.due_at
+        try:
+            return Reminder.compute_due_at(str(reminder.reminder_time))
+        except (TypeError, ValueError):
+            logger.error(f"Invalid reminder time {reminder.reminder_time!r} for reminder {reminder.id}")
+            return None
+    
+    def _pop_due(self) -> list:
+        now = datetime.now(timezone.utc)
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, reminder_id, reminder = heapq.heappop(self._heap)
+            self._scheduled_ids.discard(reminder_id)
+            due.append(reminder)
+        return due
+    
+    async def _sleep_until_next_due(self):
+        self._wake.clear()
+        if not self.is_running:
+            return
+        timeout = max(0.0, self._next_resync - time.monotonic())
+        if self._heap:
+            timeout = min(timeout, max(0.0, (self._heap[0][0] - datetime.now(timezone.utc)).total_seconds()))
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+    
     async def check_and_send_reminders(self):
-        """Check for pending reminders and send them"""
+        """Send every reminder in the heap that is now due"""
         try:
-            # Get all pending reminders that need to be sent
-            pending_reminders = Reminder.get_pending_reminders()
-            
-            for reminder in pending_reminders:
-                await self.send_reminder(reminder)
+            await self.dispatch(self._pop_due())
                 
         except Exception as e:
             logger.error(f"Error checking reminders: {e}")
     
-    async def send_reminder(self, reminder: Reminder):
-        """Send a reminder message to the user"""
+    async def dispatch(self, reminders: list):
+        """Send a batch of reminders concurrently, within the rate limits
+
+        Reminders are claimed claim_chunk_size at a time, each chunk just
+        before it is sent, so a large batch never outlives its lease.
+        """
+        if not reminders:
+            return
+        
+        started = time.monotonic()
+        claimed = sent = 0
+        for start in range(0, len(reminders), self.claim_chunk_size):
+            chunk = reminders[start:start + self.claim_chunk_size]
+            # Only send what this worker managed to claim; other instances get the rest
+            chunk = await run_db(
+                Reminder.claim, [reminder.id for reminder in chunk],
+                self.worker_id, self.lease_seconds
+            )
+            if not chunk:
+                continue
+            
+            users, workouts, diets = await self._prefetch(chunk)
+            results = await asyncio.gather(*(
+                self._dispatch_one(reminder, users.get(reminder.user_id), self._related(reminder, workouts, diets))
+                for reminder in chunk
+            ))
+            claimed += len(chunk)
+            sent += sum(1 for result in results if result)
+        
+        if claimed:
+            elapsed = time.monotonic() - started
+            logger.info(f"Dispatched {sent}/{claimed} reminders in {elapsed:.2f}s")
+    
+    async def _prefetch(self, reminders: list):
+        """Load the users, workouts and diet plans for a batch with one query each"""
+        user_ids = [reminder.user_id for reminder in reminders]
+        workout_ids = [r.related_id for r in reminders if r.related_type == 'workout' and r.related_id]
+        diet_ids = [r.related_id for r in reminders if r.related_type == 'diet' and r.related_id]
+        
+        return await asyncio.gather(
+            run_db(User.get_by_user_ids, user_ids),
+            run_db(Workout.get_by_ids, workout_ids),
+            run_db(DietPlan.get_by_ids, diet_ids)
+        )
+    
+    @staticmethod
+    def _related(reminder: Reminder, workouts: dict, diets: dict):
+        if reminder.related_type == 'workout':
+            return workouts.get(reminder.related_id)
+        if reminder.related_type == 'diet':
+            return diets.get(reminder.related_id)
+        return None
+    
+    async def _dispatch_one(self, reminder: Reminder, user=None, related=None) -> bool:
+        # Wait on the chat's own limit before taking a dispatch slot
+        await self._chat_limiter.acquire(reminder.user_id)
+        async with self._dispatch_semaphore:
+            await self._global_limiter.acquire()
+            return await self.send_reminder(reminder, user=user, related=related)
+    
+    async def send_reminder(self, reminder: Reminder, user: Optional[User] = None, related=None) -> bool:
+        """Send a reminder message to the user; returns True once it is delivered
+        
+        `user` and `related` (the Workout or diet plan row) are normally
+        prefetched for the whole batch and are only looked up here when missing.
+        Reminders that can never be delivered (unknown user, bot blocked,
+        message rejected) are marked 'failed'; other errors leave the claim
+        to expire so the reminder is retried.
+        """
         try:
             # Get user details
-            user = User.get_by_user_id(reminder.user_id)
+            if user is None:
+                user = await run_db(User.get_by_user_id, reminder.user_id)
             if not user:
                 logger.error(f"User {reminder.user_id} not found for reminder {reminder.id}")
-                return
+                await run_db(reminder.mark_failed)
+                return False
+            
+            if related is None and reminder.related_id:
+                workouts, diets = await asyncio.gather(
+                    run_db(Workout.get_by_ids, [reminder.related_id] if reminder.related_type == 'workout' else []),
+                    run_db(DietPlan.get_by_ids, [reminder.related_id] if reminder.related_type == 'diet' else [])
+                )
+                related = self._related(reminder, workouts, diets)
             
             # Create reminder message based on type
-            message = self.create_reminder_message(reminder)
+            workout = related if reminder.related_type == 'workout' else None
+            message = self.create_reminder_message(reminder, workout)
             
             # Create keyboard based on reminder type
             from telegram import InlineKeyboardButton, InlineKeyboardMarkup
             
             if reminder.reminder_type == 'workout':
                 # For workout reminders, include exercise completion buttons
-                keyboard = await self.create_workout_reminder_keyboard(reminder)
+                keyboard = await self.create_workout_reminder_keyboard(reminder, workout)
             elif reminder.reminder_type in ['breakfast', 'lunch', 'dinner', 'snack']:
                 # For meal reminders, include meal completion buttons
-                keyboard = await self.create_meal_reminder_keyboard(reminder)
+                diet_data = related if reminder.related_type == 'diet' else None
+                keyboard = await self.create_meal_reminder_keyboard(reminder, diet_data)
             else:
                 # Fallback to simple complete/skip buttons
                 keyboard = [
@@ -80,13 +287,28 @@ class ReminderService:
             
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            # Send the reminder
-            await self.bot.send_message(
-                chat_id=reminder.user_id,
-                text=message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
+            # Send the reminder (once more after a flood-control wait)
+            try:
+                try:
+                    await self.bot.send_message(
+                        chat_id=reminder.user_id,
+                        text=message,
+                        reply_markup=reply_markup,
+                        parse_mode='Markdown'
+                    )
+                except RetryAfter as e:
+                    logger.warning(f"Flood limit hit sending reminder {reminder.id}, retrying in {e.retry_after}s")
+                    await asyncio.sleep(e.retry_after)
+                    await self.bot.send_message(
+                        chat_id=reminder.user_id,
+                        text=message,
+                        reply_markup=reply_markup,
+                        parse_mode='Markdown'
+                    )
+            except (Forbidden, BadRequest) as e:
+                logger.error(f"Reminder {reminder.id} cannot be delivered to user {reminder.user_id}: {e}")
+                await run_db(reminder.mark_failed)
+                return False
             
             # Log reminder message
             log_reminder_message(
@@ -96,27 +318,20 @@ class ReminderService:
             )
             
             # Mark reminder as sent
-            reminder.mark_sent()
+            await run_db(reminder.mark_sent)
             
             logger.info(f"Sent reminder {reminder.id} to user {reminder.user_id}")
+            return True
             
         except Exception as e:
             logger.error(f"Error sending reminder {reminder.id}: {e}", exc_info=True)
+            return False
     
-    async def create_workout_reminder_keyboard(self, reminder: Reminder):
+    async def create_workout_reminder_keyboard(self, reminder: Reminder, workout: Optional[Workout] = None):
         """Create keyboard with exercise completion buttons for workout reminders"""
         try:
             from telegram import InlineKeyboardButton
             
-            # Get the workout data
-            from src.database.models import Workout
-            workout = None
-            workouts = Workout.get_user_workouts(reminder.user_id, limit=10)
-            for w in workouts:
-                if w.id == reminder.related_id:
-                    workout = w
-                    break
-            
             if not workout or not workout.workout_content:
                 # Fallback to simple complete/skip buttons
                 return [
@@ -174,20 +389,11 @@ class ReminderService:
                 ]
             ]
     
-    async def create_meal_reminder_keyboard(self, reminder: Reminder):
+    async def create_meal_reminder_keyboard(self, reminder: Reminder, diet_data: Optional[dict] = None):
         """Create keyboard with meal completion buttons for meal reminders"""
         try:
             from telegram import InlineKeyboardButton
             
-            # Get the diet data
-            from src.database.models import DietPlan
-            diet_data = None
-            user_diets = DietPlan.get_user_diets(reminder.user_id, limit=10)
-            for d in user_diets:
-                if d.get('id') == reminder.related_id:
-                    diet_data = d
-                    break
-            
             if not diet_data:
                 # Fallback to simple complete/skip buttons
                 return [
@@ -238,7 +444,7 @@ class ReminderService:
                 ]
             ]
     
-    def create_reminder_message(self, reminder: Reminder) -> str:
+    def create_reminder_message(self, reminder: Reminder, workout: Optional[Workout] = None) -> str:
         """Create a formatted reminder message"""
         emoji_map = {
             'workout': '💪',
@@ -251,15 +457,6 @@ class ReminderService:
         emoji = emoji_map.get(reminder.reminder_type, '⏰')
         
         if reminder.reminder_type == 'workout':
-            # Get workout details for enhanced message
-            from src.database.models import Workout
-            workout = None
-            workouts = Workout.get_user_workouts(reminder.user_id, limit=10)
-            for w in workouts:
-                if w.id == reminder.related_id:
-                    workout = w
-                    break
-            
             base_message = (
                 f"{emoji} **Workout Reminder**\n\n"
                 f"Time to get moving! Your workout is scheduled for {reminder.scheduled_time}.\n\n"
@@ -301,15 +498,14 @@ class ReminderService:
     def create_daily_reminders(user_id: int, workout_data: dict, diet_data: dict, 
                               workout_time: str, breakfast_time: str, lunch_time: str, 
                               dinner_time: str, snack_time: str):
-        """Create reminders for a user's daily schedule"""
+        """Create reminders for a user's daily schedule and return the created Reminders"""
         try:
-            from datetime import datetime, timedelta
-            
             logger.info(f"Creating daily reminders for user {user_id}")
-            logger.info(f"Times: workout={workout_time}, breakfast={breakfast_time}, lunch={lunch_time}, dinner={dinner_time}, snack={snack_time}")
+            logger.debug(f"Times: workout={workout_time}, breakfast={breakfast_time}, lunch={lunch_time}, dinner={dinner_time}, snack={snack_time}")
+            reminders = []
             
-            # Get current time
-            now = datetime.now()
+            # Get current time (reminder times are in Config.TIMEZONE)
+            now = local_now()
             current_time = now.strftime('%H:%M')
             
             # Check if all times have passed for today
@@ -330,15 +526,14 @@ class ReminderService:
                     'duration_minutes': workout_data.get('duration_minutes', 30),
                     'calories_estimate': workout_data.get('calories_estimate', 'N/A')
                 }
-                workout_reminder = Reminder.create_reminder(
+                reminders.append(Reminder.build(
                     user_id=user_id,
                     reminder_type='workout',
                     scheduled_time=workout_time,
                     content=workout_content,
                     related_id=workout_data.get('id'),
                     related_type='workout'
-                )
-                logger.info(f"Created workout reminder: {workout_reminder}")
+                ))
             
             # Create meal reminders
             if diet_data:
@@ -347,8 +542,8 @@ class ReminderService:
                 meals = diet_content.get('meals', [])
                 snacks = diet_content.get('snacks', [])
                 
-                logger.info(f"Diet data found: {len(meals)} meals, {len(snacks)} snacks")
-                logger.info(f"Diet content keys: {list(diet_content.keys()) if isinstance(diet_content, dict) else 'Not a dict'}")
+                logger.debug(f"Diet data found: {len(meals)} meals, {len(snacks)} snacks")
+                logger.debug(f"Diet content keys: {list(diet_content.keys()) if isinstance(diet_content, dict) else 'Not a dict'}")
                 
                 # Breakfast reminder
                 if breakfast_time and meals:
@@ -362,7 +557,7 @@ class ReminderService:
                         breakfast_meal = meals[0]  # Use first meal as breakfast
                     
                     if breakfast_meal:
-                        breakfast_reminder = Reminder.create_reminder(
+                        reminders.append(Reminder.build(
                             user_id=user_id,
                             reminder_type='breakfast',
                             scheduled_time=breakfast_time,
@@ -372,8 +567,7 @@ class ReminderService:
                             },
                             related_id=diet_data.get('id'),
                             related_type='diet'
-                        )
-                        logger.info(f"Created breakfast reminder: {breakfast_reminder}")
+                        ))
                     else:
                         logger.warning(f"No breakfast meal found in diet data")
                 
@@ -391,7 +585,7 @@ class ReminderService:
                         lunch_meal = meals[0]  # Use first meal if only one exists
                     
                     if lunch_meal:
-                        lunch_reminder = Reminder.create_reminder(
+                        reminders.append(Reminder.build(
                             user_id=user_id,
                             reminder_type='lunch',
                             scheduled_time=lunch_time,
@@ -401,8 +595,7 @@ class ReminderService:
                             },
                             related_id=diet_data.get('id'),
                             related_type='diet'
-                        )
-                        logger.info(f"Created lunch reminder: {lunch_reminder}")
+                        ))
                     else:
                         logger.warning(f"No lunch meal found in diet data")
                 
@@ -418,7 +611,7 @@ class ReminderService:
                         dinner_meal = meals[-1]  # Use last meal as dinner
                     
                     if dinner_meal:
-                        dinner_reminder = Reminder.create_reminder(
+                        reminders.append(Reminder.build(
                             user_id=user_id,
                             reminder_type='dinner',
                             scheduled_time=dinner_time,
@@ -428,15 +621,14 @@ class ReminderService:
                             },
                             related_id=diet_data.get('id'),
                             related_type='diet'
-                        )
-                        logger.info(f"Created dinner reminder: {dinner_reminder}")
+                        ))
                     else:
                         logger.warning(f"No dinner meal found in diet data")
                 
                 # Snack reminder
                 if snack_time and snacks:
                     snack = snacks[0] if snacks else {}
-                    snack_reminder = Reminder.create_reminder(
+                    reminders.append(Reminder.build(
                         user_id=user_id,
                         reminder_type='snack',
                         scheduled_time=snack_time,
@@ -446,17 +638,20 @@ class ReminderService:
                         },
                         related_id=diet_data.get('id'),
                         related_type='diet'
-                    )
-                    logger.info(f"Created snack reminder: {snack_reminder}")
+                    ))
                 elif snack_time:
                     logger.warning(f"Snack time provided but no snacks found in diet data")
             else:
                 logger.warning(f"No diet data provided for user {user_id}")
             
-            logger.info(f"Successfully created daily reminders for user {user_id}")
+            # One insert for the whole day
+            created = Reminder.bulk_create(reminders)
+            logger.info(f"Created {len(created)} daily reminders for user {user_id}")
+            return created
             
         except Exception as e:
             logger.error(f"Error creating daily reminders for user {user_id}: {e}", exc_info=True)
+            return []
     
     @staticmethod
     async def handle_reminder_completion(bot: Bot, reminder_id: int, action: str):
@@ -469,21 +664,8 @@ class ReminderService:
                 logger.error(f"Reminder {reminder_id} not found")
                 return
             
-            reminder_data = result.data[0]
-            reminder = Reminder(
-                id=reminder_data['id'],
-                user_id=reminder_data['user_id'],
-                reminder_type=reminder_data['reminder_type'],
-                scheduled_time=reminder_data['scheduled_time'],
-                reminder_time=reminder_data['reminder_time'],
-                content=reminder_data['content'],
-                status=reminder_data['status'],
-                related_id=reminder_data['related_id'],
-                related_type=reminder_data['related_type'],
-                created_at=reminder_data['created_at'],
-                sent_at=reminder_data['sent_at'],
-                completed_at=reminder_data['completed_at']
-            )
+            # Full row, due_at included, so marking it completed does not clear it
+            reminder = Reminder._from_row(result.data[0])
             
             # Handle based on reminder type
             if reminder.reminder_type == 'workout':
@@ -582,7 +764,7 @@ class ReminderService:
                 status='completed' if action == 'complete' else 'skipped',
                 id=diet_data['id'],
                 created_date=diet_data.get('created_date'),
-                completion_date=datetime.now().date().isoformat()
+                completion_date=local_today().isoformat()
             )
             
             # Save the updated diet plan
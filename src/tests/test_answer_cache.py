@@ -0,0 +1,47 @@
+import pytest
+from src.gemini.answer_cache import AnswerCache, SimilarityIndex
+
+BUCKET = 'beginner|fat_loss|30-44'
+
+def find_after_storing(stored: str, asked: str, threshold: float = 0.6):
+    index = SimilarityIndex(threshold=threshold)
+    index.add(BUCKET, AnswerCache.normalize_question(stored), 'stored answer')
+    return index.find(BUCKET, AnswerCache.normalize_question(asked))
+
+@pytest.mark.parametrize("first, second", [
+    ('exercises', 'exercise'),
+    ('exercising', 'exercise'),
+    ('running', 'run'),
+    ('calories', 'calorie'),
+    ('stretches', 'stretch'),
+    ('muscles', 'muscle'),
+    ('classes', 'class'),
+])
+def test_stem_matches_word_forms(first, second):
+    assert AnswerCache.stem(first) == AnswerCache.stem(second)
+
+def test_paraphrase_matches():
+    assert find_after_storing("What exercises burn the most fat?", "which exercise burns most fat") == 'stored answer'
+
+def test_unrelated_question_does_not_match():
+    assert find_after_storing("What exercises burn the most fat?", "how much protein after a workout") is None
+
+def test_threshold_is_respected():
+    stored, asked = "best exercises for fat loss", "best exercises for back pain"
+    assert find_after_storing(stored, asked, threshold=0.25) == 'stored answer'
+    assert find_after_storing(stored, asked, threshold=0.6) is None
+
+@pytest.mark.parametrize("stored, asked", [
+    ("should I eat before a workout", "should I not eat before a workout"),
+    ("should I eat before a workout", "should I never eat before a workout"),
+    ("should I eat before a workout", "shouldn't I eat before a workout"),
+    ("foods to eat when cutting", "foods to avoid when cutting"),
+])
+def test_negation_never_matches(stored, asked):
+    assert find_after_storing(stored, asked) is None
+    assert find_after_storing(asked, stored) is None
+
+def test_buckets_are_separate():
+    index = SimilarityIndex()
+    index.add(BUCKET, AnswerCache.normalize_question("is cardio good for fat loss"), 'stored answer')
+    assert index.find('advanced|muscle_gain|18-29', AnswerCache.normalize_question("is cardio good for fat loss")) is None
@@ -0,0 +1,77 @@
+import pytest
+from src.gemini.json_parser import TolerantJSONParser, PlanParseError
+from src.gemini.schemas import WORKOUT_SCHEMA, DIET_SCHEMA, USER_DETAILS_SCHEMA
+
+WORKOUT_JSON = """{
+    "workout_type": "Legs",
+    "duration_minutes": 30,
+    "exercises": [
+        {"name": "Squats", "sets": 3, "reps": "10-12", "instructions": "Sit back and down"},
+        {"name": "Lunges", "sets": 3, "reps": "10", "instructions": "Step forward"}
+    ],
+    "tips": ["Warm up first"]
+}"""
+
+def test_clean_json_needs_no_repairs():
+    parser = TolerantJSONParser()
+    workout = parser.parse(WORKOUT_JSON, WORKOUT_SCHEMA)
+    assert workout['workout_type'] == 'Legs'
+    assert len(workout['exercises']) == 2
+    assert parser.stats()['clean'] == 1
+    assert parser.stats()['repairs'] == {}
+
+def test_fences_and_surrounding_prose_are_removed():
+    parser = TolerantJSONParser()
+    text = "Here is your workout:\n```json\n" + WORKOUT_JSON + "\n```\nEnjoy!"
+    workout = parser.parse(text, WORKOUT_SCHEMA)
+    assert workout['duration_minutes'] == 30
+    repairs = parser.stats()['repairs']
+    assert repairs['fences'] == 1
+    assert repairs['extracted'] == 1
+
+def test_trailing_commas_are_removed():
+    parser = TolerantJSONParser()
+    data = parser.parse('{"tips": ["a", "b",], "note": "x, ]",}')
+    assert data == {"tips": ["a", "b"], "note": "x, ]"}
+    assert parser.stats()['repairs']['trailing_commas'] == 1
+
+def test_truncated_output_keeps_complete_values():
+    parser = TolerantJSONParser()
+    truncated = WORKOUT_JSON[:WORKOUT_JSON.index('{"name": "Lunges"') + 30]
+    workout = parser.parse(truncated, WORKOUT_SCHEMA)
+    assert workout['exercises'][0]['name'] == 'Squats'
+    assert parser.stats()['repairs']['truncated'] == 1
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": [1, 2, 3', {"a": [1, 2, 3]}),
+    ('{"a": 1, "b": "unfinished', {"a": 1, "b": "unfinished"}),
+    ('{"a": 1, "unfinished_ke', {"a": 1}),
+    ('{"a": 1, "b":', {"a": 1}),
+    ('{"a": {"b": [true, fal', {"a": {"b": [True]}}),
+])
+def test_truncation_candidates(text, expected):
+    assert TolerantJSONParser().parse(text) == expected
+
+def test_scalars_are_coerced_to_schema_types():
+    parser = TolerantJSONParser()
+    details = parser.parse(
+        '{"age": "29", "height": 178, "weight": "70.5 kg", "fitness_level": "Beginner", "goals": null}',
+        USER_DETAILS_SCHEMA
+    )
+    assert details == {"age": 29, "height": 178, "weight": 70.5, "fitness_level": "beginner", "goals": None}
+    assert parser.stats()['repairs']['coerced'] == 3
+
+def test_missing_required_field_fails():
+    parser = TolerantJSONParser()
+    with pytest.raises(PlanParseError):
+        parser.parse('{"workout_type": "Legs", "exercises": []}', WORKOUT_SCHEMA)
+    assert parser.stats()['failed'] == 1
+
+def test_too_few_meals_fails():
+    diet = '{"meals": [], "snacks": [], "hydration": {}, "total_calories": 2000, "cuisine_type": "Mixed"}'
+    with pytest.raises(PlanParseError):
+        TolerantJSONParser().parse(diet, DIET_SCHEMA)
+
+def test_text_without_json_fails():
+    with pytest.raises(PlanParseError):
+        TolerantJSONParser().parse("Sorry, I can't help with that.")
@@ -0,0 +1,66 @@
+from datetime import date
+import pytest
+from src.services.plan_engine import LocalPlanEngine, goal_category, EXERCISE_CATALOG
+
+PROFILE = {'user_id': 42, 'age': 30, 'height': 175, 'weight': 80, 'fitness_level': 'beginner', 'goals': ''}
+
+@pytest.mark.parametrize("goals, expected", [
+    ("gain weight", 'muscle_gain'),
+    ("bulk up and gain weight", 'muscle_gain'),
+    ("weightlifting", 'muscle_gain'),
+    ("build muscle", 'muscle_gain'),
+    ("lose weight", 'fat_loss'),
+    ("weight loss before summer", 'fat_loss'),
+    ("burn fat", 'fat_loss'),
+    ("run a marathon", 'endurance'),
+    ("stay healthy", 'general'),
+    ("", 'general'),
+    (None, 'general'),
+])
+def test_goal_category(goals, expected):
+    assert goal_category(goals) == expected
+
+def test_daily_calorie_target_follows_goal():
+    engine = LocalPlanEngine()
+    maintenance = engine.daily_calorie_target(PROFILE)
+    assert engine.daily_calorie_target({**PROFILE, 'goals': 'gain weight'}) == maintenance + 300
+    assert engine.daily_calorie_target({**PROFILE, 'goals': 'lose weight'}) == maintenance - 400
+
+def test_daily_calorie_target_defaults_without_measurements():
+    assert LocalPlanEngine.daily_calorie_target({'goals': 'gain weight'}) == 2000
+
+def test_workout_shape_and_determinism():
+    engine = LocalPlanEngine()
+    workout = engine.generate_workout(PROFILE, 'Legs', on_date=date(2024, 1, 1))
+    assert workout == engine.generate_workout(PROFILE, 'Legs', on_date=date(2024, 1, 1))
+
+    assert workout['workout_type'] == 'Legs'
+    assert workout['difficulty'] == 'Beginner'
+    assert len(workout['exercises']) == 4
+    leg_exercises = {entry[0] for entry in EXERCISE_CATALOG['Legs']}
+    for exercise in workout['exercises']:
+        assert exercise['name'] in leg_exercises
+        assert {'type', 'sets', 'reps', 'rest_seconds', 'instructions', 'modifications'} <= exercise.keys()
+    for step in workout['warmup'] + workout['cooldown']:
+        assert {'name', 'duration_seconds', 'instructions'} <= step.keys()
+    assert workout['tips']
+    assert workout['calories_estimate'] > 0
+
+def test_unknown_muscle_group_uses_full_body_catalog():
+    workout = LocalPlanEngine().generate_workout(PROFILE, 'Forearms')
+    full_body = {entry[0] for entry in EXERCISE_CATALOG['Full Body']}
+    assert all(exercise['name'] in full_body for exercise in workout['exercises'])
+
+def test_diet_plan_shape_and_totals():
+    plan = LocalPlanEngine().generate_diet_plan(PROFILE, on_date=date(2024, 1, 1))
+
+    assert [meal['name'] for meal in plan['meals']] == ['Breakfast', 'Lunch', 'Dinner']
+    assert len(plan['snacks']) == 2
+    items = [item for entry in plan['meals'] + plan['snacks'] for item in entry['items']]
+    for item in items:
+        assert {'name', 'portion', 'calories', 'cuisine', 'nutrition'} <= item.keys()
+        assert '_macros' not in item
+    assert plan['total_calories'] == sum(item['calories'] for item in items)
+    assert {'water', 'other_beverages'} <= plan['hydration'].keys()
+    assert {'protein', 'carbs', 'fats', 'fiber'} <= plan['nutritional_summary'].keys()
+    assert plan['notes']
@@ -2,7 +2,8 @@ import logging
 from functools import wraps
 from telegram import Update
 from telegram.ext import ContextTypes
-from src.database.models import ChatMessage, UserSession
+from src.database.async_models import AsyncUserSession
+from src.database.chat_log_writer import chat_log_writer
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +16,7 @@ def log_message(func):
         message_id = update.message.message_id if update.message else None
         
         # Get current session state
-        session = UserSession.get_by_user_id(user_id)
+        session = await AsyncUserSession.get_by_user_id(user_id)
         session_state = session.conversation_state if session else None
         
         # Log user message
@@ -24,7 +25,7 @@ def log_message(func):
             is_command = update.message.text.startswith('/')
             command_name = update.message.text.split()[0][1:] if is_command else None
             
-            ChatMessage.create_user_message(
+            chat_log_writer.log_user_message(
                 user_id=user_id,
                 message_text=update.message.text,
                 message_id=message_id,
@@ -45,7 +46,7 @@ def log_bot_response(user_id: int, message_text: str, chat_id: int = None,
                     reply_to_message_id: int = None, session_state: str = None):
     """Log a bot response message"""
     try:
-        ChatMessage.create_bot_message(
+        chat_log_writer.log_bot_message(
             user_id=user_id,
             message_text=message_text,
             chat_id=chat_id,
@@ -61,7 +62,7 @@ def log_user_message(user_id: int, message_text: str, chat_id: int = None,
                     session_state: str = None):
     """Log a user message"""
     try:
-        ChatMessage.create_user_message(
+        chat_log_writer.log_user_message(
             user_id=user_id,
             message_text=message_text,
             message_id=message_id,
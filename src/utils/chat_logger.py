@@ -1,5 +1,5 @@
 import logging
-from src.database.models import ChatMessage
+from src.database.chat_log_writer import chat_log_writer
 
 logger = logging.getLogger(__name__)
 
@@ -7,7 +7,7 @@ def log_bot_message(user_id: int, message_text: str, chat_id: int = None,
                    reply_to_message_id: int = None, session_state: str = None, 
                    message_category: str = None):
     """
-    Log a bot message to chat history
+    Log a bot message to chat history (queued, written in batches)
     
     Args:
         user_id: Telegram user ID
@@ -18,7 +18,7 @@ def log_bot_message(user_id: int, message_text: str, chat_id: int = None,
         message_category: Category of the message ('workout', 'diet', 'reminder', 'progress', etc.)
     """
     try:
-        ChatMessage.create_bot_message(
+        chat_log_writer.log_bot_message(
             user_id=user_id,
             message_text=message_text,
             chat_id=chat_id,